@@ -40,6 +40,8 @@ from app.models.goal_model import Goal
 from app.models.achievement_model import Achievement
 from app.models.location_history_model import LocationHistory
 from app.models.demo_usage_model import DemoUsage
+from app.models.rollup_model import DailyActivityRollup, DailyCostRollup, RollupCoverage
+from app.models.fuel_baseline_model import VehicleFuelBaseline
 
 # --- CORREÇÃO (BASEADO NO SEU INPUT) ---
 # Importa o modelo correto do seu tire_model.py
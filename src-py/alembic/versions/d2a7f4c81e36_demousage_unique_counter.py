@@ -0,0 +1,48 @@
+"""demousage unique counter
+
+Revision ID: d2a7f4c81e36
+Revises: 9c1d3e5f7a20
+Create Date: 2026-10-18 17:05:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7f4c81e36'
+down_revision: Union[str, None] = '9c1d3e5f7a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Junta contadores duplicados (criados por pedidos concorrentes) no de menor id
+    op.execute("""
+        UPDATE demousage AS d SET usage_count = s.total
+        FROM (
+            SELECT MIN(id) AS keep_id, SUM(COALESCE(usage_count, 0)) AS total
+            FROM demousage
+            GROUP BY organization_id, resource_type, period
+            HAVING COUNT(*) > 1
+        ) AS s
+        WHERE d.id = s.keep_id
+    """)
+    op.execute("""
+        DELETE FROM demousage AS d
+        USING demousage AS k
+        WHERE d.organization_id = k.organization_id
+          AND d.resource_type = k.resource_type
+          AND d.period = k.period
+          AND d.id > k.id
+    """)
+    op.execute("UPDATE demousage SET usage_count = 0 WHERE usage_count IS NULL")
+    op.alter_column('demousage', 'usage_count', existing_type=sa.Integer(), nullable=False, server_default='0')
+    op.create_unique_constraint('uq_demousage_org_resource_period', 'demousage', ['organization_id', 'resource_type', 'period'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_demousage_org_resource_period', 'demousage', type_='unique')
+    op.alter_column('demousage', 'usage_count', existing_type=sa.Integer(), nullable=True, server_default=None)
@@ -34,7 +34,8 @@ from app.v1.endpoints import (
     audit_logs,
     weather,
     routes,
-    alerts
+    alerts,
+    exports
 )
 
 api_router = APIRouter()
@@ -72,4 +73,5 @@ api_router.include_router(feedback.router, prefix="/feedback", tags=["feedback"]
 api_router.include_router(audit_logs.router, prefix="/audit-logs", tags=["Audit Logs"]) # <--- ADICIONE
 api_router.include_router(weather.router, prefix="/weather", tags=["weather"]) # <--- ADICIONE ISTO
 api_router.include_router(routes.router, prefix="/routes", tags=["routes"]) # <--- Adicionar       
-api_router.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
\ No newline at end of file
+api_router.include_router(alerts.router, prefix="/alerts", tags=["alerts"])
+api_router.include_router(exports.router, prefix="/exports", tags=["Exports"])
\ No newline at end of file
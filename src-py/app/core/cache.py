@@ -0,0 +1,103 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def warn_if_per_worker(component: str, setting: str) -> bool:
+    """
+    Avisa (alto) quando um estado que devia ser partilhado fica por processo
+    com vários workers da API. Retorna True nesse caso.
+    """
+    if settings.WEB_CONCURRENCY <= 1:
+        return False
+    logger.warning(
+        f"{component} está em memória com WEB_CONCURRENCY={settings.WEB_CONCURRENCY}: "
+        f"cada worker terá o seu próprio estado. Configure {setting}=redis."
+    )
+    return True
+
+
+class TTLCache:
+    """
+    Cache em memória (por processo) com expiração por TTL e descarte LRU.
+    Mantém contadores de acertos/falhas, expostos em /admin/metrics/caches.
+    Não é thread-safe: pensado para o event loop do FastAPI.
+    """
+
+    def __init__(self, name: str, *, maxsize: int = 1024, ttl: float = 300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        cache_registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def update(self, key: Hashable, func: Callable[[Any], Any]) -> bool:
+        """
+        Aplica func ao valor de uma entrada ainda válida, mantendo a expiração.
+        Retorna False (sem criar a entrada) se a chave não existe ou já expirou.
+        """
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[0] < time.monotonic():
+            return False
+        self._data[key] = (entry[0], func(entry[1]))
+        return True
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove todas as entradas para as quais predicate(chave, valor) é verdadeiro."""
+        keys = [k for k, (_, v) in self._data.items() if predicate(k, v)]
+        for k in keys:
+            del self._data[k]
+        return len(keys)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# Todos os caches criados no processo, por nome
+cache_registry: Dict[str, TTLCache] = {}
@@ -41,6 +41,88 @@ class Settings(BaseSettings):
     OPENWEATHER_API_KEY: str
     REDIS_URL: str
 
+    # Nº de processos da API (a mesma variável que o uvicorn/gunicorn leem). Com mais
+    # de um, os backends "memory" abaixo deixam de ser partilhados e é emitido um aviso
+    WEB_CONCURRENCY: int = 1
+
+    # Cache de resolução dispositivo/placa -> veículo usado pela telemetria (por worker).
+    # Alterações num veículo invalidam o worker local e, com "redis", os outros pelo pub/sub;
+    # com "memory", os outros workers só as veem quando a entrada expira (TTL curto)
+    VEHICLE_LOOKUP_CACHE_BACKEND: str = "memory"
+    VEHICLE_LOOKUP_CACHE_TTL_SECONDS: int = 30
+    VEHICLE_LOOKUP_CACHE_MAXSIZE: int = 10000
+
+    # Buffer write-behind da última posição dos veículos (0 = grava a cada ping)
+    POSITION_FLUSH_INTERVAL_MS: int = 1000
+
+    # Stream do mapa em tempo real ("memory" = só este worker, "redis" = pub/sub entre workers)
+    LIVE_MAP_BACKEND: str = "memory"
+    LIVE_MAP_PUSH_INTERVAL_MS: int = 500
+    LIVE_MAP_KEEPALIVE_SECONDS: int = 25
+
+    # Nº máximo de conexões que as consultas paralelas do dashboard do gestor ocupam
+    # ao mesmo tempo em cada worker, somando todos os pedidos (ver DB_POOL_SIZE)
+    DASHBOARD_QUERY_CONCURRENCY: int = 4
+
+    # Cache do dashboard do gestor ("memory" ou "redis"), invalidado por escritas da organização.
+    # "memory" com WEB_CONCURRENCY > 1 desliga o cache (e o do HTML dos relatórios)
+    DASHBOARD_CACHE_BACKEND: str = "memory"
+    DASHBOARD_CACHE_TTL_SECONDS: int = 120
+    # Com stale-while-revalidate, uma entrada expirada é servida até esta idade enquanto é recalculada
+    DASHBOARD_CACHE_STALE_WHILE_REVALIDATE: bool = True
+    DASHBOARD_CACHE_MAX_STALE_SECONDS: int = 1800
+
+    # Geração de PDFs em segundo plano: processos dedicados e arquivos prontos guardados em disco
+    PDF_JOBS_DIR: str = "storage/pdf_jobs"
+    PDF_JOB_TTL_SECONDS: int = 60 * 60
+    PDF_RENDER_WORKERS: int = 2
+    # HTML dos relatórios já renderizado (invalidado pela versão dos dados da organização)
+    REPORT_HTML_CACHE_TTL_SECONDS: int = 60 * 10
+
+    # Linhas por lote nas exportações em streaming (cursor do lado do servidor)
+    EXPORT_BATCH_SIZE: int = 2000
+
+    # Verificação de alertas: resumo por e-mail aos gestores (via Celery), com até N destinatários por envio
+    SYSTEM_CHECK_EMAILS_ENABLED: bool = True
+    NOTIFICATION_EMAIL_BATCH_SIZE: int = 50
+    # Agendador da verificação de alertas: organizações com id % SHARD_COUNT == SHARD_INDEX
+    # são verificadas, no máximo CONCURRENCY em paralelo, por um único processo eleito
+    # por shard (advisory lock no Postgres; a conexão do lock sai do pool desse processo)
+    SYSTEM_CHECK_SCHEDULER_ENABLED: bool = True
+    SYSTEM_CHECK_INTERVAL_SECONDS: int = 60 * 60
+    SYSTEM_CHECK_CONCURRENCY: int = 4
+    SYSTEM_CHECK_ORG_TIMEOUT_SECONDS: int = 120
+    SYSTEM_CHECK_SHARD_INDEX: int = 0
+    SYSTEM_CHECK_SHARD_COUNT: int = 1
+    # Intervalo mínimo entre verificações pedidas manualmente pelo gestor
+    SYSTEM_CHECK_MIN_TRIGGER_SECONDS: int = 60 * 5
+
+    # Contadores de notificações não lidas ("memory" por worker ou "redis" partilhado);
+    # cada contador é recontado no banco após este intervalo. "memory" com
+    # WEB_CONCURRENCY > 1 desliga o cache (cada leitura conta no banco)
+    NOTIFICATION_COUNTER_BACKEND: str = "memory"
+    NOTIFICATION_COUNTER_RECONCILE_SECONDS: int = 60 * 5
+
+    # Organizações sincronizadas em paralelo na importação do cartão de combustível
+    FUEL_SYNC_CONCURRENCY: int = 4
+
+    # Autenticação: tokens já validados (por worker) e utilizadores autenticados em cache
+    AUTH_TOKEN_CACHE_SIZE: int = 10_000
+    AUTH_USER_CACHE_TTL_SECONDS: int = 30
+
+    # Snapshot de uso das contas demonstração (limites e demo-stats), por worker
+    DEMO_USAGE_SNAPSHOT_TTL_SECONDS: int = 30
+
+    # Cercas virtuais: estado por veículo ("memory" ou "redis")
+    GEOFENCE_STATE_BACKEND: str = "memory"
+    GEOFENCE_STATE_TTL_SECONDS: int = 60 * 60 * 24 * 7
+    GEOFENCE_DWELL_MINUTES: int = 30
+    # Janela noturna em que sair de uma SAFE_ZONE é tratado como possível roubo.
+    # As horas são locais do fuso abaixo; os horários do dispositivo (UTC) são convertidos
+    GEOFENCE_NIGHT_START_HOUR: int = 22
+    GEOFENCE_NIGHT_END_HOUR: int = 5
+    GEOFENCE_NIGHT_TIMEZONE: str = "America/Sao_Paulo"
+
     # --- CORREÇÃO: Campos individuais opcionais ---
     POSTGRES_USER: Optional[str] = None
     POSTGRES_PASSWORD: Optional[str] = None
@@ -52,6 +134,36 @@ class Settings(BaseSettings):
     
     # Resultado final (URI que o SQLAlchemy usa)
     DATABASE_URI: Optional[str] = None
+
+    # Réplica de leitura opcional para relatórios (sem ela, tudo vai ao primário)
+    database_replica_url_from_env: Optional[str] = Field(None, alias="DATABASE_REPLICA_URL")
+    DATABASE_REPLICA_URI: Optional[str] = None
+
+    # Pool de conexões por worker do uvicorn: o total no banco é
+    # nº de workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW), por engine. As consultas paralelas
+    # do dashboard usam até DASHBOARD_QUERY_CONCURRENCY destas conexões por worker (além da
+    # do próprio pedido): mantenha-o bem abaixo de DB_POOL_SIZE + DB_MAX_OVERFLOW
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 60 * 30
+    # Cache de prepared statements do asyncpg (0 atrás de um PgBouncer em modo transaction)
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    # statement_timeout de cada conexão, em ms (0 = sem limite)
+    DB_STATEMENT_TIMEOUT_MS: int = 0
+    DB_REPLICA_STATEMENT_TIMEOUT_MS: int = 0
+    # Após uma escrita, o mesmo cliente lê do primário durante este intervalo
+    DB_REPLICA_STICKY_SECONDS: int = 10
+
+    @staticmethod
+    def _as_async_uri(uri: str) -> str:
+        # CORREÇÃO CRÍTICA: Troca do prefixo síncrono para o assíncrono
+        if uri.startswith("postgres://"):
+            return uri.replace("postgres://", "postgresql+asyncpg://", 1)
+        if uri.startswith("postgresql://") and not uri.startswith("postgresql+asyncpg://"):
+            # Garante que substitui o prefixo padrão pelo assíncrono
+            return uri.replace("postgresql://", "postgresql+asyncpg://", 1)
+        return uri
     
     @model_validator(mode='after')
     def assemble_db_uri(self) -> 'Settings':
@@ -59,14 +171,7 @@ class Settings(BaseSettings):
         
         # Prioridade 1: Usar a URL completa do ambiente (Render)
         if self.database_url_from_env:
-            uri = self.database_url_from_env
-            
-            # CORREÇÃO CRÍTICA: Troca do prefixo síncrono para o assíncrono
-            if uri.startswith("postgres://"):
-                uri = uri.replace("postgres://", "postgresql+asyncpg://", 1)
-            elif uri.startswith("postgresql://") and not uri.startswith("postgresql+asyncpg://"):
-                # Garante que substitui o prefixo padrão pelo assíncrono
-                uri = uri.replace("postgresql://", "postgresql+asyncpg://", 1)
+            uri = self._as_async_uri(self.database_url_from_env)
         
         # Prioridade 2: Usar os campos individuais para ambiente local (se fornecidos)
         elif self.POSTGRES_USER and self.POSTGRES_SERVER and self.POSTGRES_DB:
@@ -79,6 +184,8 @@ class Settings(BaseSettings):
              raise ValueError("Configuração do banco de dados inválida. DATABASE_URL ou POSTGRES_* são necessários.")
 
         self.DATABASE_URI = uri
+        if self.database_replica_url_from_env:
+            self.DATABASE_REPLICA_URI = self._as_async_uri(self.database_replica_url_from_env)
         return self
     # --- FIM DA CORREÇÃO ---
 
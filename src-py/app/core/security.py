@@ -1,7 +1,10 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 from jose import jwt, JWTError
 from passlib.context import CryptContext
+from app.core.cache import TTLCache
 from app.core.config import settings
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,6 +21,29 @@ def create_access_token(subject: str | Any) -> str:
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+# sha256(token) -> claims, válido até o exp do próprio token
+_access_token_claims = TTLCache("access_token_claims", maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=60 * 60)
+
+
+def decode_access_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Valida o access token (HS256, sem ida ao thread pool: é só um HMAC) e retorna
+    as claims, ou None se inválido/expirado. Tokens já validados ficam em cache
+    até expirarem, então os pedidos seguintes do mesmo token não refazem a validação.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = _access_token_claims.get(key)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    remaining = claims.get("exp", 0) - time.time()
+    if remaining > 0:
+        _access_token_claims.set(key, claims, ttl=remaining)
+    return claims
+
 def create_password_reset_token(email: str) -> str:
     """Cria um token de redefinição de senha."""
     expire = datetime.now(timezone.utc) + timedelta(minutes=PASSWORD_RESET_TOKEN_EXPIRE_MINUTES)
@@ -17,6 +17,7 @@ from . import crud_freight_order as freight_order
 from . import crud_implement as implement
 from . import crud_notification as notification
 from . import crud_report as report
+from . import crud_rollup as rollup
 from . import crud_tire as tire #
 from . import crud_fine as fine # <-- ADICIONE ESTA LINHA
 from .crud_demo_usage import demo_usage
@@ -1,8 +1,13 @@
 # backend/app/crud/base.py
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, Generic, List, Optional, Sequence, Type, TypeVar, Union
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, and_, or_, Select
+from sqlalchemy.sql import operators
 
 from app.db.base_class import Base
 
@@ -10,6 +15,98 @@ ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+
+# --- PAGINAÇÃO POR CURSOR (KEYSET) ---
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+@dataclass
+class KeysetPage(Generic[ModelType]):
+    items: List[ModelType]
+    # None quando não há mais páginas
+    next_cursor: Optional[str]
+
+
+def _cursor_default(value: Any):
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if hasattr(value, "value"):  # Enum
+        return value.value
+    raise TypeError(f"Valor não suportado no cursor: {value!r}")
+
+
+def _cursor_hook(obj: Dict[str, Any]):
+    if "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    if "$d" in obj:
+        return date.fromisoformat(obj["$d"])
+    return obj
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), default=_cursor_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw, object_hook=_cursor_hook)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Cursor de paginação inválido.") from e
+    if not isinstance(values, list):
+        raise InvalidCursorError("Cursor de paginação inválido.")
+    return values
+
+
+async def paginate_keyset(
+    db: AsyncSession,
+    stmt: Select,
+    *,
+    order_by: Sequence[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> KeysetPage:
+    """
+    Pagina `stmt` por keyset: em vez de OFFSET, a página seguinte começa depois
+    dos valores de ordenação do último item (codificados no cursor opaco), então o
+    custo não cresce com a profundidade. `order_by` são colunas do modelo, com
+    .asc()/.desc() opcional, e a última deve ser única (normalmente o id).
+    """
+    keys = []
+    for clause in order_by:
+        modifier = getattr(clause, "modifier", None)
+        if modifier in (operators.asc_op, operators.desc_op):
+            keys.append((clause.element, modifier is operators.desc_op))
+        else:
+            keys.append((clause, False))
+
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise InvalidCursorError("Cursor de paginação inválido.")
+        # (a > x) OU (a = x E b > y) OU ... — respeitando a direção de cada coluna
+        conditions = []
+        for i, (column, descending) in enumerate(keys):
+            equal_prefix = [keys[j][0] == values[j] for j in range(i)]
+            step = column < values[i] if descending else column > values[i]
+            conditions.append(and_(*equal_prefix, step))
+        stmt = stmt.where(or_(*conditions))
+
+    ordering = [column.desc() if descending else column.asc() for column, descending in keys]
+    items = (await db.execute(stmt.order_by(*ordering).limit(limit + 1))).scalars().all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in keys])
+    return KeysetPage(items=list(items), next_cursor=next_cursor)
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]):
         """
@@ -31,6 +128,15 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         )
         return result.scalars().all()
 
+    async def get_page(
+        self, db: AsyncSession, *, cursor: Optional[str] = None, limit: int = 100, **filters
+    ) -> KeysetPage[ModelType]:
+        """Equivalente a get_multi, paginado por cursor (ordem por id)."""
+        stmt = select(self.model)
+        if filters:
+            stmt = stmt.filter_by(**filters)
+        return await paginate_keyset(db, stmt, order_by=[self.model.id], limit=limit, cursor=cursor)
+
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = obj_in.model_dump()
         db_obj = self.model(**obj_in_data)
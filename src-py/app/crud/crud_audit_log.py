@@ -1,8 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from sqlalchemy.orm import selectinload
-from typing import List
+from typing import List, Optional
 
+from app.crud.base import KeysetPage, paginate_keyset
 from app.models.audit_log_model import AuditLog
 from app.schemas.audit_log_schema import AuditLogCreate
 from app.models.user_model import User
@@ -35,4 +36,24 @@ async def get_multi_by_org(
         
     stmt = stmt.offset(skip).limit(limit)
     result = await db.execute(stmt)
-    return result.scalars().all()
\ No newline at end of file
+    return result.scalars().all()
+
+async def get_page_by_org(
+    db: AsyncSession,
+    *,
+    organization_id: int,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    resource_type: str = None
+) -> KeysetPage[AuditLog]:
+    """Histórico de auditoria do mais recente ao mais antigo, paginado por cursor."""
+    stmt = (
+        select(AuditLog)
+        .where(AuditLog.organization_id == organization_id)
+        .options(selectinload(AuditLog.user))
+    )
+    if resource_type:
+        stmt = stmt.where(AuditLog.resource_type == resource_type)
+    return await paginate_keyset(
+        db, stmt, order_by=[AuditLog.created_at.desc(), AuditLog.id.desc()], limit=limit, cursor=cursor
+    )
@@ -1,43 +1,58 @@
+from typing import Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from datetime import date
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.models.demo_usage_model import DemoUsage
 from app.crud.base import CRUDBase
+from app.services.demo_usage_snapshots import current_period, record_usage
 
-class CRUDDemoUsage(CRUDBase[DemoUsage, DemoUsage, DemoUsage]):
-    async def get_or_create_usage(self, db: AsyncSession, *, organization_id: int, resource_type: str) -> DemoUsage:
-        today = date.today()
-        start_of_month = today.replace(day=1)
+# Ambos os dialetos suportam INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+# (o SQLite dos testes a partir da 3.35)
+_UPSERT_BY_DIALECT = {"postgresql": pg_insert, "sqlite": sqlite_insert}
 
-        stmt = select(DemoUsage).where(
-            and_(
-                DemoUsage.organization_id == organization_id,
-                DemoUsage.resource_type == resource_type,
-                DemoUsage.period == start_of_month
-            )
+
+class CRUDDemoUsage(CRUDBase[DemoUsage, DemoUsage, DemoUsage]):
+    async def get_usage(self, db: AsyncSession, *, organization_id: int, resource_type: str) -> int:
+        """Uso do recurso no mês corrente (0 se ainda não houve nenhum)."""
+        stmt = select(func.coalesce(func.sum(DemoUsage.usage_count), 0)).where(
+            DemoUsage.organization_id == organization_id,
+            DemoUsage.resource_type == resource_type,
+            DemoUsage.period == current_period(),
         )
-        result = await db.execute(stmt)
-        usage = result.scalar_one_or_none()
+        return (await db.execute(stmt)).scalar_one()
 
-        if not usage:
-            usage = DemoUsage(
-                organization_id=organization_id,
-                resource_type=resource_type,
-                period=start_of_month,
-                usage_count=0
+    async def increment_usage(
+        self, db: AsyncSession, *, organization_id: int, resource_type: str, limit: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Soma 1 ao contador do mês numa única instrução, sem leitura prévia:
+        INSERT ... ON CONFLICT DO UPDATE SET usage_count = usage_count + 1 RETURNING.
+        Com limit, o incremento só acontece se o contador ainda estiver abaixo dele
+        (verificação e incremento atômicos). Retorna o novo valor, ou None quando
+        o limite já foi atingido. Não faz commit: a rota confirma a transação.
+        """
+        if limit is not None and limit <= 0:
+            return None
+        period = current_period()
+        insert = _UPSERT_BY_DIALECT[db.get_bind().dialect.name]
+        stmt = (
+            insert(DemoUsage)
+            .values(organization_id=organization_id, resource_type=resource_type, period=period, usage_count=1)
+            .on_conflict_do_update(
+                index_elements=[DemoUsage.organization_id, DemoUsage.resource_type, DemoUsage.period],
+                set_={"usage_count": DemoUsage.usage_count + 1},
+                where=(DemoUsage.usage_count < limit) if limit is not None else None,
             )
-            db.add(usage)
-            await db.flush() # Use flush() para preparar o objeto na sessão
-            # await db.commit() # <-- REMOVA ESTA LINHA
-            # await db.refresh(usage) # <-- REMOVA ESTA LINHA
-        return usage
+            .returning(DemoUsage.usage_count)
+        )
+        usage_count = (await db.execute(stmt)).scalar_one_or_none()
+        if usage_count is not None:
+            # O snapshot em cache recebe o novo valor quando a transação for confirmada
+            record_usage(db, organization_id=organization_id, period=period,
+                         resource_type=resource_type, usage_count=usage_count)
+        return usage_count
 
-    async def increment_usage(self, db: AsyncSession, *, organization_id: int, resource_type: str):
-        usage = await self.get_or_create_usage(db, organization_id=organization_id, resource_type=resource_type)
-        usage.usage_count += 1
-        db.add(usage) # Garante que está na sessão
-        # await db.commit() # <-- REMOVA ESTA LINHA
-        return usage
-    
 # Esta linha é a que importa. Ela cria a instância.
-demo_usage = CRUDDemoUsage(DemoUsage)
\ No newline at end of file
+demo_usage = CRUDDemoUsage(DemoUsage)
@@ -0,0 +1,91 @@
+# backend/app/crud/crud_export.py
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.fuel_log_model import FuelLog
+from app.models.inventory_transaction_model import InventoryTransaction
+from app.models.location_history_model import LocationHistory
+from app.models.part_model import InventoryItem
+from app.models.vehicle_cost_model import VehicleCost
+
+
+@dataclass(frozen=True)
+class ExportDataset:
+    """Colunas exportadas de um dataset e como restringir a consulta à organização."""
+    columns: Tuple
+    scope: Callable[[Select, int], Select]
+    date_column: object
+    # True quando date_column é DateTime (o filtro vai até o fim do dia final)
+    is_datetime: bool = True
+
+    @property
+    def column_names(self) -> List[str]:
+        return [c.key for c in self.columns]
+
+
+EXPORT_DATASETS: Dict[str, ExportDataset] = {
+    "location-history": ExportDataset(
+        columns=(LocationHistory.id, LocationHistory.vehicle_id, LocationHistory.timestamp,
+                 LocationHistory.latitude, LocationHistory.longitude, LocationHistory.speed),
+        scope=lambda stmt, organization_id: stmt.where(LocationHistory.organization_id == organization_id),
+        date_column=LocationHistory.timestamp,
+    ),
+    "fuel-logs": ExportDataset(
+        columns=(FuelLog.id, FuelLog.vehicle_id, FuelLog.user_id, FuelLog.timestamp, FuelLog.odometer,
+                 FuelLog.liters, FuelLog.total_cost, FuelLog.verification_status, FuelLog.source,
+                 FuelLog.provider_name, FuelLog.gas_station_name),
+        scope=lambda stmt, organization_id: stmt.where(FuelLog.organization_id == organization_id),
+        date_column=FuelLog.timestamp,
+    ),
+    "vehicle-costs": ExportDataset(
+        columns=(VehicleCost.id, VehicleCost.vehicle_id, VehicleCost.date, VehicleCost.cost_type,
+                 VehicleCost.amount, VehicleCost.description),
+        scope=lambda stmt, organization_id: stmt.where(VehicleCost.organization_id == organization_id),
+        date_column=VehicleCost.date,
+        is_datetime=False,
+    ),
+    # Transações não têm organization_id: a organização vem do item de estoque
+    "inventory-transactions": ExportDataset(
+        columns=(InventoryTransaction.id, InventoryTransaction.item_id, InventoryTransaction.part_id,
+                 InventoryTransaction.transaction_type, InventoryTransaction.user_id,
+                 InventoryTransaction.related_vehicle_id, InventoryTransaction.related_user_id,
+                 InventoryTransaction.timestamp, InventoryTransaction.notes),
+        scope=lambda stmt, organization_id: stmt.join(
+            InventoryItem, InventoryTransaction.item_id == InventoryItem.id
+        ).where(InventoryItem.organization_id == organization_id),
+        date_column=InventoryTransaction.timestamp,
+    ),
+}
+
+
+def build_export_query(
+    dataset: ExportDataset, *, organization_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> Select:
+    # Ordenado pela chave primária: lotes estáveis e sem ordenação extra no banco
+    stmt = dataset.scope(select(*dataset.columns), organization_id).order_by(dataset.columns[0])
+    if dataset.is_datetime:
+        if start_date:
+            stmt = stmt.where(dataset.date_column >= datetime.combine(start_date, time.min))
+        if end_date:
+            stmt = stmt.where(dataset.date_column < datetime.combine(end_date + timedelta(days=1), time.min))
+    else:
+        if start_date:
+            stmt = stmt.where(dataset.date_column >= start_date)
+        if end_date:
+            stmt = stmt.where(dataset.date_column <= end_date)
+    return stmt
+
+
+async def stream_rows(db: AsyncSession, stmt: Select, *, batch_size: int) -> AsyncIterator[Sequence[tuple]]:
+    """
+    Percorre o resultado com cursor do lado do servidor (yield_per), entregando
+    lotes de até batch_size linhas; a memória usada não depende do total exportado.
+    """
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    async for partition in result.partitions(batch_size):
+        yield [tuple(row) for row in partition]
@@ -1,9 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
-from geopy.distance import geodesic
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+import numpy as np
 from app import crud
+from app.crud.base import KeysetPage, paginate_keyset
+from app.models.fuel_baseline_model import VehicleFuelBaseline
 from app.models.fuel_log_model import FuelLog, VerificationStatus, FuelLogSource
 from app.models.vehicle_model import Vehicle
 from app.models.user_model import User
@@ -11,61 +16,145 @@ from app.models.vehicle_cost_model import VehicleCost, CostType # Import necess
 from app.schemas.vehicle_cost_schema import VehicleCostCreate
 from app.schemas.fuel_log_schema import FuelLogCreate, FuelLogUpdate, FuelProviderTransaction
 
+# Consumo abaixo desta fração da média histórica do veículo gera alerta (25% pior)
+ABNORMAL_CONSUMPTION_RATIO = 0.75
+
+# INSERT ... ON CONFLICT DO NOTHING para semear a base sem corrida entre pedidos
+_INSERT_BY_DIALECT = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def _as_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # O SQLite devolve datas sem fuso; os pedidos podem trazê-lo
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_abnormal_consumption(current_consumption: float, historical_avg: Optional[float]) -> bool:
+    return bool(historical_avg) and historical_avg > 0 and current_consumption < historical_avg * ABNORMAL_CONSUMPTION_RATIO
+
+
+async def _seed_baseline(db: AsyncSession, *, vehicle: Vehicle, exclude_log_id: Optional[int]) -> bool:
+    """
+    Calcula a base do veículo a partir de todo o histórico (uma única vez por veículo)
+    e insere-a com ON CONFLICT DO NOTHING. Retorna False se outro pedido já a criou:
+    a inserção espera pela transação dele e a linha existente é usada.
+    """
+    history = select(FuelLog).where(FuelLog.vehicle_id == vehicle.id)
+    if exclude_log_id is not None:
+        history = history.where(FuelLog.id != exclude_log_id)
+    history = history.subquery()
+    samples = (
+        select(
+            history.c.liters,
+            (history.c.odometer - func.lag(history.c.odometer).over(order_by=history.c.timestamp)).label("distance")
+        )
+        .subquery()
+    )
+    km_per_liter = samples.c.distance / samples.c.liters
+    count, mean, mean_sq = (await db.execute(
+        select(func.count(km_per_liter), func.avg(km_per_liter), func.avg(km_per_liter * km_per_liter))
+        .where(samples.c.distance > 0, samples.c.liters > 0)
+    )).one()
+    last_log = (await db.execute(
+        select(history.c.odometer, history.c.timestamp).order_by(history.c.timestamp.desc()).limit(1)
+    )).first()
+
+    insert = _INSERT_BY_DIALECT[db.get_bind().dialect.name]
+    result = await db.execute(
+        insert(VehicleFuelBaseline)
+        .values(
+            vehicle_id=vehicle.id,
+            organization_id=vehicle.organization_id,
+            samples=count or 0,
+            mean_km_per_liter=mean or 0.0,
+            m2=max((count or 0) * ((mean_sq or 0.0) - (mean or 0.0) ** 2), 0.0),
+            last_odometer=last_log.odometer if last_log else None,
+            last_timestamp=last_log.timestamp if last_log else None,
+        )
+        .on_conflict_do_nothing(index_elements=[VehicleFuelBaseline.vehicle_id])
+    )
+    return result.rowcount == 1
+
+
+async def _locked_baseline(db: AsyncSession, vehicle_id: int) -> Optional[VehicleFuelBaseline]:
+    return (await db.execute(
+        select(VehicleFuelBaseline)
+        .where(VehicleFuelBaseline.vehicle_id == vehicle_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )).scalars().first()
+
+
+def _add_sample(baseline: VehicleFuelBaseline, km_per_liter: float):
+    # Welford: média e variância atualizadas sem revisitar o histórico
+    baseline.samples += 1
+    delta = km_per_liter - baseline.mean_km_per_liter
+    baseline.mean_km_per_liter += delta / baseline.samples
+    baseline.m2 += delta * (km_per_liter - baseline.mean_km_per_liter)
+
+
+async def invalidate_baselines(db: AsyncSession, *, vehicle_ids: Iterable[int]):
+    """
+    Descarta a base dos veículos cujo histórico mudou fora da ordem normal
+    (edição, remoção, importação). A próxima avaliação recalcula-a.
+    """
+    vehicle_ids = set(vehicle_ids)
+    if vehicle_ids:
+        await db.execute(delete(VehicleFuelBaseline).where(VehicleFuelBaseline.vehicle_id.in_(vehicle_ids)))
+
+
 async def check_abnormal_consumption(db: AsyncSession, *, fuel_log: FuelLog, vehicle: Vehicle) -> tuple[bool, str]:
     """
     Verifica se o consumo de um abastecimento é anormal em comparação com a média do veículo.
     Retorna (True, "mensagem de alerta") se for anormal.
+    A média vem da base incremental do veículo, que é atualizada com este abastecimento.
+    Não faz commit: a rota confirma a transação (e com ela liberta o lock da base).
     """
+    baseline = await _locked_baseline(db, vehicle.id)
+    if baseline is None:
+        await _seed_baseline(db, vehicle=vehicle, exclude_log_id=fuel_log.id)
+        baseline = await _locked_baseline(db, vehicle.id)
+
+    historical_avg = baseline.mean_km_per_liter if baseline.samples else None
+    in_order = baseline.last_timestamp is None or (
+        _as_naive_utc(fuel_log.timestamp) >= _as_naive_utc(baseline.last_timestamp)
+    )
+
     # Para calcular o consumo atual, precisamos do odômetro do abastecimento anterior
-    previous_log_stmt = (
-        select(FuelLog)
-        .where(
-            FuelLog.vehicle_id == vehicle.id,
-            FuelLog.timestamp < fuel_log.timestamp
+    if in_order:
+        previous_odometer = baseline.last_odometer
+    else:
+        previous_log_stmt = (
+            select(FuelLog.odometer)
+            .where(
+                FuelLog.vehicle_id == vehicle.id,
+                FuelLog.timestamp < fuel_log.timestamp
+            )
+            .order_by(FuelLog.timestamp.desc())
+            .limit(1)
         )
-        .order_by(FuelLog.timestamp.desc())
-        .limit(1)
-    )
-    previous_log = (await db.execute(previous_log_stmt)).scalars().first()
-    
-    if not previous_log or not previous_log.odometer:
-        return (False, "") # Não há dados suficientes para comparar
+        previous_odometer = (await db.execute(previous_log_stmt)).scalar_one_or_none()
 
-    km_travelled = fuel_log.odometer - previous_log.odometer
-    
+    current_consumption = None
     # Evita divisão por zero ou valores absurdos
-    if km_travelled <= 0 or fuel_log.liters <= 0:
-        return (False, "")
-        
-    current_consumption = km_travelled / fuel_log.liters
+    if previous_odometer and fuel_log.liters > 0 and fuel_log.odometer - previous_odometer > 0:
+        current_consumption = (fuel_log.odometer - previous_odometer) / fuel_log.liters
 
-    # --- LÓGICA DE CONSUMO HISTÓRICO ---
-    subquery = (
-        select(
-            FuelLog.id,
-            FuelLog.liters,
-            (FuelLog.odometer - func.lag(FuelLog.odometer).over(order_by=FuelLog.timestamp)).label("distance")
-        )
-        .where(FuelLog.vehicle_id == vehicle.id)
-        .subquery()
-    )
+    if in_order:
+        if current_consumption is not None:
+            _add_sample(baseline, current_consumption)
+        baseline.last_odometer = fuel_log.odometer
+        baseline.last_timestamp = fuel_log.timestamp
+    else:
+        # Um abastecimento no meio do histórico altera o consumo do seguinte: recalcula depois
+        await db.delete(baseline)
 
-    avg_consumption_stmt = (
-        select(func.avg(subquery.c.distance / subquery.c.liters))
-        .where(
-            subquery.c.id != fuel_log.id,
-            subquery.c.distance > 0,
-            subquery.c.liters > 0
-        )
-    )
-    
-    historical_avg = (await db.execute(avg_consumption_stmt)).scalar_one_or_none()
-    
-    if not historical_avg or historical_avg <= 0:
-        return (False, "")
+    if current_consumption is None:
+        return (False, "") # Não há dados suficientes para comparar
 
     # Se o consumo atual for 25% pior (menor) que a média, gera alerta
-    if current_consumption < (historical_avg * 0.75):
+    if is_abnormal_consumption(current_consumption, historical_avg):
         message = f"Consumo anormal para {vehicle.brand} {vehicle.model}: {current_consumption:.2f} km/l (Média: {historical_avg:.2f} km/l)."
         return (True, message)
         
@@ -119,6 +208,21 @@ async def get_multi_by_org(db: AsyncSession, *, organization_id: int, skip: int
     result = await db.execute(stmt)
     return result.scalars().all()
 
+async def get_page_by_org(
+    db: AsyncSession, *, organization_id: int, cursor: Optional[str] = None, limit: int = 100, user_id: Optional[int] = None
+) -> KeysetPage[FuelLog]:
+    """Abastecimentos da organização (ou só do motorista) do mais recente ao mais antigo, paginados por cursor."""
+    stmt = (
+        select(FuelLog)
+        .where(FuelLog.organization_id == organization_id)
+        .options(selectinload(FuelLog.user), selectinload(FuelLog.vehicle))
+    )
+    if user_id is not None:
+        stmt = stmt.where(FuelLog.user_id == user_id)
+    return await paginate_keyset(
+        db, stmt, order_by=[FuelLog.timestamp.desc(), FuelLog.id.desc()], limit=limit, cursor=cursor
+    )
+
 async def get_multi_by_user(db: AsyncSession, *, user_id: int, organization_id: int, skip: int = 0, limit: int = 100) -> List[FuelLog]:
     stmt = (
         select(FuelLog)
@@ -175,6 +279,7 @@ async def update_fuel_log(db: AsyncSession, *, db_obj: FuelLog, obj_in: FuelLogU
     # ----------------------------
 
     db.add(db_obj)
+    await invalidate_baselines(db, vehicle_ids={old_vehicle_id, db_obj.vehicle_id})
     await db.commit()
     await db.refresh(db_obj, ["user", "vehicle"])
 
@@ -199,56 +304,97 @@ async def remove_fuel_log(db: AsyncSession, *, db_obj: FuelLog) -> FuelLog:
         await db.delete(linked_cost)
 
     await db.delete(db_obj)
+    await invalidate_baselines(db, vehicle_ids={db_obj.vehicle_id})
     await db.commit()
     return db_obj
 
 
 # --- INTEGRAÇÃO COM CARTÃO DE COMBUSTÍVEL ---
 
-async def _verify_transaction_location(
-    vehicle_coords: Optional[tuple[float, float]],
-    station_coords: tuple[float, float],
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Distância (km) entre pares de coordenadas, calculada de uma vez para arrays inteiros."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _verify_transaction_locations(
+    vehicle_coords: List[tuple[Optional[float], Optional[float]]],
+    station_coords: List[tuple[float, float]],
     threshold_km: float = 1.0
-) -> VerificationStatus:
-    if not vehicle_coords or not vehicle_coords[0] or not vehicle_coords[1]:
-        return VerificationStatus.UNVERIFIED
-    
-    distance = geodesic(vehicle_coords, station_coords).kilometers
-    
-    if distance > threshold_km:
-        return VerificationStatus.SUSPICIOUS
-    
-    return VerificationStatus.VERIFIED
+) -> List[VerificationStatus]:
+    vehicle_lat, vehicle_lon = (np.array([c[i] or np.nan for c in vehicle_coords], dtype=float) for i in (0, 1))
+    station_lat, station_lon = (np.array([c[i] for c in station_coords], dtype=float) for i in (0, 1))
+    distance = haversine_km(vehicle_lat, vehicle_lon, station_lat, station_lon)
+
+    # Sem posição conhecida do veículo (nula ou 0) não há como verificar
+    statuses = np.where(
+        np.isnan(distance), VerificationStatus.UNVERIFIED.value,
+        np.where(distance > threshold_km, VerificationStatus.SUSPICIOUS.value, VerificationStatus.VERIFIED.value)
+    )
+    return [VerificationStatus(status) for status in statuses]
 
 
 async def process_provider_transactions(db: AsyncSession, *, transactions: List[FuelProviderTransaction], organization_id: int):
-    new_logs_count = 0
-    for tx in transactions:
-        existing_log_stmt = select(FuelLog).where(FuelLog.provider_transaction_id == tx.transaction_id)
-        existing_log = (await db.execute(existing_log_stmt)).scalars().first()
-        if existing_log:
-            continue
-
-        vehicle_stmt = select(Vehicle).where(Vehicle.license_plate == tx.vehicle_license_plate, Vehicle.organization_id == organization_id)
-        vehicle = (await db.execute(vehicle_stmt)).scalars().first()
-        if not vehicle:
-            continue
-
-        driver_stmt = select(User).where(User.employee_id == tx.driver_employee_id, User.organization_id == organization_id)
-        driver = (await db.execute(driver_stmt)).scalars().first()
-        if not driver:
-            continue
-        
-        vehicle_location = (vehicle.last_latitude, vehicle.last_longitude)
-        station_location = (tx.gas_station_latitude, tx.gas_station_longitude)
-        verification_status = await _verify_transaction_location(vehicle_location, station_location)
+    """
+    Importa um lote de transações do cartão de combustível: transações já
+    importadas, veículos (placa) e motoristas (matrícula) são resolvidos com uma
+    consulta IN cada, as distâncias posto-veículo são calculadas de uma vez e os
+    novos abastecimentos são gravados num único flush.
+    """
+    # A mesma transação pode vir repetida na resposta do provedor
+    transactions = list({tx.transaction_id: tx for tx in reversed(transactions)}.values())[::-1]
+    if not transactions:
+        return {"new_logs_processed": 0}
+
+    existing_ids = set((await db.execute(
+        select(FuelLog.provider_transaction_id)
+        .where(FuelLog.provider_transaction_id.in_({tx.transaction_id for tx in transactions}))
+    )).scalars().all())
+    vehicles = {
+        v.license_plate: v
+        for v in (await db.execute(
+            select(Vehicle.id, Vehicle.license_plate, Vehicle.current_km, Vehicle.last_latitude, Vehicle.last_longitude)
+            .where(
+                Vehicle.license_plate.in_({tx.vehicle_license_plate for tx in transactions}),
+                Vehicle.organization_id == organization_id
+            )
+        )).all()
+    }
+    driver_ids = dict((await db.execute(
+        select(User.employee_id, User.id).where(
+            User.employee_id.in_({tx.driver_employee_id for tx in transactions}),
+            User.organization_id == organization_id
+        )
+    )).all())
+
+    to_import = [
+        (tx, vehicles[tx.vehicle_license_plate], driver_ids[tx.driver_employee_id])
+        for tx in transactions
+        if tx.transaction_id not in existing_ids
+        and tx.vehicle_license_plate in vehicles
+        and tx.driver_employee_id in driver_ids
+    ]
+    if not to_import:
+        return {"new_logs_processed": 0}
+
+    statuses = _verify_transaction_locations(
+        [(vehicle.last_latitude, vehicle.last_longitude) for _, vehicle, _ in to_import],
+        [(tx.gas_station_latitude, tx.gas_station_longitude) for tx, _, _ in to_import],
+    )
 
-        new_log = FuelLog(
+    # Um flush com todas as linhas (o SQLAlchemy agrupa-as em INSERTs de vários valores);
+    # pelo ORM, os resumos diários e o cache do dashboard continuam a ser atualizados
+    db.add_all([
+        FuelLog(
             odometer=vehicle.current_km,
             liters=tx.liters,
             total_cost=tx.total_cost,
             vehicle_id=vehicle.id,
-            user_id=driver.id,
+            user_id=driver_id,
             organization_id=organization_id,
             timestamp=tx.timestamp,
             provider_name="Ticket Log (Simulado)",
@@ -256,11 +402,12 @@ async def process_provider_transactions(db: AsyncSession, *, transactions: List[
             gas_station_name=tx.gas_station_name,
             gas_station_latitude=tx.gas_station_latitude,
             gas_station_longitude=tx.gas_station_longitude,
-            verification_status=verification_status,
+            verification_status=status,
             source=FuelLogSource.INTEGRATION
         )
-        db.add(new_log)
-        new_logs_count += 1
+        for (tx, vehicle, driver_id), status in zip(to_import, statuses)
+    ])
 
+    await invalidate_baselines(db, vehicle_ids={vehicle.id for _, vehicle, _ in to_import})
     await db.commit()
-    return {"new_logs_processed": new_logs_count}
\ No newline at end of file
+    return {"new_logs_processed": len(to_import)}
@@ -1,15 +1,28 @@
 # Em backend/app/crud/crud_notification.py
 
+import logging
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from html import escape
+
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, update
 from sqlalchemy.orm import selectinload # Necessário para carregar os relacionamentos
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
 
 from app.models.notification_model import Notification, NotificationType
 from app.models.user_model import User, UserRole
 from app.models.vehicle_model import Vehicle
 from app.models.document_model import Document
+from app.db.session import primary_session
+from app.services.notification_counters import unread_counters
+from app.tasks.email_tasks import send_email_async
+
+logger = logging.getLogger(__name__)
 
 # --- FUNÇÃO DE CRIAÇÃO ATUALIZADA ---
 async def create_notification(
@@ -28,35 +41,162 @@ async def create_notification(
     Cria uma notificação para um usuário específico OU para todos os gestores.
     Esta função agora gerencia seu próprio commit e é ideal para background tasks.
     """
-    target_user_ids = []
-    if user_id:
-        target_user_ids.append(user_id)
-        
-    if send_to_managers:
-        manager_stmt = select(User.id).where(
-            User.organization_id == organization_id,
+    batch = NotificationBatch(db, organization_id=organization_id, deduplicate=False, send_emails=False)
+    batch.add(
+        message=message,
+        notification_type=notification_type,
+        user_id=user_id,
+        send_to_managers=send_to_managers,
+        related_entity_type=related_entity_type,
+        related_entity_id=related_entity_id,
+        related_vehicle_id=related_vehicle_id,
+    )
+    await batch.flush()
+# --- FIM DA ATUALIZAÇÃO ---
+
+
+# --- ENVIO EM LOTE ---
+# (user_id, tipo, entidade relacionada, id da entidade, veículo): a mesma notificação
+# não é repetida para o mesmo usuário no mesmo dia.
+DedupKey = Tuple[int, NotificationType, Optional[str], Optional[int], Optional[int]]
+
+
+@dataclass(frozen=True)
+class PendingNotification:
+    message: str
+    notification_type: NotificationType
+    user_id: Optional[int] = None
+    send_to_managers: bool = False
+    related_entity_type: Optional[str] = None
+    related_entity_id: Optional[int] = None
+    related_vehicle_id: Optional[int] = None
+
+
+class NotificationBatch:
+    """
+    Acumula as notificações de uma execução (ex.: verificação de alertas) e grava
+    tudo de uma vez: gestores resolvidos numa consulta, duplicados do dia
+    descartados numa consulta, um único INSERT em lote e um commit. Os e-mails
+    seguem para o Celery, um por grupo de destinatários com o mesmo conteúdo.
+    """
+
+    def __init__(self, db: AsyncSession, *, organization_id: int, deduplicate: bool = True, send_emails: bool = False):
+        self.db = db
+        self.organization_id = organization_id
+        self.deduplicate = deduplicate
+        self.send_emails = send_emails
+        self._pending: List[PendingNotification] = []
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, *, message: str, notification_type: NotificationType, **kwargs):
+        self._pending.append(PendingNotification(message=message, notification_type=notification_type, **kwargs))
+
+    async def _manager_ids(self) -> List[int]:
+        stmt = select(User.id).where(
+            User.organization_id == self.organization_id,
             User.role.in_([UserRole.CLIENTE_ATIVO, UserRole.CLIENTE_DEMO]),
             User.is_active == True
         )
-        manager_ids = (await db.execute(manager_stmt)).scalars().all()
-        target_user_ids.extend(manager_ids)
-
-    unique_user_ids = set(target_user_ids)
-
-    for uid in unique_user_ids:
-        new_notification = Notification(
-            organization_id=organization_id,
-            user_id=uid,
-            message=message,
-            notification_type=notification_type,
-            related_entity_type=related_entity_type,
-            related_entity_id=related_entity_id,
-            related_vehicle_id=related_vehicle_id
+        return list((await self.db.execute(stmt)).scalars().all())
+
+    async def _already_sent_today(self, types: Set[NotificationType]) -> Set[DedupKey]:
+        start_of_day = datetime.combine(datetime.utcnow().date(), time.min)
+        stmt = select(
+            Notification.user_id,
+            Notification.notification_type,
+            Notification.related_entity_type,
+            Notification.related_entity_id,
+            Notification.related_vehicle_id,
+        ).where(
+            Notification.organization_id == self.organization_id,
+            Notification.notification_type.in_(types),
+            Notification.created_at >= start_of_day,
         )
-        db.add(new_notification)
-        
-    await db.commit()
-# --- FIM DA ATUALIZAÇÃO ---
+        return {tuple(row) for row in (await self.db.execute(stmt)).all()}
+
+    async def _build_rows(self) -> List[Dict[str, Any]]:
+        manager_ids: List[int] = []
+        if any(p.send_to_managers for p in self._pending):
+            manager_ids = await self._manager_ids()
+
+        sent: Set[DedupKey] = set()
+        if self.deduplicate:
+            sent = await self._already_sent_today({p.notification_type for p in self._pending})
+
+        rows = []
+        for pending in self._pending:
+            target_user_ids = [pending.user_id] if pending.user_id else []
+            if pending.send_to_managers:
+                target_user_ids.extend(manager_ids)
+            for uid in dict.fromkeys(target_user_ids):
+                key = (uid, pending.notification_type, pending.related_entity_type,
+                       pending.related_entity_id, pending.related_vehicle_id)
+                if self.deduplicate and key in sent:
+                    continue
+                sent.add(key)
+                rows.append({
+                    "organization_id": self.organization_id,
+                    "user_id": uid,
+                    "message": pending.message,
+                    "notification_type": pending.notification_type,
+                    "related_entity_type": pending.related_entity_type,
+                    "related_entity_id": pending.related_entity_id,
+                    "related_vehicle_id": pending.related_vehicle_id,
+                })
+        return rows
+
+    async def flush(self) -> int:
+        """Grava as notificações acumuladas. Retorna quantas foram criadas."""
+        if not self._pending:
+            return 0
+        rows = await self._build_rows()
+        self._pending.clear()
+        if rows:
+            await self.db.execute(insert(Notification), rows)
+        await self.db.commit()
+        for uid, created in Counter(row["user_id"] for row in rows).items():
+            await unread_counters.incr(self.organization_id, uid, created)
+        if rows and self.send_emails:
+            await self._send_emails(rows)
+        return len(rows)
+
+    async def _send_emails(self, rows: List[Dict[str, Any]]):
+        emails_stmt = select(User.id, User.email).where(
+            User.id.in_({row["user_id"] for row in rows}),
+            User.email.is_not(None)
+        )
+        emails = dict((await self.db.execute(emails_stmt)).all())
+
+        messages_by_user: Dict[int, List[str]] = defaultdict(list)
+        for row in rows:
+            if row["user_id"] in emails:
+                messages_by_user[row["user_id"]].append(row["message"])
+
+        # Quem recebeu exatamente os mesmos alertas partilha o mesmo e-mail
+        recipients_by_content: Dict[Tuple[str, ...], List[str]] = defaultdict(list)
+        for uid, messages in messages_by_user.items():
+            recipients_by_content[tuple(messages)].append(emails[uid])
+
+        batch_size = settings.NOTIFICATION_EMAIL_BATCH_SIZE
+        for messages, recipients in recipients_by_content.items():
+            subject = f"TruCar: {len(messages)} novo(s) alerta(s)"
+            items = "".join(f"<li>{escape(m)}</li>" for m in messages)
+            message_html = f"<html><body><p>Novos alertas da sua frota:</p><ul>{items}</ul></body></html>"
+            for i in range(0, len(recipients), batch_size):
+                try:
+                    # O delay() fala com o broker de forma síncrona: fora do event loop
+                    await run_in_threadpool(
+                        send_email_async.delay,
+                        to_emails=recipients[i:i + batch_size],
+                        subject=subject,
+                        message_html=message_html
+                    )
+                except Exception as e:
+                    # As notificações já estão gravadas; a falha do broker não desfaz a verificação
+                    logger.error(f"Falha ao enfileirar e-mails de alertas da organização {self.organization_id}: {e}")
+# --- FIM DO ENVIO EM LOTE ---
 
 
 async def get_notifications_for_user(db: AsyncSession, *, user_id: int, organization_id: int) -> list[Notification]:
@@ -70,13 +210,21 @@ async def get_notifications_for_user(db: AsyncSession, *, user_id: int, organiza
     return result.scalars().all()
 
 async def get_unread_notifications_count(db: AsyncSession, *, user_id: int, organization_id: int) -> int:
+    cached = await unread_counters.get(organization_id, user_id)
+    if cached is not None:
+        return cached
+    # Antes do COUNT: um ajuste durante a contagem impede que o resultado vá para o cache
+    token = await unread_counters.begin_load(organization_id, user_id)
     stmt = select(func.count(Notification.id)).where(
         Notification.user_id == user_id,
         Notification.is_read == False,
         Notification.organization_id == organization_id
     )
-    result = await db.execute(stmt)
-    return result.scalar_one()
+    # O contador fica em cache e recebe ajustes do primário: conta-se no primário
+    async with primary_session(db) as source:
+        count = (await source.execute(stmt)).scalar_one()
+    await unread_counters.fill(organization_id, user_id, token, count)
+    return count
 
 # --- FUNÇÃO CORRIGIDA PARA O ERRO 500 ---
 async def mark_notification_as_read(db: AsyncSession, *, notification_id: int, user_id: int, organization_id: int) -> Notification | None:
@@ -94,16 +242,38 @@ async def mark_notification_as_read(db: AsyncSession, *, notification_id: int, u
     )
     notification = await db.scalar(stmt)
     
-    if notification:
-        notification.is_read = True
-        db.add(notification)
+    if notification and not notification.is_read:
+        # UPDATE condicional: dois pedidos simultâneos não descontam a mesma notificação duas vezes
+        result = await db.execute(
+            update(Notification)
+            .where(Notification.id == notification.id, Notification.is_read == False)
+            .values(is_read=True)
+        )
         await db.commit()
         await db.refresh(notification)
+        if result.rowcount:
+            await unread_counters.incr(organization_id, user_id, -1)
     return notification
 # --- FIM DA CORREÇÃO ---
 
-async def run_system_checks_for_organization(db: AsyncSession, *, organization_id: int):
-    print(f"A verificar alertas para a Organização ID: {organization_id}")
+async def mark_all_notifications_as_read(db: AsyncSession, *, user_id: int, organization_id: int) -> int:
+    """Marca todas as notificações não lidas do usuário com um único UPDATE. Retorna quantas mudaram."""
+    stmt = update(Notification).where(
+        Notification.user_id == user_id,
+        Notification.organization_id == organization_id,
+        Notification.is_read == False
+    ).values(is_read=True)
+    result = await db.execute(stmt)
+    await db.commit()
+    # Descarta em vez de gravar 0: uma notificação criada entretanto não se perde
+    await unread_counters.delete(organization_id, user_id)
+    return result.rowcount
+
+async def run_system_checks_for_organization(db: AsyncSession, *, organization_id: int) -> int:
+    logger.info(f"A verificar alertas para a Organização ID: {organization_id}")
+    batch = NotificationBatch(
+        db, organization_id=organization_id, send_emails=settings.SYSTEM_CHECK_EMAILS_ENABLED
+    )
     
     date_threshold = datetime.utcnow().date() + timedelta(days=14)
     vehicles_due_date_stmt = select(Vehicle).where(
@@ -113,7 +283,7 @@ async def run_system_checks_for_organization(db: AsyncSession, *, organization_i
     )
     for vehicle in (await db.execute(vehicles_due_date_stmt)).scalars().all():
         message = f"Manutenção agendada para {vehicle.brand} {vehicle.model} em {vehicle.next_maintenance_date.strftime('%d/%m/%Y')}."
-        await create_notification(db, message=message, notification_type=NotificationType.MAINTENANCE_DUE_DATE, organization_id=organization_id, send_to_managers=True, related_vehicle_id=vehicle.id)
+        batch.add(message=message, notification_type=NotificationType.MAINTENANCE_DUE_DATE, send_to_managers=True, related_vehicle_id=vehicle.id)
 
     vehicles_due_km_stmt = select(Vehicle).where(
         Vehicle.organization_id == organization_id,
@@ -123,7 +293,7 @@ async def run_system_checks_for_organization(db: AsyncSession, *, organization_i
     )
     for vehicle in (await db.execute(vehicles_due_km_stmt)).scalars().all():
         message = f"{vehicle.brand} {vehicle.model} está a {vehicle.next_maintenance_km - vehicle.current_km}km da próxima manutenção."
-        await create_notification(db, message=message, notification_type=NotificationType.MAINTENANCE_DUE_KM, organization_id=organization_id, send_to_managers=True, related_vehicle_id=vehicle.id)
+        batch.add(message=message, notification_type=NotificationType.MAINTENANCE_DUE_KM, send_to_managers=True, related_vehicle_id=vehicle.id)
 
     doc_date_threshold = datetime.utcnow().date() + timedelta(days=30)
     docs_expiring_stmt = select(Document).where(
@@ -135,6 +305,8 @@ async def run_system_checks_for_organization(db: AsyncSession, *, organization_i
     for doc in (await db.execute(docs_expiring_stmt)).scalars().all():
         target_name = doc.vehicle.model if doc.vehicle else doc.driver.full_name
         message = f"O documento '{doc.document_type}' de {target_name} vence em {doc.expiry_date.strftime('%d/%m/%Y')}."
-        await create_notification(db, message=message, notification_type=NotificationType.DOCUMENT_EXPIRING, organization_id=organization_id, send_to_managers=True, related_entity_type="document", related_entity_id=doc.id, related_vehicle_id=doc.vehicle_id)
-        
-    print(f"Verificação de alertas concluída para a Organização ID: {organization_id}")
\ No newline at end of file
+        batch.add(message=message, notification_type=NotificationType.DOCUMENT_EXPIRING, send_to_managers=True, related_entity_type="document", related_entity_id=doc.id, related_vehicle_id=doc.vehicle_id)
+
+    created = await batch.flush()
+    logger.info(f"Verificação de alertas concluída para a Organização ID: {organization_id} ({created} novas notificações)")
+    return created
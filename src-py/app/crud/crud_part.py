@@ -10,6 +10,7 @@ from app.models.vehicle_cost_model import VehicleCost, CostType
 from app.models.inventory_transaction_model import InventoryTransaction
 from app.models.vehicle_model import Vehicle 
 from app.crud.crud_user import count_by_org
+from app.crud.base import paginate_keyset
 from app.models.part_model import Part, InventoryItem, InventoryItemStatus, PartCategory
 from . import crud_inventory_transaction as crud_transaction
 from app.schemas.part_schema import PartCreate, PartUpdate
@@ -85,8 +86,15 @@ async def get_all_items_paginated(
     status: Optional[InventoryItemStatus] = None, 
     part_id: Optional[int] = None, 
     vehicle_id: Optional[int] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
+    """
+    Itens de estoque da organização. Com `cursor` (ou na primeira página) pagina por
+    keyset e devolve next_cursor; OFFSET fica só para pedidos antigos com skip > 0.
+    A contagem total é opcional (include_total), pois é a parte mais cara.
+    """
     stmt = select(InventoryItem).where(
         InventoryItem.organization_id == organization_id
     ).options(
@@ -122,12 +130,21 @@ async def get_all_items_paginated(
         stmt = stmt.where(or_(*search_filters))
         count_stmt = count_stmt.where(or_(*search_filters))
 
-    total = (await db.execute(count_stmt)).scalar_one_or_none() or 0
+    total = None
+    if include_total:
+        total = (await db.execute(count_stmt)).scalar_one_or_none() or 0
+    if cursor or not skip:
+        page = await paginate_keyset(
+            db, stmt, order_by=[InventoryItem.part_id, InventoryItem.item_identifier, InventoryItem.id],
+            limit=limit, cursor=cursor
+        )
+        return {"total": total, "items": page.items, "next_cursor": page.next_cursor}
+
     items = (await db.execute(
-        stmt.order_by(InventoryItem.part_id, InventoryItem.item_identifier)
+        stmt.order_by(InventoryItem.part_id, InventoryItem.item_identifier, InventoryItem.id)
             .offset(skip).limit(limit)
     )).scalars().all()
-    return {"total": total, "items": items}
+    return {"total": total, "items": items, "next_cursor": None}
 
 async def get_item_with_details(db: AsyncSession, *, item_id: int, organization_id: int) -> Optional[InventoryItem]:
     stmt = select(InventoryItem).where(
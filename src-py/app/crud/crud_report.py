@@ -2,6 +2,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_, and_, desc
 from datetime import datetime, timedelta, date
 from typing import List, Optional, Dict, Any
+import heapq
 import logging
 from sqlalchemy.orm import selectinload
 
@@ -22,6 +23,10 @@ from app.models.fine_model import Fine
 from app.models.document_model import Document
 from app.models.tire_model import VehicleTire as Tire
 from app.models.inventory_transaction_model import InventoryTransaction
+from app.models.rollup_model import DailyActivityRollup, DailyCostRollup
+
+from app.crud import crud_rollup
+from app.services.position_buffer import position_buffer
 
 # --- IMPORTS DE SCHEMAS ---
 from app.schemas.dashboard_schema import KpiEfficiency, AlertSummary, GoalStatus, VehiclePosition
@@ -70,68 +75,89 @@ async def get_fleet_management_data(
 ) -> FleetManagementReport:
     """
     Agrega dados de custo e performance de toda a frota para um período.
+    Os totais por veículo e por categoria são calculados no banco; em Python
+    ficam apenas as métricas derivadas e os rankings.
     """
-    # 1. Obter todos os veículos da organização
-    vehicles_stmt = select(Vehicle).where(Vehicle.organization_id == organization_id)
-    vehicles = (await db.execute(vehicles_stmt)).scalars().all()
-    
-    # 2. Obter todos os custos e abastecimentos do período
-    costs_stmt = select(VehicleCost).where(
-        VehicleCost.organization_id == organization_id,
-        VehicleCost.date.between(start_date, end_date)
-    )
-    fuel_logs_stmt = select(FuelLog).where(
-        FuelLog.organization_id == organization_id,
-        func.date(FuelLog.timestamp).between(start_date, end_date)
+    period_start = datetime.combine(start_date, datetime.min.time())
+    period_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+    # 1. Custos por categoria no período
+    categories_stmt = (
+        select(VehicleCost.cost_type, func.sum(VehicleCost.amount).label("total_amount"))
+        .where(
+            VehicleCost.organization_id == organization_id,
+            VehicleCost.date.between(start_date, end_date)
+        )
+        .group_by(VehicleCost.cost_type)
     )
-    
-    all_costs = (await db.execute(costs_stmt)).scalars().all()
-    all_fuel_logs = (await db.execute(fuel_logs_stmt)).scalars().all()
+    costs_by_category: Dict[str, float] = {
+        str(row.cost_type.value): float(row.total_amount or 0)
+        for row in (await db.execute(categories_stmt)).all()
+    }
+    total_fleet_cost = sum(costs_by_category.values())
 
-    # 3. Calcular Resumos
-    total_fleet_cost = sum(c.amount for c in all_costs)
-    
-    costs_by_category: Dict[str, float] = {}
-    for cost in all_costs:
-        category_key = str(cost.cost_type.value)
-        costs_by_category[category_key] = costs_by_category.get(category_key, 0) + cost.amount
+    # 2. Totais por veículo: custo, odómetro mínimo/máximo e litros abastecidos
+    costs = (
+        select(VehicleCost.vehicle_id, func.sum(VehicleCost.amount).label("total_cost"))
+        .where(
+            VehicleCost.organization_id == organization_id,
+            VehicleCost.date.between(start_date, end_date)
+        )
+        .group_by(VehicleCost.vehicle_id)
+        .subquery()
+    )
+    fuel = (
+        select(
+            FuelLog.vehicle_id,
+            func.min(FuelLog.odometer).label("min_odometer"),
+            func.max(FuelLog.odometer).label("max_odometer"),
+            func.sum(FuelLog.liters).label("total_liters"),
+        )
+        .where(
+            FuelLog.organization_id == organization_id,
+            FuelLog.timestamp >= period_start,
+            FuelLog.timestamp < period_end
+        )
+        .group_by(FuelLog.vehicle_id)
+        .subquery()
+    )
+    vehicles_stmt = (
+        select(
+            Vehicle.id,
+            Vehicle.license_plate,
+            Vehicle.identifier,
+            func.coalesce(costs.c.total_cost, 0).label("total_cost"),
+            func.coalesce(fuel.c.max_odometer - fuel.c.min_odometer, 0).label("distance"),
+            func.coalesce(fuel.c.total_liters, 0).label("total_liters"),
+        )
+        .outerjoin(costs, costs.c.vehicle_id == Vehicle.id)
+        .outerjoin(fuel, fuel.c.vehicle_id == Vehicle.id)
+        .where(Vehicle.organization_id == organization_id)
+    )
 
-    # 4. Processar dados por veículo
+    # 3. Métricas derivadas por veículo
     vehicle_metrics: List[Dict] = []
     total_fleet_distance = 0.0
 
-    for vehicle in vehicles:
-        costs = [c for c in all_costs if c.vehicle_id == vehicle.id]
-        fuel_logs = [f for f in all_fuel_logs if f.vehicle_id == vehicle.id]
-        
-        total_cost = sum(c.amount for c in costs)
-        
-        distance = 0.0
-        if len(fuel_logs) > 1:
-            sorted_logs = sorted(fuel_logs, key=lambda log: log.odometer or 0)
-            min_odo = sorted_logs[0].odometer or 0
-            max_odo = sorted_logs[-1].odometer or 0
-            distance = float(max_odo - min_odo)
-        
+    for row in (await db.execute(vehicles_stmt)).all():
+        total_cost = float(row.total_cost)
+        distance = float(row.distance)
+        total_liters = float(row.total_liters)
         total_fleet_distance += distance
-        
-        total_liters = sum(log.liters for log in fuel_logs if log.liters)
-        avg_consumption = (distance / total_liters) if total_liters > 0 else 0
-        cost_per_km = (total_cost / distance) if distance > 0 else 0
 
         vehicle_metrics.append({
-            "id": vehicle.id,
-            "identifier": vehicle.license_plate or vehicle.identifier,
+            "id": row.id,
+            "identifier": row.license_plate or row.identifier,
             "total_cost": total_cost,
-            "cost_per_km": cost_per_km,
-            "avg_consumption": avg_consumption
+            "cost_per_km": (total_cost / distance) if distance > 0 else 0,
+            "avg_consumption": (distance / total_liters) if total_liters > 0 else 0
         })
 
-    # 5. Rankings
-    top_expensive = sorted(vehicle_metrics, key=lambda v: v.get('total_cost', 0), reverse=True)[:5]
-    top_cost_per_km = sorted(vehicle_metrics, key=lambda v: v.get('cost_per_km', 0), reverse=True)[:5]
-    top_efficient = sorted(vehicle_metrics, key=lambda v: v.get('avg_consumption', 0), reverse=True)[:5]
-    least_efficient = sorted([v for v in vehicle_metrics if v.get('avg_consumption', 0) > 0], key=lambda v: v.get('avg_consumption', 0))[:5]
+    # 4. Rankings
+    top_expensive = heapq.nlargest(5, vehicle_metrics, key=lambda v: v.get('total_cost', 0))
+    top_cost_per_km = heapq.nlargest(5, vehicle_metrics, key=lambda v: v.get('cost_per_km', 0))
+    top_efficient = heapq.nlargest(5, vehicle_metrics, key=lambda v: v.get('avg_consumption', 0))
+    least_efficient = heapq.nsmallest(5, [v for v in vehicle_metrics if v.get('avg_consumption', 0) > 0], key=lambda v: v.get('avg_consumption', 0))
 
     summary = FleetReportSummary(
         total_cost=total_fleet_cost,
@@ -155,52 +181,106 @@ async def get_fleet_management_data(
 
 # --- DASHBOARD FUNCTIONS ---
 
-async def get_dashboard_kpis(db: AsyncSession, *, organization_id: int) -> dict:
-    stmt = select(Vehicle.status, func.count(Vehicle.id)).where(
-        Vehicle.organization_id == organization_id
-    ).group_by(Vehicle.status)
-    
-    result = await db.execute(stmt)
-    status_counts = {status: count for status, count in result.all()}
-
-    maintenance_stmt = select(func.count(func.distinct(MaintenanceRequest.vehicle_id))).where(
+async def get_dashboard_totals(db: AsyncSession, *, organization_id: int, start_date: date) -> Dict[str, Any]:
+    """
+    Contagens e totais partilhados pelos blocos de KPIs do dashboard numa única ida
+    ao banco: setor da organização, veículos por status, veículos em manutenção e
+    litros abastecidos desde start_date.
+    """
+    vehicle_counts = (
+        select(
+            func.count(Vehicle.id).label("total"),
+            func.count(Vehicle.id).filter(Vehicle.status == VehicleStatus.AVAILABLE).label("available"),
+            func.count(Vehicle.id).filter(Vehicle.status == VehicleStatus.IN_USE).label("in_use"),
+        )
+        .where(Vehicle.organization_id == organization_id)
+        .subquery()
+    )
+    sector = select(Organization.sector).where(Organization.id == organization_id).scalar_subquery()
+    maintenance = select(func.count(func.distinct(MaintenanceRequest.vehicle_id))).where(
         MaintenanceRequest.organization_id == organization_id,
         MaintenanceRequest.status.notin_([MaintenanceStatus.CONCLUIDA, MaintenanceStatus.REJEITADA])
+    ).scalar_subquery()
+    if await crud_rollup.covers(db, organization_id=organization_id, start_date=start_date):
+        liters = select(func.sum(DailyActivityRollup.fuel_liters)).where(
+            DailyActivityRollup.organization_id == organization_id,
+            DailyActivityRollup.day >= start_date
+        ).scalar_subquery()
+    else:
+        liters = select(func.sum(FuelLog.liters)).where(
+            FuelLog.organization_id == organization_id,
+            FuelLog.timestamp >= start_date
+        ).scalar_subquery()
+
+    stmt = select(
+        sector.label("sector"),
+        vehicle_counts.c.total,
+        vehicle_counts.c.available,
+        vehicle_counts.c.in_use,
+        maintenance.label("maintenance"),
+        liters.label("liters"),
     )
-    active_maintenance_count = (await db.execute(maintenance_stmt)).scalar_one_or_none() or 0
+    row = (await db.execute(stmt)).one()
+    return {
+        "sector": row.sector,
+        "total_vehicles": row.total or 0,
+        "available_vehicles": row.available or 0,
+        "in_use_vehicles": row.in_use or 0,
+        "maintenance_vehicles": row.maintenance or 0,
+        "total_liters": float(row.liters or 0.0),
+    }
 
+def build_dashboard_kpis(totals: Dict[str, Any]) -> dict:
     kpis_model = DashboardKPIs(
-        total_vehicles=sum(status_counts.values()),
-        available_vehicles=status_counts.get(VehicleStatus.AVAILABLE.value, 0),
-        in_use_vehicles=status_counts.get(VehicleStatus.IN_USE.value, 0),
-        maintenance_vehicles=active_maintenance_count,
+        total_vehicles=totals["total_vehicles"],
+        available_vehicles=totals["available_vehicles"],
+        in_use_vehicles=totals["in_use_vehicles"],
+        maintenance_vehicles=totals["maintenance_vehicles"],
     )
     return kpis_model.model_dump()
 
+async def get_dashboard_kpis(db: AsyncSession, *, organization_id: int) -> dict:
+    totals = await get_dashboard_totals(db, organization_id=organization_id, start_date=datetime.utcnow().date())
+    return build_dashboard_kpis(totals)
+
 async def get_costs_by_category_last_30_days(db: AsyncSession, *, organization_id: int, start_date: date | None = None) -> List[CostByCategory]:
     if not start_date:
         start_date = datetime.utcnow().date() - timedelta(days=30)
     
-    stmt = (
-        select(
-            VehicleCost.cost_type,
-            func.sum(VehicleCost.amount).label("total_amount")
+    if await crud_rollup.covers(db, organization_id=organization_id, start_date=start_date):
+        stmt = (
+            select(
+                DailyCostRollup.cost_type,
+                func.sum(DailyCostRollup.amount).label("total_amount")
+            )
+            .where(
+                DailyCostRollup.organization_id == organization_id,
+                DailyCostRollup.day >= start_date
+            )
+            .group_by(DailyCostRollup.cost_type)
+            .order_by(func.sum(DailyCostRollup.amount).desc())
         )
-        .where(
-            VehicleCost.organization_id == organization_id,
-            VehicleCost.date >= start_date
+    else:
+        stmt = (
+            select(
+                VehicleCost.cost_type,
+                func.sum(VehicleCost.amount).label("total_amount")
+            )
+            .where(
+                VehicleCost.organization_id == organization_id,
+                VehicleCost.date >= start_date
+            )
+            .group_by(VehicleCost.cost_type)
+            .order_by(func.sum(VehicleCost.amount).desc())
         )
-        .group_by(VehicleCost.cost_type)
-        .order_by(func.sum(VehicleCost.amount).desc())
-    )
     
     result = await db.execute(stmt)
     return [CostByCategory(cost_type=row.cost_type.value, total_amount=float(row.total_amount or 0)) for row in result.all()]
 
-async def get_podium_drivers(db: AsyncSession, *, organization_id: int) -> List[DashboardPodiumDriver]:
+async def get_podium_drivers(db: AsyncSession, *, organization_id: int, sector: Optional[str] = None) -> List[DashboardPodiumDriver]:
     # Importação interna para evitar erro circular
     from app import crud
-    leaderboard_data = await crud.user.get_leaderboard_data(db, organization_id=organization_id)
+    leaderboard_data = await crud.user.get_leaderboard_data(db, organization_id=organization_id, sector=sector)
     top_drivers_raw = leaderboard_data.get("leaderboard", [])[:3]
     
     result = []
@@ -214,37 +294,66 @@ async def get_podium_drivers(db: AsyncSession, *, organization_id: int) -> List[
         
     return result
 
-async def get_km_per_day_last_30_days(db: AsyncSession, *, organization_id: int, start_date: date | None = None) -> List[KmPerDay]:
-    if not start_date:
-        start_date = datetime.utcnow().date() - timedelta(days=30)
-        
-    org = await db.get(Organization, organization_id)
-    if not org: return []
-
-    if org.sector == 'agronegocio':
-        distance_col = func.sum(Journey.end_engine_hours - Journey.start_engine_hours)
-        filter_col = Journey.end_engine_hours.is_not(None)
-    else:
-        distance_col = func.sum(Journey.end_mileage - Journey.start_mileage)
-        filter_col = Journey.end_mileage.is_not(None)
+async def get_distance_per_day(db: AsyncSession, *, organization_id: int, start_date: date) -> List[Any]:
+    """
+    Soma diária das jornadas finalizadas com as duas métricas (km e horas de motor),
+    para que o setor da organização só seja necessário na hora de escolher a coluna.
+    Lê dos resumos diários quando eles cobrem o período.
+    """
+    if await crud_rollup.covers(db, organization_id=organization_id, start_date=start_date):
+        stmt = (
+            select(
+                DailyActivityRollup.day.label("date"),
+                func.sum(DailyActivityRollup.distance_km).label("total_km"),
+                func.sum(DailyActivityRollup.engine_hours).label("total_hours"),
+            )
+            .where(
+                DailyActivityRollup.organization_id == organization_id,
+                DailyActivityRollup.day >= start_date,
+                DailyActivityRollup.journeys_count > 0,
+            )
+            .group_by(DailyActivityRollup.day)
+            .order_by(DailyActivityRollup.day)
+        )
+        return (await db.execute(stmt)).all()
 
     stmt = (
         select(
             func.date(Journey.start_time).label("date"),
-            distance_col.label("total_km")
+            func.sum(Journey.end_mileage - Journey.start_mileage).label("total_km"),
+            func.sum(Journey.end_engine_hours - Journey.start_engine_hours).label("total_hours"),
         )
         .where(
             Journey.organization_id == organization_id,
             Journey.is_active == False,
             func.date(Journey.start_time) >= start_date,
-            filter_col
         )
         .group_by(func.date(Journey.start_time))
         .order_by(func.date(Journey.start_time))
     )
-
     result = await db.execute(stmt)
-    return [KmPerDay(date=row.date, total_km=float(row.total_km or 0)) for row in result.all()]
+    return result.all()
+
+def build_km_per_day(rows: List[Any], sector: Optional[str]) -> List[KmPerDay]:
+    metric = "total_hours" if sector == 'agronegocio' else "total_km"
+    return [
+        KmPerDay(date=row.date, total_km=float(getattr(row, metric)))
+        for row in rows if getattr(row, metric) is not None
+    ]
+
+async def get_km_per_day_last_30_days(
+    db: AsyncSession, *, organization_id: int, start_date: date | None = None, sector: Optional[str] = None
+) -> List[KmPerDay]:
+    if not start_date:
+        start_date = datetime.utcnow().date() - timedelta(days=30)
+
+    if sector is None:
+        org = await db.get(Organization, organization_id)
+        if not org: return []
+        sector = org.sector
+
+    rows = await get_distance_per_day(db, organization_id=organization_id, start_date=start_date)
+    return build_km_per_day(rows, sector)
 
 async def get_upcoming_maintenances(db: AsyncSession, *, organization_id: int) -> List[UpcomingMaintenance]:
     today = datetime.utcnow().date()
@@ -274,35 +383,15 @@ async def get_upcoming_maintenances(db: AsyncSession, *, organization_id: int) -
 
 # --- DASHBOARD AVANÇADO ---
 
-async def get_efficiency_kpis(db: AsyncSession, *, organization_id: int, start_date: date) -> KpiEfficiency:
-    # 1. Calcular Custos Totais (Para Custo por KM)
-    costs_stmt = select(func.sum(VehicleCost.amount)).where(
-        VehicleCost.organization_id == organization_id,
-        VehicleCost.date >= start_date
-    )
-    total_costs = (await db.execute(costs_stmt)).scalar_one_or_none() or 0
-
-    # 2. Calcular Distância Total (Denominador comum)
-    # Reutiliza a função interna, passando os parâmetros necessários
-    km_data = await get_km_per_day_last_30_days(db, organization_id=organization_id, start_date=start_date)
-    total_distance = sum(item.total_km for item in km_data)
-    
-    # 3. Calcular Litros Totais (Para Eficiência de Combustível)
-    fuel_stmt = select(func.sum(FuelLog.liters)).where(
-        FuelLog.organization_id == organization_id,
-        FuelLog.timestamp >= start_date
-    )
-    total_liters = (await db.execute(fuel_stmt)).scalar_one_or_none() or 0.0
+def build_efficiency_kpis(totals: Dict[str, Any], *, total_costs: float, total_distance: float) -> KpiEfficiency:
+    total_liters = totals["total_liters"]
 
     # --- MÉTRICA 1: Custo Financeiro (R$/km) ---
     cost_per_km = (total_costs / total_distance) if total_distance > 0 else 0
 
     # --- MÉTRICA 2: Eficiência Operacional (km/l ou l/h) ---
-    org = await db.get(Organization, organization_id)
-    is_agro = org.sector == 'agronegocio' if org else False
-    
     fleet_efficiency = 0.0
-    if is_agro:
+    if totals["sector"] == 'agronegocio':
         # Agro: Litros por Hora (Consumo - quanto menor, melhor)
         fleet_efficiency = (total_liters / total_distance) if total_distance > 0 else 0
     else:
@@ -310,16 +399,8 @@ async def get_efficiency_kpis(db: AsyncSession, *, organization_id: int, start_d
         fleet_efficiency = (total_distance / total_liters) if total_liters > 0 else 0
 
     # --- MÉTRICA 3: Taxa de Utilização ---
-    total_vehicles_stmt = select(func.count(Vehicle.id)).where(Vehicle.organization_id == organization_id)
-    total_vehicles = (await db.execute(total_vehicles_stmt)).scalar_one()
-
-    in_use_vehicles_stmt = select(func.count(Vehicle.id)).where(
-        Vehicle.organization_id == organization_id,
-        Vehicle.status == VehicleStatus.IN_USE
-    )
-    in_use_vehicles = (await db.execute(in_use_vehicles_stmt)).scalar_one()
-
-    utilization_rate = (in_use_vehicles / total_vehicles) * 100 if total_vehicles > 0 else 0
+    total_vehicles = totals["total_vehicles"]
+    utilization_rate = (totals["in_use_vehicles"] / total_vehicles) * 100 if total_vehicles > 0 else 0
 
     return KpiEfficiency(
         cost_per_km=cost_per_km, 
@@ -327,6 +408,31 @@ async def get_efficiency_kpis(db: AsyncSession, *, organization_id: int, start_d
         utilization_rate=utilization_rate
     )
 
+async def get_total_costs(
+    db: AsyncSession, *, organization_id: int, start_date: date, end_date: date | None = None
+) -> float:
+    """Soma dos custos da organização no período, a partir dos resumos diários quando cobertos."""
+    if await crud_rollup.covers(db, organization_id=organization_id, start_date=start_date):
+        amount, day = DailyCostRollup.amount, DailyCostRollup.day
+        stmt = select(func.sum(amount)).where(DailyCostRollup.organization_id == organization_id)
+    else:
+        amount, day = VehicleCost.amount, VehicleCost.date
+        stmt = select(func.sum(amount)).where(VehicleCost.organization_id == organization_id)
+    stmt = stmt.where(day >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(day <= end_date)
+    return (await db.execute(stmt)).scalar_one_or_none() or 0
+
+async def get_efficiency_kpis(db: AsyncSession, *, organization_id: int, start_date: date) -> KpiEfficiency:
+    totals = await get_dashboard_totals(db, organization_id=organization_id, start_date=start_date)
+
+    total_costs = await get_total_costs(db, organization_id=organization_id, start_date=start_date)
+
+    km_data = build_km_per_day(await get_distance_per_day(db, organization_id=organization_id, start_date=start_date), totals["sector"])
+    total_distance = sum(item.total_km for item in km_data)
+
+    return build_efficiency_kpis(totals, total_costs=total_costs, total_distance=total_distance)
+
 async def get_recent_alerts(
     db: AsyncSession, organization_id: int, limit: int = 5
 ) -> List[AlertSummary]:
@@ -424,11 +530,9 @@ async def get_active_goal_with_progress(db: AsyncSession, *, organization_id: in
 
     current_value = 0
     if active_goal.unit == "R$":
-        costs_stmt = select(func.sum(VehicleCost.amount)).where(
-            VehicleCost.organization_id == organization_id,
-            VehicleCost.date.between(active_goal.period_start, active_goal.period_end)
+        current_value = await get_total_costs(
+            db, organization_id=organization_id, start_date=active_goal.period_start, end_date=active_goal.period_end
         )
-        current_value = (await db.execute(costs_stmt)).scalar_one_or_none() or 0
 
     return GoalStatus(
         title=active_goal.title,
@@ -438,14 +542,30 @@ async def get_active_goal_with_progress(db: AsyncSession, *, organization_id: in
     )
 
 async def get_vehicle_positions(db: AsyncSession, *, organization_id: int) -> List[VehiclePosition]:
+    # Posições ainda no buffer write-behind são mais recentes do que as do banco
+    pending = position_buffer.pending_for_org(organization_id)
     stmt = select(Vehicle).where(
         Vehicle.organization_id == organization_id,
-        Vehicle.last_latitude.is_not(None),
-        Vehicle.last_longitude.is_not(None),
+        or_(
+            and_(Vehicle.last_latitude.is_not(None), Vehicle.last_longitude.is_not(None)),
+            Vehicle.id.in_(list(pending)),
+        ),
     )
     result = await db.execute(stmt)
     vehicles = result.scalars().all()
-    return [VehiclePosition.from_orm(v) for v in vehicles]
+
+    positions = []
+    for v in vehicles:
+        buffered = pending.get(v.id)
+        positions.append(VehiclePosition(
+            id=v.id,
+            license_plate=v.license_plate,
+            identifier=v.identifier,
+            latitude=buffered.latitude if buffered else v.last_latitude,
+            longitude=buffered.longitude if buffered else v.last_longitude,
+            status=(buffered.status if buffered and buffered.status else v.status).value,
+        ))
+    return positions
     
 async def get_vehicle_consolidated_data(
     db: AsyncSession,
@@ -615,6 +735,99 @@ async def get_vehicle_consolidated_data(
         tires_detailed=tires_data if sections.tires_detailed else None
     )
 
+async def get_driver_aggregates(
+    db: AsyncSession,
+    *,
+    organization_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    driver_ids: Optional[List[int]] = None,
+    finished_journeys_only: bool = False,
+) -> Dict[int, Any]:
+    """
+    Agrega os indicadores de todos os motoristas numa única consulta: cada métrica é
+    uma subconsulta agrupada por driver_id (jornadas, combustível, manutenção e
+    alertas) unida à tabela de utilizadores. O período é [start, end).
+    Sem driver_ids, considera todos os motoristas da organização.
+    Retorna {driver_id: linha}.
+    """
+    def in_period(column) -> list:
+        conditions = []
+        if start is not None:
+            conditions.append(column >= start)
+        if end is not None:
+            conditions.append(column < end)
+        return conditions
+
+    journey_filters = [Journey.organization_id == organization_id, *in_period(Journey.start_time)]
+    if finished_journeys_only:
+        journey_filters.append(Journey.is_active == False)
+    journeys = (
+        select(
+            Journey.driver_id.label("driver_id"),
+            func.count(Journey.id).label("total_journeys"),
+            func.sum(Journey.end_mileage - Journey.start_mileage).label("total_distance"),
+            func.sum(Journey.end_engine_hours - Journey.start_engine_hours).label("total_hours"),
+        )
+        .where(*journey_filters)
+        .group_by(Journey.driver_id)
+        .subquery()
+    )
+    fuel = (
+        select(
+            FuelLog.user_id.label("driver_id"),
+            func.sum(FuelLog.liters).label("total_liters"),
+            func.sum(FuelLog.total_cost).label("total_fuel_cost"),
+        )
+        .where(FuelLog.organization_id == organization_id, *in_period(FuelLog.timestamp))
+        .group_by(FuelLog.user_id)
+        .subquery()
+    )
+    maintenance = (
+        select(
+            MaintenanceRequest.reported_by_id.label("driver_id"),
+            func.count(MaintenanceRequest.id).label("maintenance_requests"),
+        )
+        .where(MaintenanceRequest.organization_id == organization_id, *in_period(MaintenanceRequest.created_at))
+        .group_by(MaintenanceRequest.reported_by_id)
+        .subquery()
+    )
+    alerts = (
+        select(
+            Alert.driver_id.label("driver_id"),
+            func.count(Alert.id).label("alerts"),
+        )
+        .where(Alert.organization_id == organization_id, *in_period(Alert.timestamp))
+        .group_by(Alert.driver_id)
+        .subquery()
+    )
+
+    stmt = (
+        select(
+            User.id.label("driver_id"),
+            User.full_name,
+            func.coalesce(journeys.c.total_journeys, 0).label("total_journeys"),
+            func.coalesce(journeys.c.total_distance, 0).label("total_distance"),
+            func.coalesce(journeys.c.total_hours, 0).label("total_hours"),
+            func.coalesce(fuel.c.total_liters, 0).label("total_liters"),
+            func.coalesce(fuel.c.total_fuel_cost, 0).label("total_fuel_cost"),
+            func.coalesce(maintenance.c.maintenance_requests, 0).label("maintenance_requests"),
+            func.coalesce(alerts.c.alerts, 0).label("alerts"),
+        )
+        .outerjoin(journeys, journeys.c.driver_id == User.id)
+        .outerjoin(fuel, fuel.c.driver_id == User.id)
+        .outerjoin(maintenance, maintenance.c.driver_id == User.id)
+        .outerjoin(alerts, alerts.c.driver_id == User.id)
+        .where(User.organization_id == organization_id)
+    )
+    if driver_ids is not None:
+        stmt = stmt.where(User.id.in_(driver_ids))
+    else:
+        stmt = stmt.where(User.role == UserRole.DRIVER)
+
+    result = await db.execute(stmt)
+    return {row.driver_id: row for row in result.all()}
+
 async def get_driver_performance_data(
     db: AsyncSession, *, start_date: date, end_date: date, organization_id: int
 ) -> DriverPerformanceReport:
@@ -622,53 +835,33 @@ async def get_driver_performance_data(
     Busca e agrega dados de desempenho para todos os motoristas de uma organização
     em um período específico.
     """
-    drivers_stmt = select(User).where(
-        User.organization_id == organization_id, 
-        User.role == 'driver'
+    aggregates = await get_driver_aggregates(
+        db,
+        organization_id=organization_id,
+        start=datetime.combine(start_date, datetime.min.time()),
+        end=datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
     )
-    drivers = (await db.execute(drivers_stmt)).scalars().all()
 
     drivers_performance_data: List[DriverPerformanceEntry] = []
+    for row in aggregates.values():
+        total_distance = float(row.total_distance)
+        total_liters = float(row.total_liters)
+        total_fuel_cost = float(row.total_fuel_cost)
 
-    for driver in drivers:
-        dist_expr = func.coalesce(Journey.end_mileage, 0) - func.coalesce(Journey.start_mileage, 0)
-        
-        journeys_stmt = select(func.count(Journey.id), func.sum(dist_expr)).where(
-            Journey.driver_id == driver.id,
-            func.date(Journey.start_time).between(start_date, end_date)
-        )
-        journey_metrics = (await db.execute(journeys_stmt)).first()
-        total_journeys = journey_metrics[0] or 0
-        total_distance = float(journey_metrics[1] or 0.0)
-
-        fuel_stmt = select(func.sum(FuelLog.liters), func.sum(FuelLog.total_cost)).where(
-            FuelLog.user_id == driver.id,
-            func.date(FuelLog.timestamp).between(start_date, end_date)
-        )
-        fuel_metrics = (await db.execute(fuel_stmt)).first()
-        total_liters = float(fuel_metrics[0] or 0.0)
-        total_fuel_cost = float(fuel_metrics[1] or 0.0)
-
-        maintenance_stmt = select(func.count(MaintenanceRequest.id)).where(
-            MaintenanceRequest.reported_by_id == driver.id,
-            func.date(MaintenanceRequest.created_at).between(start_date, end_date)
-        )
-        maintenance_count = (await db.execute(maintenance_stmt)).scalar_one_or_none() or 0
-        
         avg_consumption = (total_distance / total_liters) if total_liters > 0 else 0
         cost_per_km = (total_fuel_cost / total_distance) if total_distance > 0 else 0
 
         drivers_performance_data.append(
             DriverPerformanceEntry(
-                driver_id=driver.id,
-                driver_name=driver.full_name,
-                total_journeys=total_journeys,
+                driver_id=row.driver_id,
+                driver_name=row.full_name,
+                total_journeys=row.total_journeys,
                 total_distance_km=total_distance,
                 total_fuel_liters=total_liters,
                 average_consumption=avg_consumption,
                 total_fuel_cost=total_fuel_cost,
                 cost_per_km=cost_per_km,
-                maintenance_requests=maintenance_count,
+                maintenance_requests=row.maintenance_requests,
             )
         )
 
@@ -690,17 +883,35 @@ async def get_driver_activity_data(db: AsyncSession, driver_id: int, organizatio
     if not driver or driver.organization_id != organization_id:
         raise ValueError("Motorista não encontrado")
     
-    journeys_stmt = select(Journey).where(
+    journeys_stmt = select(Journey).options(selectinload(Journey.vehicle)).where(
         Journey.driver_id == driver_id,
+        Journey.organization_id == organization_id,
         func.date(Journey.start_time).between(date_from, date_to)
     ).order_by(Journey.start_time.desc())
     
     journeys = (await db.execute(journeys_stmt)).scalars().all()
-    
+
+    fuel_logs_stmt = select(FuelLog).options(selectinload(FuelLog.vehicle)).where(
+        FuelLog.user_id == driver_id,
+        FuelLog.organization_id == organization_id,
+        func.date(FuelLog.timestamp).between(date_from, date_to)
+    ).order_by(FuelLog.timestamp.desc())
+    fuel_logs = (await db.execute(fuel_logs_stmt)).scalars().all()
+
+    # O template é renderizado fora da sessão (pool de processos): tudo o que ele usa é carregado aqui
     return {
         "driver_name": driver.full_name,
         "period": f"{date_from.strftime('%d/%m/%Y')} a {date_to.strftime('%d/%m/%Y')}",
-        "journeys": journeys
+        "date_from": date_from.strftime('%d/%m/%Y'),
+        "date_to": date_to.strftime('%d/%m/%Y'),
+        "year": datetime.utcnow().year,
+        "journeys": journeys,
+        "fuel_logs": fuel_logs,
+        "summary": {
+            "total_journeys": len(journeys),
+            "total_km": sum((j.end_mileage or j.start_mileage) - j.start_mileage for j in journeys),
+            "total_fuel_cost": round(sum(log.total_cost for log in fuel_logs), 2),
+        },
     }
 
 async def get_dashboard_summary(db: AsyncSession, current_user: User, start_date: datetime) -> DashboardSummary:
@@ -0,0 +1,213 @@
+# backend/app/crud/crud_rollup.py
+
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, delete, insert, func, literal, null, text, union_all, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.core.cache import TTLCache
+from app.models.fuel_log_model import FuelLog
+from app.models.journey_model import Journey
+from app.models.rollup_model import DailyActivityRollup, DailyCostRollup, RollupCoverage
+from app.models.vehicle_cost_model import VehicleCost
+
+logger = logging.getLogger(__name__)
+
+# organization_id -> primeiro dia coberto (ou None quando não houve backfill)
+_coverage_cache = TTLCache("rollup_coverage", maxsize=4096, ttl=300)
+_NOT_COVERED = object()
+
+
+def _range_bounds(start: date, end: date) -> Tuple[datetime, datetime]:
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+
+def refresh_statements(organization_id: int, start: date, end: date) -> List:
+    """
+    Instruções (DELETE + INSERT ... SELECT) que recalculam os resumos da
+    organização entre start e end (inclusive) a partir dos dados brutos.
+    """
+    range_start, range_end = _range_bounds(start, end)
+
+    journey_day = func.date(Journey.start_time)
+    journeys = (
+        select(
+            Journey.vehicle_id.label("vehicle_id"),
+            Journey.driver_id.label("driver_id"),
+            journey_day.label("day"),
+            func.count(Journey.id).label("journeys_count"),
+            func.sum(Journey.end_mileage - Journey.start_mileage).label("distance_km"),
+            func.sum(Journey.end_engine_hours - Journey.start_engine_hours).label("engine_hours"),
+            null().label("fuel_liters"),
+            null().label("fuel_cost"),
+        )
+        .where(
+            Journey.organization_id == organization_id,
+            Journey.is_active == False,
+            Journey.start_time >= range_start,
+            Journey.start_time < range_end,
+        )
+        .group_by(Journey.vehicle_id, Journey.driver_id, journey_day)
+    )
+    fuel_day = func.date(FuelLog.timestamp)
+    fuel = (
+        select(
+            FuelLog.vehicle_id,
+            FuelLog.user_id,
+            fuel_day,
+            literal(0),
+            null(),
+            null(),
+            func.sum(FuelLog.liters),
+            func.sum(FuelLog.total_cost),
+        )
+        .where(
+            FuelLog.organization_id == organization_id,
+            FuelLog.timestamp >= range_start,
+            FuelLog.timestamp < range_end,
+        )
+        .group_by(FuelLog.vehicle_id, FuelLog.user_id, fuel_day)
+    )
+    activity = union_all(journeys, fuel).subquery()
+    activity_rows = select(
+        literal(organization_id),
+        activity.c.vehicle_id,
+        activity.c.driver_id,
+        activity.c.day,
+        func.sum(activity.c.journeys_count),
+        func.sum(activity.c.distance_km),
+        func.sum(activity.c.engine_hours),
+        func.sum(activity.c.fuel_liters),
+        func.sum(activity.c.fuel_cost),
+    ).group_by(activity.c.vehicle_id, activity.c.driver_id, activity.c.day)
+
+    cost_rows = (
+        select(
+            literal(organization_id),
+            VehicleCost.vehicle_id,
+            VehicleCost.date,
+            VehicleCost.cost_type,
+            func.sum(VehicleCost.amount),
+            func.count(VehicleCost.id),
+        )
+        .where(VehicleCost.organization_id == organization_id, VehicleCost.date.between(start, end))
+        .group_by(VehicleCost.vehicle_id, VehicleCost.date, VehicleCost.cost_type)
+    )
+
+    activity_table = DailyActivityRollup.__table__
+    cost_table = DailyCostRollup.__table__
+    return [
+        delete(activity_table).where(
+            activity_table.c.organization_id == organization_id, activity_table.c.day.between(start, end)
+        ),
+        insert(activity_table).from_select(
+            ["organization_id", "vehicle_id", "driver_id", "day", "journeys_count",
+             "distance_km", "engine_hours", "fuel_liters", "fuel_cost"],
+            activity_rows,
+        ),
+        delete(cost_table).where(
+            cost_table.c.organization_id == organization_id, cost_table.c.day.between(start, end)
+        ),
+        insert(cost_table).from_select(
+            ["organization_id", "vehicle_id", "day", "cost_type", "amount", "entries"],
+            cost_rows,
+        ),
+    ]
+
+
+async def get_covered_from(db: AsyncSession, *, organization_id: int) -> Optional[date]:
+    cached = _coverage_cache.get(organization_id, _NOT_COVERED)
+    if cached is not _NOT_COVERED:
+        return cached
+    covered_from = (await db.execute(
+        select(RollupCoverage.covered_from).where(RollupCoverage.organization_id == organization_id)
+    )).scalar_one_or_none()
+    _coverage_cache.set(organization_id, covered_from)
+    return covered_from
+
+
+async def covers(db: AsyncSession, *, organization_id: int, start_date: date) -> bool:
+    """Indica se os resumos da organização estão completos desde start_date."""
+    covered_from = await get_covered_from(db, organization_id=organization_id)
+    return covered_from is not None and start_date >= covered_from
+
+
+async def backfill(db: AsyncSession, *, organization_id: int, start: date, end: date) -> None:
+    """
+    Reconstrói os resumos da organização entre start e end e marca a cobertura.
+    A manutenção incremental cuida dos dias seguintes.
+    """
+    for stmt in refresh_statements(organization_id, start, end):
+        await db.execute(stmt)
+
+    coverage = await db.get(RollupCoverage, organization_id)
+    if coverage is None:
+        db.add(RollupCoverage(organization_id=organization_id, covered_from=start, backfilled_at=datetime.utcnow()))
+    else:
+        coverage.covered_from = min(coverage.covered_from, start)
+        coverage.backfilled_at = datetime.utcnow()
+    await db.commit()
+    _coverage_cache.delete(organization_id)
+
+
+# --- MANUTENÇÃO INCREMENTAL ---
+# Escritas ORM em viagens finalizadas, abastecimentos e custos marcam (organização, dia)
+# na sessão; os dias marcados são recalculados no fim do flush, na mesma transação.
+_DIRTY_KEY = "rollup_dirty_days"
+
+
+def _days(target, attribute: str) -> Set[date]:
+    """Dia atual e dias anteriores (alterados neste flush) de um atributo data/hora."""
+    state = inspect(target)
+    values = [state.dict.get(attribute), *state.attrs[attribute].history.deleted]
+    if values[0] is None and attribute == "timestamp":
+        values[0] = datetime.utcnow()  # server_default ainda não carregado
+    return {v.date() if isinstance(v, datetime) else v for v in values if v is not None}
+
+
+def _mark(target, days: Iterable[date]):
+    session = object_session(target)
+    organization_id = inspect(target).dict.get("organization_id")
+    if session is None or organization_id is None:
+        return
+    dirty = session.info.setdefault(_DIRTY_KEY, set())
+    dirty.update((organization_id, day) for day in days)
+
+
+def _mark_journey(mapper, connection, target):
+    # Viagens em andamento não entram nos resumos
+    if inspect(target).dict.get("is_active") is False:
+        _mark(target, _days(target, "start_time"))
+
+
+def _mark_fuel_log(mapper, connection, target):
+    _mark(target, _days(target, "timestamp"))
+
+
+def _mark_cost(mapper, connection, target):
+    _mark(target, _days(target, "date"))
+
+
+for _model, _listener in ((Journey, _mark_journey), (FuelLog, _mark_fuel_log), (VehicleCost, _mark_cost)):
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _listener)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _refresh_dirty_days(session, flush_context):
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if not dirty:
+        return
+    is_postgres = session.get_bind().dialect.name == "postgresql"
+    for organization_id, day in sorted(dirty):
+        if is_postgres:
+            # Serializa o recálculo do mesmo (organização, dia) entre transações concorrentes
+            session.execute(
+                text("SELECT pg_advisory_xact_lock(:org, :day)"),
+                {"org": organization_id, "day": day.toordinal()},
+            )
+        for stmt in refresh_statements(organization_id, day, day):
+            session.execute(stmt)
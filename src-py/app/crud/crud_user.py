@@ -8,6 +8,8 @@ from app.core.security import get_password_hash, verify_password, create_passwor
 from app.models.user_model import User, UserRole
 from app.models.organization_model import Organization
 from app.core.config import settings  # <-- ADICIONE ESTA IMPORTAÇÃO
+from app.core.cache import TTLCache
+from app.db.session import primary_session
 
 if TYPE_CHECKING:
     from app.schemas.user_schema import UserCreate, UserUpdate, UserRegister
@@ -27,6 +29,36 @@ async def get(db: AsyncSession, *, id: int, organization_id: int | None = None)
     result = await db.execute(stmt)
     return result.scalars().first()
 
+# user_id -> User (com a organização) desligado de qualquer sessão, para a autenticação
+_auth_users = TTLCache("auth_users", maxsize=10_000, ttl=settings.AUTH_USER_CACHE_TTL_SECONDS)
+
+
+async def get_for_auth(db: AsyncSession, *, id: int) -> User | None:
+    """
+    Utilizador autenticado (com a organização) a partir do cache de curta duração.
+    A cópia em cache nunca é devolvida diretamente: é ligada à sessão do pedido
+    com merge(load=False), sem consultas, e pode ser alterada como qualquer outra.
+    Numa sessão da réplica, a cópia para o cache é carregada no primário.
+    """
+    cached = _auth_users.get(id)
+    if cached is None:
+        async with primary_session(db) as source:
+            user = await get(source, id=id)
+            if user is None:
+                return None
+            # Retira a instância carregada da sessão para servir de modelo às próximas
+            if user.organization is not None:
+                source.expunge(user.organization)
+            source.expunge(user)
+        _auth_users.set(id, user)
+        cached = user
+    return await db.merge(cached, load=False)
+
+
+def invalidate_auth_cache(user_id: int):
+    _auth_users.delete(user_id)
+
+
 async def get_user_by_email(db: AsyncSession, *, email: str, load_organization: bool = False) -> User | None:
     stmt = select(User).where(User.email == email)
     if load_organization:
@@ -166,7 +198,9 @@ async def update(db: AsyncSession, *, db_user: User, user_in: Union["UserUpdate"
             setattr(db_user, field, value)
 
     db.add(db_user)
+    user_id = db_user.id
     await db.commit()
+    invalidate_auth_cache(user_id)
     await db.refresh(db_user, ["organization"])
     return db_user
 # -------------------------------------------------
@@ -176,7 +210,9 @@ async def update_password(db: AsyncSession, *, db_user: User, new_password: str)
     hashed_password = get_password_hash(new_password)
     db_user.hashed_password = hashed_password
     db.add(db_user)
+    user_id = db_user.id
     await db.commit()
+    invalidate_auth_cache(user_id)
     await db.refresh(db_user)
     return db_user
 
@@ -189,13 +225,15 @@ async def authenticate(db: AsyncSession, *, email: str, password: str) -> User |
         return None
     return user
 
-async def get_leaderboard_data(db: AsyncSession, *, organization_id: int) -> dict:
+async def get_leaderboard_data(db: AsyncSession, *, organization_id: int, sector: Optional[str] = None) -> dict:
     from app.models.journey_model import Journey
-    org = await db.get(Organization, organization_id)
-    if not org:
-        return {"leaderboard": [], "primary_metric_unit": "N/A"}
+    if sector is None:
+        org = await db.get(Organization, organization_id)
+        if not org:
+            return {"leaderboard": [], "primary_metric_unit": "N/A"}
+        sector = org.sector
 
-    if org.sector == 'agronegocio':
+    if sector == 'agronegocio':
         metric_calculation = func.sum(Journey.end_engine_hours - Journey.start_engine_hours)
         primary_metric_unit = "Horas"
     else:
@@ -224,49 +262,31 @@ async def get_leaderboard_data(db: AsyncSession, *, organization_id: int) -> dic
     return { "leaderboard": leaderboard_users, "primary_metric_unit": primary_metric_unit }
 
 async def get_driver_metrics(db: AsyncSession, *, user: User) -> "DriverMetrics":
-    from app.models.journey_model import Journey
-    from app.models.alert_model import Alert
-    from app.models.fuel_log_model import FuelLog # <-- Importação adicionada
+    from app.crud.crud_report import get_driver_aggregates
     from app.schemas.dashboard_schema import DriverMetrics
 
     today = datetime.utcnow()
     start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     org = user.organization
-    
+
+    aggregates = await get_driver_aggregates(
+        db,
+        organization_id=user.organization_id,
+        start=start_of_month,
+        driver_ids=[user.id],
+        finished_journeys_only=True, # Garante que só pegue jornadas finalizadas
+    )
+    row = aggregates.get(user.id)
+    total_liters = float(row.total_liters) if row else 0.0
+    alert_count = row.alerts if row else 0
+
+    # Métrica primária: horas para o agronegócio, distância para os demais setores
     total_distance = 0.0
     total_hours = 0.0
-
-    # Calcula a métrica primária (Distância ou Horas)
     if org.sector == 'agronegocio':
-        metric_col = func.sum(Journey.end_engine_hours - Journey.start_engine_hours)
-        metric_stmt = select(metric_col).where(
-            Journey.driver_id == user.id,
-            Journey.start_time >= start_of_month,
-            Journey.is_active == False # Garante que só pegue jornadas finalizadas
-        )
-        total_hours = (await db.execute(metric_stmt)).scalar_one_or_none() or 0.0
+        total_hours = float(row.total_hours) if row else 0.0
     else:
-        metric_col = func.sum(Journey.end_mileage - Journey.start_mileage)
-        metric_stmt = select(metric_col).where(
-            Journey.driver_id == user.id,
-            Journey.start_time >= start_of_month,
-            Journey.is_active == False # Garante que só pegue jornadas finalizadas
-        )
-        total_distance = (await db.execute(metric_stmt)).scalar_one_or_none() or 0.0
-
-    # Calcula o total de alertas
-    alerts_stmt = select(func.count(Alert.id)).where(
-        Alert.driver_id == user.id,
-        Alert.timestamp >= start_of_month
-    )
-    alert_count = (await db.execute(alerts_stmt)).scalar_one_or_none() or 0
-
-    # --- Lógica de cálculo de combustível dinâmico ---
-    total_liters_stmt = select(func.sum(FuelLog.liters)).where(
-        FuelLog.user_id == user.id,
-        FuelLog.date >= start_of_month
-    )
-    total_liters = (await db.execute(total_liters_stmt)).scalar_one_or_none() or 0.0
+        total_distance = float(row.total_distance) if row else 0.0
 
     fuel_efficiency = 0.0
     if total_liters > 0:
@@ -278,7 +298,6 @@ async def get_driver_metrics(db: AsyncSession, *, user: User) -> "DriverMetrics"
             # Calcula KM por Litro
             if total_distance > 0:
                 fuel_efficiency = total_distance / total_liters
-    # --- Fim da lógica de cálculo ---
 
     return DriverMetrics(
         distance=total_distance, # Retorna a distância (será 0 para agro)
@@ -331,15 +350,19 @@ async def get_driver_achievements(db: AsyncSession, *, user: User) -> List["Achi
     return status_list
 
 async def remove(db: AsyncSession, *, db_user: User) -> User:
+    user_id = db_user.id
     await db.delete(db_user)
     await db.commit()
+    invalidate_auth_cache(user_id)
     return db_user
 
 async def activate_user(db: AsyncSession, *, user_to_activate: User) -> User:
     """Muda o papel de um utilizador de CLIENTE_DEMO para CLIENTE_ATIVO."""
     user_to_activate.role = UserRole.CLIENTE_ATIVO
     db.add(user_to_activate)
+    user_id = user_to_activate.id
     await db.commit()
+    invalidate_auth_cache(user_id)
     await db.refresh(user_to_activate)
     return user_to_activate
 
@@ -360,26 +383,22 @@ async def count(db: AsyncSession, *, organization_id: int) -> int:
 
 async def get_user_stats(db: AsyncSession, *, user_id: int, organization_id: int) -> dict | None:
     """Calcula as estatísticas de um utilizador, adaptando-as ao setor da organização."""
+    from app.crud.crud_report import get_driver_aggregates
     from app.models.journey_model import Journey
-    from app.models.maintenance_model import MaintenanceRequest
     from app.models.vehicle_model import Vehicle
 
     user = await get(db, id=user_id, organization_id=organization_id)
     if not user or not user.organization:
         return None
 
-    journeys_stmt = select(Journey).where(
-        Journey.driver_id == user_id,
-        Journey.organization_id == organization_id,
-        Journey.is_active == False
+    aggregates = await get_driver_aggregates(
+        db, organization_id=organization_id, driver_ids=[user_id], finished_journeys_only=True
     )
-    journeys_result = await db.execute(journeys_stmt)
-    journeys = journeys_result.scalars().all()
-    total_journeys = len(journeys)
+    totals = aggregates[user_id]
     
     stats_payload = {}
     if user.organization.sector == 'agronegocio':
-        total_value = sum((j.end_engine_hours - j.start_engine_hours) for j in journeys if j.end_engine_hours is not None and j.start_engine_hours is not None)
+        total_value = float(totals.total_hours)
         
         performance_stmt = (
             select(Vehicle.brand, Vehicle.model, Vehicle.identifier, func.sum(Journey.end_engine_hours - Journey.start_engine_hours).label("total_value"))
@@ -394,7 +413,7 @@ async def get_user_stats(db: AsyncSession, *, user_id: int, organization_id: int
             "primary_metric_unit": "Horas", "performance_by_vehicle": performance_by_vehicle,
         })
     else: # Para 'servicos' e 'frete'
-        total_value = sum((j.end_mileage - j.start_mileage) for j in journeys if j.end_mileage is not None and j.start_mileage is not None)
+        total_value = float(totals.total_distance)
         
         performance_stmt = (
             select(Vehicle.brand, Vehicle.model, Vehicle.license_plate, func.sum(Journey.end_mileage - Journey.start_mileage).label("total_value"))
@@ -409,11 +428,8 @@ async def get_user_stats(db: AsyncSession, *, user_id: int, organization_id: int
             "primary_metric_unit": "km", "performance_by_vehicle": performance_by_vehicle,
         })
 
-    maintenance_count_stmt = select(func.count(MaintenanceRequest.id)).where(MaintenanceRequest.reported_by_id == user_id)
-    maintenance_requests_count = (await db.execute(maintenance_count_stmt)).scalar_one_or_none() or 0
-    
     stats_payload.update({
-        "total_journeys": total_journeys,
-        "maintenance_requests_count": maintenance_requests_count
+        "total_journeys": totals.total_journeys,
+        "maintenance_requests_count": totals.maintenance_requests
     })
     return stats_payload
\ No newline at end of file
@@ -2,12 +2,78 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import or_, func
 from sqlalchemy import update as sql_update # <--- CORREÇÃO 1: Alias para evitar conflito com a função update abaixo
+from sqlalchemy import case
+from dataclasses import dataclass
 from typing import List
 
-from app.models.vehicle_model import Vehicle
+from app.models.vehicle_model import Vehicle, VehicleStatus
 from app.models.part_model import InventoryItem # <--- CORREÇÃO 2: Import correto do Modelo (está em part_model)
 from app.schemas.telemetry_schema import TelemetryPayload
 from app.schemas.vehicle_schema import VehicleCreate, VehicleUpdate
+from app.core.cache import TTLCache, warn_if_per_worker
+from app.crud.base import KeysetPage, paginate_keyset
+from app.core.config import settings
+from app.services.cache_invalidation import InvalidationChannel
+
+
+@dataclass(frozen=True)
+class VehicleRef:
+    """Identificação mínima de um veículo, segura para manter em cache entre sessões."""
+    id: int
+    organization_id: int
+    license_plate: str | None = None
+
+
+# Chaves: ("id", 12), ("plate", "ABC1D23"), ("device", "IMEI...")
+vehicle_lookup_cache = TTLCache(
+    "vehicle_lookup",
+    maxsize=settings.VEHICLE_LOOKUP_CACHE_MAXSIZE,
+    ttl=settings.VEHICLE_LOOKUP_CACHE_TTL_SECONDS,
+)
+
+
+def _invalidate_local(vehicle_id: int):
+    vehicle_lookup_cache.invalidate_where(lambda key, ref: ref.id == vehicle_id)
+
+
+# Com VEHICLE_LOOKUP_CACHE_BACKEND=redis a invalidação chega a todos os workers
+if settings.VEHICLE_LOOKUP_CACHE_BACKEND != "redis":
+    warn_if_per_worker("Invalidação do cache de resolução de veículos", "VEHICLE_LOOKUP_CACHE_BACKEND")
+vehicle_lookup_invalidations = InvalidationChannel(
+    "vehicle-lookup",
+    lambda raw: _invalidate_local(int(raw)),
+    settings.REDIS_URL if settings.VEHICLE_LOOKUP_CACHE_BACKEND == "redis" else None,
+)
+
+
+async def invalidate_vehicle_cache(vehicle_id: int):
+    """Remove todas as chaves de resolução que apontam para o veículo, em todos os workers."""
+    await vehicle_lookup_invalidations.invalidate(vehicle_id)
+
+
+async def _resolve(db: AsyncSession, key: tuple, condition) -> VehicleRef | None:
+    ref = vehicle_lookup_cache.get(key)
+    if ref is not None:
+        return ref
+
+    stmt = select(Vehicle.id, Vehicle.organization_id, Vehicle.license_plate).where(condition)
+    row = (await db.execute(stmt)).first()
+    if not row:
+        return None
+
+    ref = VehicleRef(id=row.id, organization_id=row.organization_id, license_plate=row.license_plate)
+    vehicle_lookup_cache.set(key, ref)
+    return ref
+
+
+async def resolve_by_id(db: AsyncSession, *, vehicle_id: int) -> VehicleRef | None:
+    return await _resolve(db, ("id", vehicle_id), Vehicle.id == vehicle_id)
+
+async def resolve_by_plate(db: AsyncSession, *, license_plate: str) -> VehicleRef | None:
+    return await _resolve(db, ("plate", license_plate), Vehicle.license_plate == license_plate)
+
+async def resolve_by_device(db: AsyncSession, *, device_id: str) -> VehicleRef | None:
+    return await _resolve(db, ("device", device_id), Vehicle.telemetry_device_id == device_id)
 
 
 async def get(db: AsyncSession, *, vehicle_id: int, organization_id: int) -> Vehicle | None:
@@ -16,16 +82,8 @@ async def get(db: AsyncSession, *, vehicle_id: int, organization_id: int) -> Veh
     result = await db.execute(stmt)
     return result.scalars().first()
 
-async def get_multi_by_org(
-    db: AsyncSession,
-    *,
-    organization_id: int,
-    skip: int = 0,
-    limit: int = 8,
-    search: str | None = None
-) -> List[Vehicle]:
-    stmt = select(Vehicle).where(Vehicle.organization_id == organization_id)
-
+def _org_vehicles_filter(stmt, *, organization_id: int, search: str | None = None):
+    stmt = stmt.where(Vehicle.organization_id == organization_id)
     if search and search.strip():
         search_term = f"%{search.lower()}%"
         stmt = stmt.where(
@@ -36,26 +94,38 @@ async def get_multi_by_org(
                 func.lower(Vehicle.identifier).like(search_term)
             )
         )
+    return stmt
 
-    stmt = stmt.order_by(Vehicle.brand).offset(skip).limit(limit)
+async def get_multi_by_org(
+    db: AsyncSession,
+    *,
+    organization_id: int,
+    skip: int = 0,
+    limit: int = 8,
+    search: str | None = None
+) -> List[Vehicle]:
+    stmt = _org_vehicles_filter(select(Vehicle), organization_id=organization_id, search=search)
+    stmt = stmt.order_by(Vehicle.brand, Vehicle.id).offset(skip).limit(limit)
     result = await db.execute(stmt)
     return result.scalars().all()
 
+async def get_page_by_org(
+    db: AsyncSession,
+    *,
+    organization_id: int,
+    cursor: str | None = None,
+    limit: int = 8,
+    search: str | None = None
+) -> KeysetPage[Vehicle]:
+    """Mesma listagem de get_multi_by_org, paginada por cursor."""
+    stmt = _org_vehicles_filter(select(Vehicle), organization_id=organization_id, search=search)
+    return await paginate_keyset(db, stmt, order_by=[Vehicle.brand, Vehicle.id], limit=limit, cursor=cursor)
+
 async def count_by_org(db: AsyncSession, *, organization_id: int, search: str | None = None) -> int:
     """Conta o número total de veículos para paginação, considerando a busca."""
-    stmt = select(func.count()).select_from(Vehicle).where(Vehicle.organization_id == organization_id)
-
-    if search and search.strip():
-        search_term = f"%{search.lower()}%"
-        stmt = stmt.where(
-            or_(
-                func.lower(Vehicle.brand).like(search_term),
-                func.lower(Vehicle.model).like(search_term),
-                func.lower(Vehicle.license_plate).like(search_term),
-                func.lower(Vehicle.identifier).like(search_term)
-            )
-        )
-    
+    stmt = _org_vehicles_filter(
+        select(func.count()).select_from(Vehicle), organization_id=organization_id, search=search
+    )
     result = await db.execute(stmt)
     return result.scalar_one()
 
@@ -63,25 +133,44 @@ async def count(db: AsyncSession, *, organization_id: int) -> int:
     """Implementa o método 'count' genérico."""
     return await count_by_org(db, organization_id=organization_id)
 
-async def update_vehicle_from_telemetry(db: AsyncSession, *, payload: TelemetryPayload) -> Vehicle | None:
-    """Encontra um veículo pelo seu telemetry_device_id e atualiza seus dados."""
-    stmt = select(Vehicle).where(Vehicle.telemetry_device_id == payload.device_id)
-    result = await db.execute(stmt)
-    vehicle_obj = result.scalar_one_or_none()
+async def update_vehicle_from_telemetry(db: AsyncSession, *, payload: TelemetryPayload) -> VehicleRef | None:
+    """
+    Encontra um veículo pelo seu telemetry_device_id (via cache) e atualiza o horímetro.
+    A posição é gravada pelo buffer de posições (app.services.position_buffer).
+    """
+    vehicle_ref = await resolve_by_device(db, device_id=payload.device_id)
 
-    if not vehicle_obj:
+    if not vehicle_ref:
         print(f"AVISO: Recebida telemetria de um dispositivo não registrado: {payload.device_id}")
         return None
 
-    vehicle_obj.last_latitude = payload.latitude
-    vehicle_obj.last_longitude = payload.longitude
-    if payload.engine_hours > (vehicle_obj.current_engine_hours or 0):
-        vehicle_obj.current_engine_hours = payload.engine_hours
-    
-    db.add(vehicle_obj)
-    await db.commit()
-    await db.refresh(vehicle_obj)
-    return vehicle_obj
+    if payload.engine_hours:
+        stmt = (
+            sql_update(Vehicle)
+            .where(Vehicle.id == vehicle_ref.id)
+            .values(
+                current_engine_hours=case(
+                    (func.coalesce(Vehicle.current_engine_hours, 0) < payload.engine_hours, payload.engine_hours),
+                    else_=Vehicle.current_engine_hours,
+                ),
+            )
+        )
+        await db.execute(stmt)
+    return vehicle_ref
+
+async def update_last_position(
+    db: AsyncSession,
+    *,
+    vehicle_id: int,
+    latitude: float,
+    longitude: float,
+    status: VehicleStatus | None = None
+):
+    """Grava a última posição (e opcionalmente o status) com um UPDATE direto, sem SELECT. Não faz commit."""
+    values = {"last_latitude": latitude, "last_longitude": longitude}
+    if status is not None:
+        values["status"] = status
+    await db.execute(sql_update(Vehicle).where(Vehicle.id == vehicle_id).values(**values))
 
 async def create_with_owner(db: AsyncSession, *, obj_in: VehicleCreate, organization_id: int) -> Vehicle:
     """Cria um novo veículo associado a uma organização."""
@@ -101,6 +190,8 @@ async def update(db: AsyncSession, *, db_vehicle: Vehicle, vehicle_in: VehicleUp
     db.add(db_vehicle)
     await db.commit()
     await db.refresh(db_vehicle)
+    # Placa ou dispositivo podem ter mudado
+    await invalidate_vehicle_cache(db_vehicle.id)
     return db_vehicle
 
 async def remove(db: AsyncSession, *, db_vehicle: Vehicle) -> Vehicle:
@@ -114,6 +205,7 @@ async def remove(db: AsyncSession, *, db_vehicle: Vehicle) -> Vehicle:
     # 2. Agora é seguro deletar o veículo
     await db.delete(db_vehicle)
     await db.commit()
+    await invalidate_vehicle_cache(db_vehicle.id)
     return db_vehicle
 
 async def get_by_id(db: AsyncSession, *, id: int) -> Vehicle | None:
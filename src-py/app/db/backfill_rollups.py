@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.crud import crud_rollup
+from app.db.session import SessionLocal
+from app.models.organization_model import Organization
+
+# Esta importação continua sendo essencial e está correta.
+import app.models
+
+
+async def backfill_rollups(days: int, organization_id: int | None = None):
+    """
+    Reconstrói os resumos diários (viagens, abastecimentos e custos) dos últimos
+    `days` dias e marca a cobertura de cada organização. Pode ser executado de
+    novo sem problemas: cada intervalo é apagado e recalculado.
+    """
+    end = datetime.utcnow().date()
+    start = end - timedelta(days=days)
+
+    async with SessionLocal() as db:
+        stmt = select(Organization.id).order_by(Organization.id)
+        if organization_id is not None:
+            stmt = stmt.where(Organization.id == organization_id)
+        organization_ids = (await db.execute(stmt)).scalars().all()
+
+        print(f"A reconstruir os resumos de {start} a {end} para {len(organization_ids)} organização(ões)...")
+        for org_id in organization_ids:
+            await crud_rollup.backfill(db, organization_id=org_id, start=start, end=end)
+            print(f"  organização {org_id}: ok")
+    print("Resumos diários reconstruídos com sucesso.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill dos resumos diários de relatórios.")
+    parser.add_argument("--days", type=int, default=400, help="Quantos dias para trás reconstruir (padrão: 400).")
+    parser.add_argument("--organization-id", type=int, default=None, help="Apenas esta organização.")
+    args = parser.parse_args()
+    asyncio.run(backfill_rollups(args.days, args.organization_id))
@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.models.organization_model import Organization
+from app.services.fuel_anomalies import rescore_organization
+
+# Esta importação continua sendo essencial e está correta.
+import app.models
+
+
+async def rescore_fuel_consumption(organization_id: int | None = None, notify: bool = False):
+    """
+    Reavalia o consumo de todos os abastecimentos (uma passagem vetorizada por
+    organização) e reconstrói as bases de consumo dos veículos. Pode ser
+    executado de novo sem problemas.
+    """
+    async with SessionLocal() as db:
+        stmt = select(Organization.id).order_by(Organization.id)
+        if organization_id is not None:
+            stmt = stmt.where(Organization.id == organization_id)
+        organization_ids = (await db.execute(stmt)).scalars().all()
+
+        print(f"A reavaliar o consumo de {len(organization_ids)} organização(ões)...")
+        for org_id in organization_ids:
+            result = await rescore_organization(db, organization_id=org_id, notify=notify)
+            print(
+                f"  organização {org_id}: {result['fuel_logs']} abastecimentos, "
+                f"{result['vehicles']} veículos, {len(result['anomalies'])} anomalias"
+            )
+    print("Reavaliação concluída.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reavaliação do consumo de combustível da frota.")
+    parser.add_argument("--organization-id", type=int, default=None, help="Apenas esta organização.")
+    parser.add_argument("--notify", action="store_true", help="Notifica os gestores sobre anomalias ainda não notificadas.")
+    args = parser.parse_args()
+    asyncio.run(rescore_fuel_consumption(args.organization_id, args.notify))
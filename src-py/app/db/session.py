@@ -1,36 +1,152 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+import hashlib
+from contextlib import asynccontextmanager
+from fastapi import Depends, Request
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Any, AsyncGenerator, Dict, Optional
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 
+
+def _engine_options(uri: str, *, statement_timeout_ms: int, read_only: bool = False) -> Dict[str, Any]:
+    """Opções do engine a partir das Settings (pool e parâmetros do asyncpg)."""
+    options: Dict[str, Any] = {"pool_pre_ping": True}
+    url = make_url(uri)
+    if url.get_backend_name() == "sqlite":
+        # O SQLite (testes/desenvolvimento) usa o pool padrão do dialeto
+        return options
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    )
+    if url.get_driver_name() == "asyncpg":
+        server_settings = {}
+        if statement_timeout_ms:
+            server_settings["statement_timeout"] = str(statement_timeout_ms)
+        if read_only:
+            server_settings["default_transaction_read_only"] = "on"
+        options["connect_args"] = {
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        }
+    return options
+
+
+def build_engine(uri: str, *, statement_timeout_ms: int = 0, read_only: bool = False) -> AsyncEngine:
+    return create_async_engine(uri, **_engine_options(uri, statement_timeout_ms=statement_timeout_ms, read_only=read_only))
+
+
 # Cria o "motor" (engine) de conexão com o banco de dados.
-engine = create_async_engine(settings.DATABASE_URI, pool_pre_ping=True)
+engine = build_engine(settings.DATABASE_URI, statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS)
+
+# Réplica de leitura para relatórios; sem DATABASE_REPLICA_URL usa o próprio primário
+if settings.DATABASE_REPLICA_URI:
+    replica_engine = build_engine(
+        settings.DATABASE_REPLICA_URI, statement_timeout_ms=settings.DB_REPLICA_STATEMENT_TIMEOUT_MS, read_only=True
+    )
+else:
+    replica_engine = engine
 
 # Cria uma "fábrica" de sessões.
 SessionLocal = sessionmaker(
-    autocommit=False, 
-    autoflush=False, 
-    bind=engine, 
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
     class_=AsyncSession,
     # --- CORREÇÃO AQUI ---
-    # Impede que os objetos expirem após o commit. 
-    # Isso é CRUCIAL para evitar erros de 'MissingGreenlet' ao acessar 
+    # Impede que os objetos expirem após o commit.
+    # Isso é CRUCIAL para evitar erros de 'MissingGreenlet' ao acessar
     # atributos de objetos (como current_user) depois de um commit na mesma rota.
     expire_on_commit=False
     # ---------------------
 )
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
-    """
-    Função geradora para ser usada como uma Dependência do FastAPI.
-    Este é o padrão CORRETO para gerenciamento de transação MANUAL,
-    onde a rota é responsável por 'commit' e 'rollback'.
-    """
-    session: AsyncSession = SessionLocal()
+# Sessões só de leitura, ligadas à réplica
+ReplicaSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    info={"read_only": True},
+)
+
+
+@event.listens_for(Session, "before_flush")
+def _reject_replica_writes(session, flush_context, instances):
+    # Falha já no ORM, em vez de esperar o erro da réplica (ou escrever nela)
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise InvalidRequestError("Escrita numa sessão de leitura (réplica). Use get_primary_db nesta rota.")
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_commit(session):
+    session.info["committed"] = True
+
+
+def pool_stats(async_engine: AsyncEngine) -> Dict[str, Any]:
+    """Ocupação atual do pool de um engine, neste worker."""
+    pool = async_engine.sync_engine.pool
+    stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    # Pools com fila (QueuePool/AsyncAdaptedQueuePool) expõem tamanho e overflow
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    if "size" in stats:
+        stats["max_overflow"] = pool._max_overflow
+        stats["capacity"] = stats["size"] + max(pool._max_overflow, 0)
+    return stats
+
+
+async def dispose_engines():
+    await engine.dispose()
+    if replica_engine is not engine:
+        await replica_engine.dispose()
+
+
+# --- ROTEAMENTO PRIMÁRIO / RÉPLICA ---
+# Cabeçalho para o cliente exigir leitura no primário (ex.: logo após salvar um formulário)
+CONSISTENCY_HEADER = "X-Read-Consistency"
+_READ_METHODS = {"GET", "HEAD"}
+
+# Quem acabou de escrever lê do primário durante DB_REPLICA_STICKY_SECONDS
+# (cobre o atraso de replicação). Por worker, como os outros caches.
+_recent_writers = TTLCache("replica_sticky_writers", maxsize=50_000, ttl=settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def _caller_key(request: Request) -> Optional[bytes]:
+    authorization = request.headers.get("authorization")
+    return hashlib.sha256(authorization.encode()).digest() if authorization else None
+
+
+def replica_allowed(request: Request) -> bool:
+    """Se a leitura deste pedido pode ir para a réplica."""
+    if replica_engine is engine:
+        return False
+    if request.headers.get(CONSISTENCY_HEADER, "").lower() == "primary":
+        return False
+    key = _caller_key(request)
+    return key is None or _recent_writers.get(key) is None
+
+
+@asynccontextmanager
+async def _session_scope(session_factory, request: Request) -> AsyncGenerator[AsyncSession, None]:
+    session: AsyncSession = session_factory()
     try:
         # Entrega a sessão para a rota
         yield session
+        if session.info.get("committed"):
+            key = _caller_key(request)
+            if key is not None:
+                _recent_writers.set(key, True)
     except Exception:
         # Se um erro na rota não for tratado, desfazemos (rollback)
         await session.rollback()
@@ -38,3 +154,58 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     finally:
         # Garante que a sessão seja fechada ao final da requisição
         await session.close()
+
+
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Função geradora para ser usada como uma Dependência do FastAPI.
+    Este é o padrão CORRETO para gerenciamento de transação MANUAL,
+    onde a rota é responsável por 'commit' e 'rollback'.
+
+    Com DATABASE_REPLICA_URL, pedidos GET/HEAD recebem uma sessão só de
+    leitura na réplica, salvo quando o cliente pede o primário
+    (X-Read-Consistency: primary) ou escreveu há poucos segundos.
+    """
+    use_replica = request.method in _READ_METHODS and replica_allowed(request)
+    async with _session_scope(ReplicaSessionLocal if use_replica else SessionLocal, request) as session:
+        yield session
+
+
+def is_read_only(db: AsyncSession) -> bool:
+    """Se a sessão é da réplica (e pode estar atrasada em relação ao primário)."""
+    return bool(db.info.get("read_only"))
+
+
+@asynccontextmanager
+async def primary_session(db: AsyncSession) -> AsyncGenerator[AsyncSession, None]:
+    """
+    A própria sessão quando já está no primário; senão uma sessão curta no primário.
+    Os caches partilhados (dashboard, snapshots, utilizadores autenticados...) são
+    preenchidos por aqui, para não guardarem dados atrasados da réplica.
+    """
+    if not is_read_only(db):
+        yield db
+        return
+    async with SessionLocal() as session:
+        yield session
+
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Sessão de leitura para geradores de relatórios chamados por POST. Usa a
+    réplica com as mesmas exceções de get_db; sem réplica é a própria sessão do pedido.
+    """
+    if is_read_only(db) or not replica_allowed(request):
+        yield db
+        return
+    async with _session_scope(ReplicaSessionLocal, request) as session:
+        yield session
+
+
+async def get_primary_db(request: Request, db: AsyncSession = Depends(get_db)) -> AsyncGenerator[AsyncSession, None]:
+    """Sessão sempre no primário, para rotas GET que escrevem (ex.: integrações)."""
+    if not is_read_only(db):
+        yield db
+        return
+    async with _session_scope(SessionLocal, request) as session:
+        yield session
@@ -1,25 +1,35 @@
 # src-py/app/deps.py
 from typing import Generator, Any
-from jose import jwt, JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
-from pydantic import ValidationError
-from fastapi.concurrency import run_in_threadpool
 from datetime import date
 
 from app.core.config import settings
-from app.db.session import get_db
+from app.core.security import decode_access_token
+from app.db.session import get_db, get_read_db, get_primary_db
 from app.models.user_model import User, UserRole
 from app import crud
 
 from app.crud.crud_demo_usage import demo_usage as crud_demo_usage_instance
+from app.services.demo_usage_snapshots import DemoUsageSnapshot, demo_usage_snapshots
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/token",
     auto_error=True
 )
 
+async def get_user_from_token(db: AsyncSession, token: str) -> User | None:
+    """Valida o access token e carrega o utilizador. Retorna None se inválido."""
+    payload = decode_access_token(token)
+    if payload is None:
+        return None
+    user_id: str = payload.get("sub")
+    if user_id is None:
+        return None
+
+    return await crud.user.get_for_auth(db, id=int(user_id))
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme)
 ) -> User:
@@ -28,17 +38,7 @@ async def get_current_user(
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = await run_in_threadpool(
-            jwt.decode, token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except (JWTError, ValidationError):
-        raise credentials_exception
-    
-    user = await crud.user.get(db, id=int(user_id))
+    user = await get_user_from_token(db, token)
     if user is None:
         raise credentials_exception
     return user
@@ -82,49 +82,76 @@ async def get_current_super_admin(
         )
     return current_user
 
-RESOURCE_TO_CRUD_MAP = {
-    "vehicles": crud.vehicle, "users": crud.user,
-    "parts": crud.part, "clients": crud.client,
-    "implements": crud.implement,          
-    "vehicle_components": crud.vehicle_component, 
-}
+async def get_demo_usage_snapshot(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> DemoUsageSnapshot | None:
+    """
+    Snapshot de uso da organização, carregado numa só consulta e memoizado pelo
+    FastAPI durante o pedido (várias verificações partilham a mesma leitura).
+    Só contas demo e os seus motoristas precisam dele.
+    """
+    if current_user.role not in (UserRole.CLIENTE_DEMO, UserRole.DRIVER):
+        return None
+    return await demo_usage_snapshots.get(db, organization_id=current_user.organization_id)
+
+def _demo_limit_exceeded(kind: str, limit: int, resource_type: str) -> HTTPException:
+    if kind == "monthly":
+        detail = f"Limite mensal de {limit} {resource_type.replace('_', ' ')} atingido para a conta demonstração. Considere migrar para um plano pago."
+    else:
+        detail = f"Limite total de {limit} {resource_type.replace('_', ' ')} atingido para a conta demonstração. Exclua itens ou migre para um plano pago."
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
 
 def check_demo_limit(resource_type: str):
-    async def dependency(
+    """
+    Guarda das rotas com limite para contas demo.
+
+    Recursos com limite mensal consomem a cota logo na verificação, numa única
+    instrução (incremento condicionado ao limite). O consumo é confirmado junto
+    com a rota e desfeito se ela falhar, por isso essas rotas não chamam
+    increment_usage. Limites totais são verificados no snapshot de uso.
+    """
+    monthly_limit = settings.DEMO_MONTHLY_LIMITS.get(resource_type)
+    total_limit = settings.DEMO_TOTAL_LIMITS.get(resource_type)
+
+    if monthly_limit is None:
+        async def check_total(
+            # --- CORREÇÃO AQUI ---
+            # Antes era: Depends(get_current_active_manager)
+            # Isso bloqueava motoristas. Agora usamos 'get_current_active_user'.
+            current_user: User = Depends(get_current_active_user),
+            snapshot: DemoUsageSnapshot | None = Depends(get_demo_usage_snapshot),
+        ):
+            # Se não for conta DEMO (ex: é Driver, Admin, ou Cliente Ativo), ignora a verificação
+            if current_user.role != UserRole.CLIENTE_DEMO or total_limit is None:
+                return
+            if snapshot.counts.get(resource_type, 0) >= total_limit:
+                raise _demo_limit_exceeded("total", total_limit, resource_type)
+        return check_total
+
+    async def consume_monthly(
         db: AsyncSession = Depends(get_db),
-        # --- CORREÇÃO AQUI ---
-        # Antes era: Depends(get_current_active_manager)
-        # Isso bloqueava motoristas. Agora usamos 'get_current_active_user'.
         current_user: User = Depends(get_current_active_user),
     ):
-        # Se não for conta DEMO (ex: é Driver, Admin, ou Cliente Ativo), ignora a verificação
         if current_user.role != UserRole.CLIENTE_DEMO:
+            yield
             return
-            
+
         organization_id = current_user.organization_id
-        
-        if resource_type in settings.DEMO_MONTHLY_LIMITS:
-            limit = settings.DEMO_MONTHLY_LIMITS[resource_type]
-            usage = await crud_demo_usage_instance.get_or_create_usage(
-                db, organization_id=organization_id, resource_type=resource_type
-            )
-            if usage.usage_count >= limit:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail=f"Limite mensal de {limit} {resource_type.replace('_', ' ')} atingido para a conta demonstração. Considere migrar para um plano pago.",
-                )
-        
-        if resource_type in settings.DEMO_TOTAL_LIMITS:
-            limit = settings.DEMO_TOTAL_LIMITS[resource_type]
-            crud_operation = RESOURCE_TO_CRUD_MAP.get(resource_type)
-            if crud_operation:
-                current_count = await crud_operation.count_by_org(db, organization_id=organization_id)
-                if current_count >= limit:
-                    raise HTTPException(
-                        status_code=status.HTTP_403_FORBIDDEN,
-                        detail=f"Limite total de {limit} {resource_type.replace('_', ' ')} atingido para a conta demonstração. Exclua itens ou migre para um plano pago.",
-                    )
-    return dependency
+        if total_limit is not None:
+            snapshot = await demo_usage_snapshots.get(db, organization_id=organization_id)
+            if snapshot.counts.get(resource_type, 0) >= total_limit:
+                raise _demo_limit_exceeded("total", total_limit, resource_type)
+
+        consumed = await crud_demo_usage_instance.increment_usage(
+            db, organization_id=organization_id, resource_type=resource_type, limit=monthly_limit
+        )
+        if consumed is None:
+            raise _demo_limit_exceeded("monthly", monthly_limit, resource_type)
+        # Erros da rota chegam aqui e get_db desfaz a transação (e o consumo)
+        yield
+        await db.commit()
+    return consume_monthly
 
 async def check_demo_limit_manual(db: AsyncSession, user: User, resource: str):
     """
@@ -134,9 +161,7 @@ async def check_demo_limit_manual(db: AsyncSession, user: User, resource: str):
     if user.role != UserRole.CLIENTE_DEMO:
         return # Apenas contas Demo têm limites estritos
 
-    # Lógica de verificação...
-    # Exemplo simplificado:
-    current_usage = await crud.demo_usage.get_usage(db, organization_id=user.organization_id, resource_type=resource)
+    current_usage = await crud_demo_usage_instance.get_usage(db, organization_id=user.organization_id, resource_type=resource)
     limit = 10 # Valor padrão ou buscado da organização
     
     if current_usage >= limit:
@@ -1,5 +1,5 @@
 # backend/app/models/demo_usage_model.py
-from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
@@ -15,7 +15,12 @@ class DemoUsage(Base):
     # --- FIM DA CORREÇÃO ---
     
     resource_type = Column(String, nullable=False, index=True)
-    usage_count = Column(Integer, default=0)
+    usage_count = Column(Integer, default=0, server_default="0", nullable=False)
     period = Column(Date, nullable=False)
     
-    organization = relationship("Organization")
\ No newline at end of file
+    organization = relationship("Organization")
+
+    # Um contador por (organização, recurso, mês): alvo do INSERT ... ON CONFLICT
+    __table_args__ = (
+        UniqueConstraint('organization_id', 'resource_type', 'period', name='uq_demousage_org_resource_period'),
+    )
@@ -0,0 +1,29 @@
+# backend/app/models/fuel_baseline_model.py
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+
+from app.db.base_class import Base
+
+
+class VehicleFuelBaseline(Base):
+    """
+    Consumo histórico (km/l) de cada veículo mantido de forma incremental:
+    média e soma dos quadrados dos desvios (algoritmo de Welford), mais o último
+    odômetro, para que cada abastecimento novo seja avaliado e somado em O(1).
+    Apagado quando um abastecimento é editado ou removido e recalculado na
+    avaliação seguinte (ou pelo comando de reavaliação da frota).
+    """
+    __tablename__ = "vehicle_fuel_baselines"
+
+    vehicle_id = Column(Integer, ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    samples = Column(Integer, nullable=False, default=0)
+    mean_km_per_liter = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)
+
+    last_odometer = Column(Integer, nullable=True)
+    last_timestamp = Column(DateTime(timezone=True), nullable=True)
+
+    @property
+    def std_km_per_liter(self) -> float:
+        return (self.m2 / (self.samples - 1)) ** 0.5 if self.samples > 1 else 0.0
@@ -0,0 +1,59 @@
+# backend/app/models/rollup_model.py
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey, UniqueConstraint, Index, Enum as SAEnum
+
+from app.db.base_class import Base
+from .vehicle_cost_model import CostType
+
+
+class DailyActivityRollup(Base):
+    """
+    Resumo diário por (organização, veículo, motorista, dia) das viagens finalizadas
+    e dos abastecimentos. Mantido pelos eventos em crud_rollup e pelo comando de backfill.
+    """
+    __tablename__ = "daily_activity_rollups"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "vehicle_id", "driver_id", "day", name="uq_daily_activity_rollup"),
+        Index("ix_daily_activity_rollups_org_day", "organization_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    vehicle_id = Column(Integer, nullable=False)
+    driver_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+
+    journeys_count = Column(Integer, nullable=False, default=0)
+    # Nulos quando nenhuma viagem do dia tem o valor preenchido (igual às somas sobre os dados brutos)
+    distance_km = Column(Float, nullable=True)
+    engine_hours = Column(Float, nullable=True)
+    fuel_liters = Column(Float, nullable=True)
+    fuel_cost = Column(Float, nullable=True)
+
+
+class DailyCostRollup(Base):
+    """Resumo diário dos custos por (organização, veículo, dia, tipo de custo)."""
+    __tablename__ = "daily_cost_rollups"
+    __table_args__ = (
+        UniqueConstraint("organization_id", "vehicle_id", "day", "cost_type", name="uq_daily_cost_rollup"),
+        Index("ix_daily_cost_rollups_org_day", "organization_id", "day"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    vehicle_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    cost_type = Column(SAEnum(CostType), nullable=False)
+    amount = Column(Float, nullable=False, default=0)
+    entries = Column(Integer, nullable=False, default=0)
+
+
+class RollupCoverage(Base):
+    """
+    Primeiro dia a partir do qual os resumos de uma organização estão completos.
+    Só é gravado pelo backfill; antes disso os relatórios leem os dados brutos.
+    """
+    __tablename__ = "rollup_coverage"
+
+    organization_id = Column(Integer, ForeignKey("organizations.id", ondelete="CASCADE"), primary_key=True)
+    covered_from = Column(Date, nullable=False)
+    backfilled_at = Column(DateTime, nullable=False)
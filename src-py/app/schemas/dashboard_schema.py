@@ -30,6 +30,15 @@ class VehiclePosition(BaseModel):
     class Config:
         from_attributes = True
 
+class VehiclePositionDelta(BaseModel):
+    """Mudança de posição de um veículo enviada pelo stream do mapa em tempo real."""
+    id: int
+    license_plate: Optional[str] = None
+    latitude: float
+    longitude: float
+    status: Optional[str] = None # None = status inalterado
+    timestamp: datetime
+
 class ActiveJourneyInfo(BaseModel):
     id: int
     vehicle_identifier: str
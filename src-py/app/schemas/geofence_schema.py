@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import Literal, Optional
+from datetime import datetime
+
+class GeofenceTransition(BaseModel):
+    """Entrada, saída ou permanência prolongada de um veículo numa cerca, detectada num lote de pontos."""
+    zone_id: int
+    zone_name: str
+    zone_type: str
+    event: Literal["ENTER", "EXIT", "DWELL"]
+    # Índice do ponto (no lote ordenado por tempo) onde a transição ocorreu
+    point_index: int
+    latitude: float
+    longitude: float
+    timestamp: Optional[datetime] = None
@@ -92,8 +92,9 @@ class InventoryItemRow(InventoryItemPublic):
     installed_on_vehicle: Optional[_VehicleInfo] = None 
 
 class InventoryItemPage(BaseModel):
-    total: int
+    total: Optional[int] = None # Só quando include_total=true
     items: List[InventoryItemRow]
+    next_cursor: Optional[str] = None
 # --- FIM DOS NOVOS SCHEMAS ---
 
 # --- 7. Recarregar os modelos ---
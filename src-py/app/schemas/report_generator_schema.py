@@ -1,9 +1,19 @@
 from pydantic import BaseModel
 from typing import Optional
-from datetime import date
+from datetime import date, datetime
 
 class ReportRequest(BaseModel):
     report_type: str # Ex: "cost_by_vehicle", "activity_by_driver"
     date_from: date
     date_to: date
-    target_id: int # ID do veículo ou do motorista
\ No newline at end of file
+    target_id: int # ID do veículo ou do motorista
+
+class PdfJobStatus(BaseModel):
+    id: str
+    status: str # "pending", "done" ou "failed"
+    filename: str
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    expires_at: datetime
+    size_bytes: Optional[int] = None
+    error: Optional[str] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -19,6 +19,22 @@ class TelemetryBatch(BaseModel):
     events: List[Dict[str, Any]] = [] # Aceita lista vazia, necessário para o ESP32
     points: List[PointSchema]
 
+class RejectedPoint(BaseModel):
+    index: int
+    ts: Optional[int] = None
+    reason: str
+
+class TelemetrySyncResult(BaseModel):
+    status: str = "ok"
+    saved: int
+    rejected: int = 0
+    rejected_points: List[RejectedPoint] = []
+    # Métricas de throughput do lote
+    elapsed_ms: float = 0.0
+    points_per_second: float = 0.0
+    # Último ponto aceito (uso interno para atualizar o veículo)
+    last_point: Optional[PointSchema] = Field(None, exclude=True)
+
 class TelemetryPayload(BaseModel):
     device_id: str
     timestamp: datetime
@@ -46,5 +62,3 @@ class TelemetryPacket(BaseModel):
     journey_id: Optional[int] = None
     points: List[TelemetryPoint]
     events: List[TelemetryEvent]
-
-TelemetryPayload = TelemetryBatch
\ No newline at end of file
@@ -58,4 +58,5 @@ class VehiclePublic(VehicleBase):
 # Schema para respostas paginadas
 class VehicleListResponse(BaseModel):
     vehicles: List[VehiclePublic]
-    total_items: int
\ No newline at end of file
+    total_items: Optional[int] = None # Só quando include_total=true
+    next_cursor: Optional[str] = None
\ No newline at end of file
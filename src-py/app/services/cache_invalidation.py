@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationChannel:
+    """
+    Propaga a invalidação de um cache por processo aos outros workers pelo pub/sub
+    do Redis, como o mapa em tempo real. A invalidação local é sempre imediata; sem
+    Redis (ou com ele indisponível) os outros workers dependem do TTL do cache.
+    """
+    CHANNEL_PREFIX = "cache-invalidate:"
+
+    def __init__(self, name: str, handler: Callable[[str], None], redis_url: Optional[str] = None):
+        self.name = name
+        self._handler = handler
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis_asyncio
+            self._redis = redis_asyncio.from_url(redis_url)
+        self._listener: Optional[asyncio.Task] = None
+        self.published = 0
+        self.received = 0
+
+    @property
+    def channel(self) -> str:
+        return f"{self.CHANNEL_PREFIX}{self.name}"
+
+    async def invalidate(self, key):
+        self._handler(str(key))
+        if self._listener is not None and not self._listener.done():
+            try:
+                await self._redis.publish(self.channel, str(key))
+                self.published += 1
+            except Exception as e:
+                logger.warning(f"Redis indisponível para invalidar o cache {self.name}: {e}")
+
+    async def _listen(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = message["data"]
+                # A própria mensagem também volta: invalidar duas vezes é inofensivo
+                self._handler(data.decode() if isinstance(data, bytes) else data)
+                self.received += 1
+        finally:
+            await pubsub.close()
+
+    def start(self):
+        if self._redis is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from app.core.cache import TTLCache, cache_registry, warn_if_per_worker
+from app.core.config import settings
+from app.models.alert_model import Alert
+from app.models.fuel_log_model import FuelLog
+from app.models.journey_model import Journey
+from app.models.maintenance_model import MaintenanceRequest
+from app.models.user_model import User
+from app.models.vehicle_cost_model import VehicleCost
+from app.models.vehicle_model import Vehicle
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryDashboardCacheBackend:
+    def __init__(self, max_stale_seconds: float):
+        self._entries = TTLCache("dashboard_entries", maxsize=2048, ttl=max_stale_seconds)
+        self._generations: Dict[int, int] = {}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, entry: Dict[str, Any]):
+        self._entries.set(key, entry)
+
+    async def generation(self, organization_id: int) -> int:
+        return self._generations.get(organization_id, 0)
+
+    def invalidate(self, organization_id: int):
+        self._generations[organization_id] = self._generations.get(organization_id, 0) + 1
+
+
+class UncachedDashboardCacheBackend:
+    """
+    Sem cache: cada pedido recalcula o dashboard. Usado com o backend em memória e
+    vários workers, em que a geração de um worker não vê as escritas feitas nos outros.
+    """
+    shared_generations = False
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    async def set(self, key: str, entry: Dict[str, Any]):
+        pass
+
+    async def generation(self, organization_id: int) -> int:
+        return 0
+
+    def invalidate(self, organization_id: int):
+        pass
+
+
+class RedisDashboardCacheBackend:
+    """
+    Partilha o cache e as gerações por organização entre workers. Se o Redis
+    falhar, usa o backend em memória como contingência.
+    """
+    KEY_PREFIX = "dashboard:cache:"
+    GENERATION_PREFIX = "dashboard:gen:"
+
+    def __init__(self, url: str, max_stale_seconds: float):
+        import redis.asyncio as redis_asyncio
+        self._redis = redis_asyncio.from_url(url)
+        self._ttl = int(max_stale_seconds)
+        self._fallback = InMemoryDashboardCacheBackend(max_stale_seconds)
+        self._pending: Set[asyncio.Task] = set()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await self._redis.get(f"{self.KEY_PREFIX}{key}")
+        except Exception as e:
+            logger.warning(f"Redis indisponível para o cache do dashboard: {e}")
+            return await self._fallback.get(key)
+        return json.loads(raw) if raw else None
+
+    async def set(self, key: str, entry: Dict[str, Any]):
+        try:
+            await self._redis.set(f"{self.KEY_PREFIX}{key}", json.dumps(entry), ex=self._ttl)
+        except Exception as e:
+            logger.warning(f"Redis indisponível para o cache do dashboard: {e}")
+            await self._fallback.set(key, entry)
+
+    async def generation(self, organization_id: int) -> int:
+        try:
+            raw = await self._redis.get(f"{self.GENERATION_PREFIX}{organization_id}")
+        except Exception as e:
+            logger.warning(f"Redis indisponível para o cache do dashboard: {e}")
+            return await self._fallback.generation(organization_id)
+        return int(raw or 0)
+
+    async def _incr(self, organization_id: int):
+        try:
+            await self._redis.incr(f"{self.GENERATION_PREFIX}{organization_id}")
+        except Exception as e:
+            logger.warning(f"Redis indisponível para o cache do dashboard: {e}")
+
+    def invalidate(self, organization_id: int):
+        self._fallback.invalidate(organization_id)
+        try:
+            task = asyncio.get_running_loop().create_task(self._incr(organization_id))
+        except RuntimeError:
+            return  # Fora do event loop (ex.: worker Celery): o TTL cobre
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+
+class DashboardCache:
+    """
+    Cache dos resultados do dashboard do gestor por (organização, período, nível de
+    acesso). Cada escrita relevante incrementa a geração da organização, o que
+    torna as entradas anteriores inválidas. Com stale-while-revalidate, uma entrada
+    expirada pelo TTL (mas ainda da geração atual) é servida enquanto é recalculada
+    em segundo plano.
+    """
+
+    def __init__(self, backend, *, ttl_seconds: float, max_stale_seconds: float, stale_while_revalidate: bool):
+        self.backend = backend
+        self.ttl = ttl_seconds
+        self.max_stale = max_stale_seconds
+        self.stale_while_revalidate = stale_while_revalidate
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        cache_registry["dashboard"] = self
+
+    @staticmethod
+    def make_key(organization_id: int, *parts: Hashable) -> str:
+        return ":".join(str(p) for p in (organization_id, *parts))
+
+    async def get_or_build(
+        self, organization_id: int, key: str, builder: Callable[[], Awaitable[str]]
+    ) -> str:
+        """Retorna o payload (JSON) em cache ou o produzido por builder()."""
+        generation = await self.backend.generation(organization_id)
+        entry = await self.backend.get(key)
+
+        if entry is not None and entry["generation"] == generation:
+            age = time.time() - entry["created_at"]
+            if age < self.ttl:
+                self.hits += 1
+                return entry["payload"]
+            if self.stale_while_revalidate and age < self.max_stale:
+                self.stale_hits += 1
+                self._schedule_refresh(organization_id, key, builder)
+                return entry["payload"]
+
+        self.misses += 1
+        return await self._build_and_store(organization_id, key, builder)
+
+    async def _build_and_store(self, organization_id: int, key: str, builder: Callable[[], Awaitable[str]]) -> str:
+        # A geração é lida antes de calcular: uma escrita durante o cálculo invalida o resultado
+        generation = await self.backend.generation(organization_id)
+        payload = await builder()
+        await self.backend.set(key, {"generation": generation, "created_at": time.time(), "payload": payload})
+        return payload
+
+    def _schedule_refresh(self, organization_id: int, key: str, builder: Callable[[], Awaitable[str]]):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._build_and_store(organization_id, key, builder)
+            except Exception:
+                logger.exception("Falha ao recalcular o dashboard em segundo plano")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    @property
+    def enabled(self) -> bool:
+        """Se as gerações acompanham as escritas de todos os workers (e podem servir de versão)."""
+        return getattr(self.backend, "shared_generations", True)
+
+    async def data_version(self, organization_id: int) -> int:
+        """Geração atual da organização; muda a cada escrita relevante confirmada."""
+        return await self.backend.generation(organization_id)
+
+    def invalidate(self, organization_id: int):
+        self.backend.invalidate(organization_id)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "stale_while_revalidate": self.stale_while_revalidate,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshing": len(self._refreshing),
+            "hit_rate": round((self.hits + self.stale_hits) / total, 4) if total else 0.0,
+        }
+
+
+def _build_dashboard_cache() -> DashboardCache:
+    if settings.DASHBOARD_CACHE_BACKEND == "redis":
+        backend = RedisDashboardCacheBackend(settings.REDIS_URL, settings.DASHBOARD_CACHE_MAX_STALE_SECONDS)
+    elif warn_if_per_worker("Cache do dashboard", "DASHBOARD_CACHE_BACKEND"):
+        backend = UncachedDashboardCacheBackend()
+    else:
+        backend = InMemoryDashboardCacheBackend(settings.DASHBOARD_CACHE_MAX_STALE_SECONDS)
+    return DashboardCache(
+        backend,
+        ttl_seconds=settings.DASHBOARD_CACHE_TTL_SECONDS,
+        max_stale_seconds=settings.DASHBOARD_CACHE_MAX_STALE_SECONDS,
+        stale_while_revalidate=settings.DASHBOARD_CACHE_STALE_WHILE_REVALIDATE,
+    )
+
+
+dashboard_cache = _build_dashboard_cache()
+
+
+# Escritas ORM nos modelos que alimentam o dashboard marcam a organização na sessão;
+# a invalidação só acontece quando a transação é confirmada.
+_DASHBOARD_SOURCES = (VehicleCost, Journey, FuelLog, MaintenanceRequest, Vehicle, Alert)
+_DIRTY_KEY = "dashboard_dirty_orgs"
+
+
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.organization_id is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(target.organization_id)
+
+
+for _model in _DASHBOARD_SOURCES:
+    for _event_name in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _event_name, _mark_dirty)
+
+# Utilizadores aparecem pelo nome nos relatórios e no pódio/alertas do dashboard; as
+# outras atualizações (senha, preferências de notificação...) não mudam o que é exibido
+_USER_DISPLAY_FIELDS = ("full_name", "role", "is_active", "avatar_url", "organization_id")
+
+
+def _mark_user_dirty(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in _USER_DISPLAY_FIELDS):
+        _mark_dirty(mapper, connection, target)
+
+
+for _event_name in ("after_insert", "after_delete"):
+    event.listen(User, _event_name, _mark_dirty)
+event.listen(User, "after_update", _mark_user_dirty)
+
+
+def mark_dashboard_dirty(db, organization_id: int):
+    """
+    Para escritas Core (insert()/update() em lote), que não passam pelos eventos
+    do mapper: a organização é invalidada quando a transação for confirmada.
+    """
+    session = db.sync_session if hasattr(db, "sync_session") else db
+    session.info.setdefault(_DIRTY_KEY, set()).add(organization_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    for organization_id in session.info.pop(_DIRTY_KEY, ()):
+        dashboard_cache.invalidate(organization_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+import weakref
+from datetime import date
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud import crud_report
+from app.db.session import primary_session
+from app.schemas.dashboard_schema import ManagerDashboardResponse
+from app.services.dashboard_cache import dashboard_cache
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Conexões extra que as consultas paralelas do dashboard podem ocupar no processo,
+# somando todos os pedidos: um pico de dashboards não esgota o pool dos outros pedidos.
+# Um semáforo por event loop (na aplicação há um só por worker)
+_query_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _query_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _query_slots.get(loop)
+    if semaphore is None:
+        semaphore = _query_slots[loop] = asyncio.Semaphore(settings.DASHBOARD_QUERY_CONCURRENCY)
+    return semaphore
+
+
+class ManagerDashboardService:
+    """
+    Monta o dashboard do gestor a partir de um conjunto mínimo de consultas agrupadas.
+    Os resultados partilhados (setor, contagens de veículos, km por dia, custos) são
+    calculados uma única vez e reutilizados pelos vários blocos. Consultas
+    independentes correm em paralelo, cada uma na sua própria sessão/conexão, com
+    no máximo DASHBOARD_QUERY_CONCURRENCY conexões no processo (entre todos os pedidos).
+    """
+
+    @staticmethod
+    async def build(
+        db: AsyncSession, *, organization_id: int, start_date: date, premium: bool
+    ) -> ManagerDashboardResponse:
+        started = time.perf_counter()
+        semaphore = _query_semaphore()
+
+        async def run(query: Callable[[AsyncSession], Awaitable[T]]) -> T:
+            # Mesma base (engine) da sessão do pedido, mas conexão própria
+            async with semaphore:
+                async with AsyncSession(db.bind, expire_on_commit=False) as session:
+                    return await query(session)
+
+        totals_task = asyncio.create_task(run(
+            lambda s: crud_report.get_dashboard_totals(s, organization_id=organization_id, start_date=start_date)
+        ))
+
+        async def podium():
+            totals = await totals_task
+            return await run(lambda s: crud_report.get_podium_drivers(
+                s, organization_id=organization_id, sector=totals["sector"]
+            ))
+
+        queries: dict[str, Awaitable[Any]] = {
+            "totals": totals_task,
+            "costs": run(lambda s: crud_report.get_costs_by_category_last_30_days(
+                s, organization_id=organization_id, start_date=start_date
+            )),
+            "distance": run(lambda s: crud_report.get_distance_per_day(
+                s, organization_id=organization_id, start_date=start_date
+            )),
+            "alerts": run(lambda s: crud_report.get_recent_alerts(s, organization_id=organization_id)),
+            "maintenances": run(lambda s: crud_report.get_upcoming_maintenances(s, organization_id=organization_id)),
+            "goal": run(lambda s: crud_report.get_active_goal_with_progress(s, organization_id=organization_id)),
+        }
+        if premium:
+            queries["podium"] = podium()
+
+        results = dict(zip(queries, await asyncio.gather(*queries.values())))
+        totals = results["totals"]
+
+        km_per_day = crud_report.build_km_per_day(results["distance"], totals["sector"])
+        total_costs = sum(c.total_amount for c in results["costs"])
+        efficiency_kpis = crud_report.build_efficiency_kpis(
+            totals, total_costs=total_costs, total_distance=sum(item.total_km for item in km_per_day)
+        )
+
+        response = ManagerDashboardResponse(
+            kpis=crud_report.build_dashboard_kpis(totals),
+            efficiency_kpis=efficiency_kpis,
+            costs_by_category=results["costs"],
+            km_per_day_last_30_days=km_per_day if premium else None,
+            podium_drivers=results.get("podium"),
+            recent_alerts=results["alerts"],
+            upcoming_maintenances=results["maintenances"],
+            active_goal=results["goal"],
+        )
+        logger.debug(
+            "Dashboard da organização %s montado em %.1f ms", organization_id, (time.perf_counter() - started) * 1000
+        )
+        return response
+
+    @staticmethod
+    async def build_cached(
+        db: AsyncSession, *, organization_id: int, period: str, start_date: date, premium: bool
+    ) -> str:
+        """
+        Igual a build(), mas já serializado em JSON e servido pelo cache do dashboard
+        (chave: organização, período e nível de acesso). O cache é partilhado e
+        marcado com a geração atual, por isso é sempre calculado no primário.
+        """
+        key = dashboard_cache.make_key(
+            organization_id, "manager", period, start_date.isoformat(), "premium" if premium else "basic"
+        )
+
+        async def build_payload() -> str:
+            async with primary_session(db) as source:
+                dashboard = await ManagerDashboardService.build(
+                    source, organization_id=organization_id, start_date=start_date, premium=premium
+                )
+            return dashboard.model_dump_json()
+
+        return await dashboard_cache.get_or_build(organization_id, key, build_payload)
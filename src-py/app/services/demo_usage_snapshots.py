@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field, replace
+from datetime import date
+from typing import Dict, Tuple
+
+from sqlalchemy import select, func, literal, union_all, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import primary_session
+from app.models.client_model import Client
+from app.models.demo_usage_model import DemoUsage
+from app.models.implement_model import Implement
+from app.models.journey_model import Journey
+from app.models.maintenance_model import MaintenanceRequest
+from app.models.part_model import Part
+from app.models.user_model import User, UserRole
+from app.models.vehicle_component_model import VehicleComponent
+from app.models.vehicle_cost_model import VehicleCost
+from app.models.vehicle_model import Vehicle
+
+
+@dataclass(frozen=True)
+class DemoUsageSnapshot:
+    """
+    Uso da conta demonstração de uma organização no mês corrente.
+    `counts` tem as contagens reais (recursos com limite total e registros do
+    mês); `usage` tem os contadores da tabela demousage.
+    """
+    organization_id: int
+    period: date
+    counts: Dict[str, int] = field(default_factory=dict)
+    usage: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def has_demo_manager(self) -> bool:
+        return self.counts.get("demo_managers", 0) > 0
+
+    def with_usage(self, resource_type: str, usage_count: int) -> "DemoUsageSnapshot":
+        return replace(self, usage={**self.usage, resource_type: usage_count})
+
+
+def current_period() -> date:
+    return date.today().replace(day=1)
+
+
+def _next_month(start_of_month: date) -> date:
+    if start_of_month.month == 12:
+        return start_of_month.replace(year=start_of_month.year + 1, month=1)
+    return start_of_month.replace(month=start_of_month.month + 1)
+
+
+def _snapshot_query(organization_id: int, period: date):
+    """Todas as contagens numa única consulta: linhas (tipo, recurso, valor)."""
+    next_period = _next_month(period)
+
+    def count(key: str, model, *criteria, from_=None):
+        return (
+            select(literal("count").label("kind"), literal(key).label("key"), func.count().label("value"))
+            .select_from(from_ if from_ is not None else model)
+            .where(*criteria)
+        )
+
+    return union_all(
+        count("vehicles", Vehicle, Vehicle.organization_id == organization_id),
+        count("users", User, User.organization_id == organization_id),
+        count("parts", Part, Part.organization_id == organization_id),
+        count("clients", Client, Client.organization_id == organization_id),
+        count("implements", Implement, Implement.organization_id == organization_id),
+        count(
+            "vehicle_components", VehicleComponent, Vehicle.organization_id == organization_id,
+            from_=VehicleComponent.__table__.join(Vehicle.__table__, VehicleComponent.vehicle_id == Vehicle.id),
+        ),
+        count("journeys", Journey, Journey.organization_id == organization_id,
+              Journey.start_time >= period, Journey.start_time < next_period),
+        count("maintenance_requests", MaintenanceRequest, MaintenanceRequest.organization_id == organization_id,
+              MaintenanceRequest.created_at >= period, MaintenanceRequest.created_at < next_period),
+        count("vehicle_costs", VehicleCost, VehicleCost.organization_id == organization_id,
+              VehicleCost.date >= period, VehicleCost.date < next_period),
+        count("demo_managers", User, User.organization_id == organization_id, User.role == UserRole.CLIENTE_DEMO),
+        select(literal("usage"), DemoUsage.resource_type, DemoUsage.usage_count)
+        .where(DemoUsage.organization_id == organization_id, DemoUsage.period == period),
+    )
+
+
+class DemoUsageSnapshots:
+    """
+    Cache curto dos snapshots por (organização, mês). Escritas nos modelos
+    contados descartam o snapshot após o commit; incrementos de uso são
+    aplicados sobre o snapshot em cache, também só após o commit.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self._cache = TTLCache("demo_usage_snapshots", maxsize=5_000, ttl=ttl_seconds)
+
+    async def get(self, db: AsyncSession, *, organization_id: int) -> DemoUsageSnapshot:
+        period = current_period()
+        key = (organization_id, period)
+        snapshot = self._cache.get(key)
+        if snapshot is None:
+            # O snapshot é partilhado pelos pedidos seguintes: lido no primário
+            async with primary_session(db) as source:
+                snapshot = await self.load(source, organization_id=organization_id, period=period)
+            self._cache.set(key, snapshot)
+        return snapshot
+
+    async def load(self, db: AsyncSession, *, organization_id: int, period: date) -> DemoUsageSnapshot:
+        counts: Dict[str, int] = {}
+        usage: Dict[str, int] = {}
+        for kind, key, value in (await db.execute(_snapshot_query(organization_id, period))).all():
+            (counts if kind == "count" else usage)[key] = value or 0
+        return DemoUsageSnapshot(organization_id=organization_id, period=period, counts=counts, usage=usage)
+
+    def apply_usage(self, organization_id: int, period: date, resource_type: str, usage_count: int):
+        self._cache.update((organization_id, period), lambda s: s.with_usage(resource_type, usage_count))
+
+    def invalidate(self, organization_id: int):
+        self._cache.invalidate_where(lambda key, _: key[0] == organization_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+demo_usage_snapshots = DemoUsageSnapshots(settings.DEMO_USAGE_SNAPSHOT_TTL_SECONDS)
+
+
+# Como no cache do dashboard: as escritas marcam a organização na sessão e o
+# snapshot só é descartado/atualizado quando a transação é confirmada.
+_COUNTED_MODELS = (Vehicle, User, Part, Client, Implement, Journey, MaintenanceRequest, VehicleCost)
+_DIRTY_KEY = "demo_usage_dirty_orgs"
+_PENDING_USAGE_KEY = "demo_usage_pending"
+
+
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    organization_id = inspect(target).dict.get("organization_id")
+    if session is not None and organization_id is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(organization_id)
+
+
+def _mark_component_dirty(mapper, connection, target):
+    session = object_session(target)
+    vehicle_id = inspect(target).dict.get("vehicle_id")
+    if session is None or vehicle_id is None:
+        return
+    organization_id = connection.scalar(select(Vehicle.organization_id).where(Vehicle.id == vehicle_id))
+    if organization_id is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(organization_id)
+
+
+for _model in _COUNTED_MODELS:
+    for _event_name in ("after_insert", "after_delete"):
+        event.listen(_model, _event_name, _mark_dirty)
+# Mudanças de papel alteram "demo_managers"
+event.listen(User, "after_update", _mark_dirty)
+for _event_name in ("after_insert", "after_delete"):
+    event.listen(VehicleComponent, _event_name, _mark_component_dirty)
+
+
+def record_usage(db: AsyncSession, *, organization_id: int, period: date, resource_type: str, usage_count: int):
+    """Regista o novo valor de um contador de uso para aplicar ao snapshot após o commit."""
+    pending: Dict[Tuple[int, date, str], int] = db.sync_session.info.setdefault(_PENDING_USAGE_KEY, {})
+    pending[(organization_id, period, resource_type)] = usage_count
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session):
+    dirty = session.info.pop(_DIRTY_KEY, ())
+    for organization_id in dirty:
+        demo_usage_snapshots.invalidate(organization_id)
+    for (organization_id, period, resource_type), usage_count in session.info.pop(_PENDING_USAGE_KEY, {}).items():
+        if organization_id not in dirty:
+            demo_usage_snapshots.apply_usage(organization_id, period, resource_type, usage_count)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop(_DIRTY_KEY, None)
+    session.info.pop(_PENDING_USAGE_KEY, None)
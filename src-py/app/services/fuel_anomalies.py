@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud.crud_fuel_log import ABNORMAL_CONSUMPTION_RATIO
+from app.crud.crud_notification import NotificationBatch
+from app.models.fuel_baseline_model import VehicleFuelBaseline
+from app.models.fuel_log_model import FuelLog
+from app.models.notification_model import Notification, NotificationType
+from app.models.vehicle_model import Vehicle
+
+
+@dataclass
+class ConsumptionScores:
+    """Resultado da avaliação vetorizada, alinhado com as linhas de entrada."""
+    km_per_liter: np.ndarray   # NaN quando não há distância/litros válidos
+    prior_mean: np.ndarray     # média dos abastecimentos anteriores do mesmo veículo (NaN sem histórico)
+    is_abnormal: np.ndarray
+
+
+def score_consumption(vehicle_ids: np.ndarray, odometers: np.ndarray, liters: np.ndarray) -> ConsumptionScores:
+    """
+    Avalia todos os abastecimentos de uma vez. As linhas têm de vir ordenadas
+    por (veículo, data). Cada abastecimento é comparado com a média dos anteriores
+    do mesmo veículo, como no momento em que foi registado.
+    """
+    vehicle_ids = np.asarray(vehicle_ids)
+    odometers = np.asarray(odometers, dtype=float)
+    liters = np.asarray(liters, dtype=float)
+
+    same_vehicle = np.r_[False, vehicle_ids[1:] == vehicle_ids[:-1]]
+    distance = np.where(same_vehicle, odometers - np.r_[np.nan, odometers[:-1]], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = (distance > 0) & (liters > 0)
+        km_per_liter = np.where(valid, distance / np.where(liters > 0, liters, 1.0), np.nan)
+
+    # Somas acumuladas por veículo, sem contar o próprio abastecimento
+    values = np.where(valid, km_per_liter, 0.0)
+    group = np.cumsum(~same_vehicle) - 1
+    group_start = np.flatnonzero(~same_vehicle)
+    sum_before = np.cumsum(values) - values
+    count_before = np.cumsum(valid) - valid
+    prior_sum = sum_before - sum_before[group_start][group]
+    prior_count = count_before - count_before[group_start][group]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        prior_mean = np.where(prior_count > 0, prior_sum / np.maximum(prior_count, 1), np.nan)
+        is_abnormal = valid & (prior_mean > 0) & (km_per_liter < prior_mean * ABNORMAL_CONSUMPTION_RATIO)
+
+    return ConsumptionScores(km_per_liter=km_per_liter, prior_mean=prior_mean, is_abnormal=is_abnormal)
+
+
+def _baseline_rows(organization_id: int, vehicle_ids: np.ndarray, odometers: np.ndarray,
+                   timestamps: List[datetime], km_per_liter: np.ndarray) -> List[Dict[str, Any]]:
+    """Base incremental final de cada veículo (equivalente a somar os abastecimentos um a um)."""
+    last_of_vehicle = np.r_[vehicle_ids[1:] != vehicle_ids[:-1], True]
+    group = np.cumsum(np.r_[True, vehicle_ids[1:] != vehicle_ids[:-1]]) - 1
+    valid = ~np.isnan(km_per_liter)
+    values = np.where(valid, km_per_liter, 0.0)
+    counts = np.bincount(group, weights=valid)
+    sums = np.bincount(group, weights=values)
+    means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+    m2 = np.bincount(group, weights=np.where(valid, (values - means[group]) ** 2, 0.0))
+
+    rows = []
+    for g, i in enumerate(np.flatnonzero(last_of_vehicle)):
+        rows.append({
+            "vehicle_id": int(vehicle_ids[i]),
+            "organization_id": organization_id,
+            "samples": int(counts[g]),
+            "mean_km_per_liter": float(means[g]),
+            "m2": float(m2[g]),
+            "last_odometer": int(odometers[i]),
+            "last_timestamp": timestamps[i],
+        })
+    return rows
+
+
+async def rescore_organization(db: AsyncSession, *, organization_id: int, notify: bool = False) -> Dict[str, Any]:
+    """
+    Reavalia todos os abastecimentos da organização numa passagem vetorizada,
+    reconstrói as bases incrementais dos veículos e, com notify=True, avisa os
+    gestores sobre anomalias que ainda não tinham sido notificadas.
+    """
+    rows = (await db.execute(
+        select(FuelLog.id, FuelLog.vehicle_id, FuelLog.timestamp, FuelLog.odometer, FuelLog.liters)
+        .where(FuelLog.organization_id == organization_id)
+        .order_by(FuelLog.vehicle_id, FuelLog.timestamp, FuelLog.id)
+    )).all()
+
+    await db.execute(delete(VehicleFuelBaseline).where(VehicleFuelBaseline.organization_id == organization_id))
+    if not rows:
+        await db.commit()
+        return {"fuel_logs": 0, "vehicles": 0, "anomalies": []}
+
+    log_ids = np.array([r.id for r in rows])
+    vehicle_ids = np.array([r.vehicle_id for r in rows])
+    odometers = np.array([r.odometer for r in rows], dtype=float)
+    timestamps = [r.timestamp for r in rows]
+    scores = score_consumption(vehicle_ids, odometers, np.array([r.liters for r in rows], dtype=float))
+
+    baselines = _baseline_rows(organization_id, vehicle_ids, odometers, timestamps, scores.km_per_liter)
+    await db.execute(insert(VehicleFuelBaseline), baselines)
+
+    anomalies = [
+        {
+            "fuel_log_id": int(log_ids[i]),
+            "vehicle_id": int(vehicle_ids[i]),
+            "timestamp": timestamps[i],
+            "km_per_liter": round(float(scores.km_per_liter[i]), 2),
+            "average_km_per_liter": round(float(scores.prior_mean[i]), 2),
+        }
+        for i in np.flatnonzero(scores.is_abnormal)
+    ]
+
+    if notify and anomalies:
+        await _notify_new_anomalies(db, organization_id=organization_id, anomalies=anomalies)
+    await db.commit()
+    return {"fuel_logs": len(rows), "vehicles": len(baselines), "anomalies": anomalies}
+
+
+async def _notify_new_anomalies(db: AsyncSession, *, organization_id: int, anomalies: List[Dict[str, Any]]):
+    already_notified = set((await db.execute(
+        select(Notification.related_entity_id).where(
+            Notification.organization_id == organization_id,
+            Notification.notification_type == NotificationType.ABNORMAL_FUEL_CONSUMPTION,
+            Notification.related_entity_type == "fuel_log",
+        )
+    )).scalars().all())
+    vehicle_names = {
+        v.id: f"{v.brand} {v.model}"
+        for v in (await db.execute(
+            select(Vehicle.id, Vehicle.brand, Vehicle.model).where(Vehicle.organization_id == organization_id)
+        )).all()
+    }
+
+    batch = NotificationBatch(db, organization_id=organization_id)
+    for anomaly in anomalies:
+        if anomaly["fuel_log_id"] in already_notified:
+            continue
+        batch.add(
+            message=(
+                f"Consumo anormal para {vehicle_names.get(anomaly['vehicle_id'], 'veículo')}: "
+                f"{anomaly['km_per_liter']:.2f} km/l (Média: {anomaly['average_km_per_liter']:.2f} km/l)."
+            ),
+            notification_type=NotificationType.ABNORMAL_FUEL_CONSUMPTION,
+            send_to_managers=True,
+            related_entity_type="fuel_log",
+            related_entity_id=anomaly["fuel_log_id"],
+            related_vehicle_id=anomaly["vehicle_id"],
+        )
+    await batch.flush()
@@ -1,54 +1,285 @@
+import time
+import asyncio
+import numpy as np
+import shapely
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from shapely.geometry import Point, Polygon
+from sqlalchemy import select, insert, event
+from shapely.geometry import Polygon
+from shapely.strtree import STRtree
 from app.models.geofence_model import Geofence
-from app.models.alert_model import Alert
-from datetime import datetime
+from app.models.alert_model import Alert, AlertLevel, AlertType
+from app.crud.crud_vehicle import VehicleRef
+from app.schemas.geofence_schema import GeofenceTransition
+from app.services.dashboard_cache import mark_dashboard_dirty
+from app.services.geofence_state import VehicleZoneState, geofence_state_store
+from app.core.config import settings
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+
+@dataclass(frozen=True)
+class IndexedZone:
+    id: int
+    name: str
+    type: str
+    polygon: Polygon
+
+
+class GeofenceIndex:
+    """
+    Índice em memória das cercas ativas: polígonos Shapely preparados num STRtree.
+    É carregado uma vez e recarregado apenas quando invalidado (alteração de uma
+    Geofence via ORM) ou após RELOAD_INTERVAL, para captar mudanças de outros workers.
+    """
+    RELOAD_INTERVAL = 60.0  # segundos
+
+    def __init__(self):
+        self._zones: List[IndexedZone] = []
+        self._tree: Optional[STRtree] = None
+        self._version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._version += 1
+
+    def _needs_reload(self) -> bool:
+        return (
+            self._loaded_version != self._version
+            or time.monotonic() - self._loaded_at > self.RELOAD_INTERVAL
+        )
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if not self._needs_reload():
+            return
+        async with self._lock:
+            if not self._needs_reload():
+                return
+            version = self._version
+            result = await db.execute(
+                select(Geofence.id, Geofence.name, Geofence.type, Geofence.polygon_points)
+                .where(Geofence.is_active == True)
+            )
+            zones = []
+            for row in result.all():
+                # polygon_points deve ser [[lat, lon], ...]
+                if not row.polygon_points or len(row.polygon_points) < 3:
+                    continue
+                polygon = Polygon(row.polygon_points)
+                if not polygon.is_valid:
+                    polygon = shapely.make_valid(polygon)
+                shapely.prepare(polygon)
+                zones.append(IndexedZone(id=row.id, name=row.name, type=row.type, polygon=polygon))
+
+            self._zones = zones
+            self._tree = STRtree([z.polygon for z in zones]) if zones else None
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+
+    def zone(self, zone_id: int) -> Optional[IndexedZone]:
+        return next((z for z in self._zones if z.id == zone_id), None)
+
+    def contains_matrix(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[List[IndexedZone], np.ndarray]:
+        """
+        Avalia todos os pontos de uma vez. Retorna as cercas candidatas (filtradas
+        pelo bbox no STRtree) e uma matriz booleana (pontos x candidatas).
+        """
+        if self._tree is None or lats.size == 0:
+            return [], np.zeros((lats.size, 0), dtype=bool)
+
+        _, zone_idx = self._tree.query(shapely.points(lats, lons))
+        candidates = [self._zones[i] for i in np.unique(zone_idx)]
+
+        matrix = np.empty((lats.size, len(candidates)), dtype=bool)
+        for col, zone in enumerate(candidates):
+            matrix[:, col] = shapely.contains_xy(zone.polygon, lats, lons)
+        return candidates, matrix
+
+    def evaluate(
+        self, lats: np.ndarray, lons: np.ndarray, previous_zone_ids: Optional[Set[int]] = None
+    ) -> Tuple[List[GeofenceTransition], Set[int]]:
+        """
+        Calcula as transições de entrada/saída para uma sequência de pontos (em ordem
+        temporal), partindo do conjunto de cercas onde o veículo estava antes do lote.
+        Estado anterior desconhecido (None) equivale a "fora de todas as cercas": um
+        primeiro ponto dentro de uma cerca gera ENTER (o estado gravado evita repeti-lo
+        nos lotes seguintes). Retorna as transições e o conjunto de cercas no último ponto.
+        """
+        previous_zone_ids = previous_zone_ids or set()
+        if lats.size == 0:
+            return [], set(previous_zone_ids)
+
+        candidates, matrix = self.contains_matrix(lats, lons)
+        zones_by_id = {z.id: z for z in self._zones}
+        transitions: List[GeofenceTransition] = []
+
+        # Cercas onde o veículo estava e que nenhum ponto do lote sequer toca no bbox
+        candidate_ids = {z.id for z in candidates}
+        for zone_id in sorted(previous_zone_ids - candidate_ids):
+            zone = zones_by_id.get(zone_id)
+            if zone:
+                transitions.append(self._transition(zone, "EXIT", 0, lats, lons))
+        initial = np.array([z.id in previous_zone_ids for z in candidates], dtype=np.int8)
+
+        if candidates:
+            changes = np.diff(np.vstack([initial, matrix.astype(np.int8)]), axis=0)
+            point_idx, col_idx = np.nonzero(changes)
+            for i, col in zip(point_idx, col_idx):
+                event_name = "ENTER" if changes[i, col] > 0 else "EXIT"
+                transitions.append(self._transition(candidates[col], event_name, int(i), lats, lons))
+
+        transitions.sort(key=lambda t: t.point_index)
+        current_zone_ids = {candidates[col].id for col in np.nonzero(matrix[-1])[0]}
+        return transitions, current_zone_ids
+
+    @staticmethod
+    def _transition(zone: IndexedZone, event_name: str, index: int, lats: np.ndarray, lons: np.ndarray) -> GeofenceTransition:
+        return GeofenceTransition(
+            zone_id=zone.id,
+            zone_name=zone.name,
+            zone_type=zone.type,
+            event=event_name,
+            point_index=index,
+            latitude=float(lats[index]),
+            longitude=float(lons[index]),
+        )
+
+
+geofence_index = GeofenceIndex()
+
+
+# Qualquer escrita ORM numa cerca invalida o índice deste processo
+@event.listens_for(Geofence, "after_insert")
+@event.listens_for(Geofence, "after_update")
+@event.listens_for(Geofence, "after_delete")
+def _invalidate_geofence_index(mapper, connection, target):
+    geofence_index.invalidate()
+
 
 class GeofenceService:
 
     @staticmethod
-    async def check_geofences(db: AsyncSession, vehicle_id: int, lat: float, lon: float):
+    def _is_night(ts: datetime) -> bool:
+        # Os horários do dispositivo chegam em UTC (sem tzinfo); a janela noturna
+        # é definida na hora local de GEOFENCE_NIGHT_TIMEZONE
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        hour = ts.astimezone(ZoneInfo(settings.GEOFENCE_NIGHT_TIMEZONE)).hour
+        start, end = settings.GEOFENCE_NIGHT_START_HOUR, settings.GEOFENCE_NIGHT_END_HOUR
+        if start <= end:
+            return start <= hour < end
+        return hour >= start or hour < end
+
+    @staticmethod
+    def _apply_dwell(
+        transitions: List[GeofenceTransition],
+        state: VehicleZoneState,
+        current_zone_ids: Set[int],
+        timestamps: List[datetime],
+        lats: np.ndarray,
+        lons: np.ndarray,
+    ) -> List[GeofenceTransition]:
+        """
+        Atualiza os instantes de entrada com as transições do lote e emite um único
+        DWELL por permanência quando o veículo fica numa cerca além do limite.
+        """
+        for t in transitions:
+            if t.event == "ENTER":
+                state.entered_at[t.zone_id] = timestamps[t.point_index]
+                state.dwell_notified.discard(t.zone_id)
+            elif t.event == "EXIT":
+                state.entered_at.pop(t.zone_id, None)
+                state.dwell_notified.discard(t.zone_id)
+
+        last = len(timestamps) - 1
+        dwell_limit = timedelta(minutes=settings.GEOFENCE_DWELL_MINUTES)
+        dwell_events = []
+        for zone_id in sorted(current_zone_ids):
+            entered = state.entered_at.setdefault(zone_id, timestamps[0])
+            zone = geofence_index.zone(zone_id)
+            if zone and zone_id not in state.dwell_notified and timestamps[last] - entered >= dwell_limit:
+                dwell_events.append(GeofenceIndex._transition(zone, "DWELL", last, lats, lons))
+                state.dwell_notified.add(zone_id)
+        return dwell_events
+
+    @staticmethod
+    def _alert_for(t: GeofenceTransition) -> Optional[Dict[str, Any]]:
+        if t.zone_type == "RISK_ZONE" and t.event == "ENTER":
+            return {"level": AlertLevel.CRITICAL, "message": f"Veículo entrou em Zona de Risco: {t.zone_name}"}
+        if t.zone_type == "RISK_ZONE" and t.event == "DWELL":
+            return {
+                "level": AlertLevel.WARNING,
+                "message": f"Veículo parado há mais de {settings.GEOFENCE_DWELL_MINUTES} min em Zona de Risco: {t.zone_name}",
+            }
+        if t.zone_type == "SAFE_ZONE" and t.event == "EXIT" and t.timestamp and GeofenceService._is_night(t.timestamp):
+            return {"level": AlertLevel.CRITICAL, "message": f"Possível roubo: veículo saiu da zona segura {t.zone_name} fora de horário"}
+        return None
+
+    @staticmethod
+    async def check_geofences_batch(
+        db: AsyncSession,
+        *,
+        vehicle: VehicleRef,
+        lats: List[float],
+        lons: List[float],
+        timestamps: Optional[List[datetime]] = None,
+    ) -> List[GeofenceTransition]:
+        """
+        Avalia um lote de pontos (em ordem temporal) contra o índice de cercas numa
+        única chamada vetorizada. Usa o último estado conhecido do veículo para emitir
+        apenas transições (ENTER/EXIT/DWELL) e gera alertas somente para elas.
+        """
+        if not lats:
+            return []
+        if timestamps is None:
+            timestamps = [datetime.utcnow()] * len(lats)
+
+        await geofence_index.ensure_loaded(db)
+        lat_arr = np.asarray(lats, dtype=float)
+        lon_arr = np.asarray(lons, dtype=float)
+
+        state = await geofence_state_store.get(vehicle.id)
+        transitions, current_zone_ids = geofence_index.evaluate(
+            lat_arr, lon_arr, previous_zone_ids=state.zone_ids if state else None
+        )
+        state = state or VehicleZoneState()
+        transitions += GeofenceService._apply_dwell(transitions, state, current_zone_ids, timestamps, lat_arr, lon_arr)
+        for t in transitions:
+            t.timestamp = timestamps[t.point_index]
+
+        state.zone_ids = current_zone_ids
+        state.entered_at = {z: ts for z, ts in state.entered_at.items() if z in current_zone_ids}
+        state.dwell_notified &= current_zone_ids
+        state.updated_at = timestamps[-1]
+        await geofence_state_store.set(vehicle.id, state)
+
+        alert_rows = []
+        for t in transitions:
+            alert = GeofenceService._alert_for(t)
+            if alert:
+                alert_rows.append({
+                    "vehicle_id": vehicle.id,
+                    "organization_id": vehicle.organization_id,
+                    "type": AlertType.GENERIC,
+                    "latitude": t.latitude,
+                    "longitude": t.longitude,
+                    "timestamp": t.timestamp,
+                    **alert,
+                })
+        if alert_rows:
+            await db.execute(insert(Alert), alert_rows)
+            mark_dashboard_dirty(db, vehicle.organization_id)
+
+        return transitions
+
+    @staticmethod
+    async def check_geofences(db: AsyncSession, vehicle: VehicleRef, lat: float, lon: float):
         """
         Verifica se a coordenada atual está dentro de alguma cerca ativa.
         Gera alertas se necessário.
         """
-        # 1. Busca todas as cercas ativas
-        result = await db.execute(select(Geofence).where(Geofence.is_active == True))
-        geofences = result.scalars().all()
-        
-        current_point = Point(lat, lon)
-        triggered_alerts = []
-
-        for zone in geofences:
-            # Converte lista de pontos JSON para Polígono Shapely
-            # polygon_points deve ser [[lat, lon], ...]
-            if not zone.polygon_points or len(zone.polygon_points) < 3:
-                continue
-                
-            poly = Polygon(zone.polygon_points)
-            
-            is_inside = poly.contains(current_point)
-            
-            # LÓGICA DE ALERTA:
-            # Aqui você define a regra. Exemplo simples:
-            # Se for RISK_ZONE e estiver DENTRO -> ALERTA
-            if zone.type == "RISK_ZONE" and is_inside:
-                alert = Alert(
-                    vehicle_id=vehicle_id,
-                    type="GEOFENCE_RISK",
-                    severity="High",
-                    description=f"Veículo entrou em Zona de Risco: {zone.name}",
-                    latitude=lat,
-                    longitude=lon,
-                    created_at=datetime.utcnow(),
-                    is_active=True
-                )
-                db.add(alert)
-                triggered_alerts.append(f"Entrou em {zone.name}")
-                
-            # Se for SAFE_ZONE (Garagem) e estiver FORA -> ALERTA (opcional, ex: roubo noturno)
-            # Para isso precisaríamos saber o estado anterior, o que exige mais lógica.
-            # Por enquanto vamos focar na Zona de Risco.
-
-        return triggered_alerts
\ No newline at end of file
+        transitions = await GeofenceService.check_geofences_batch(db, vehicle=vehicle, lats=[lat], lons=[lon])
+        return [f"Entrou em {t.zone_name}" for t in transitions if t.event == "ENTER"]
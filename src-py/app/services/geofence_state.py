@@ -0,0 +1,80 @@
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Set
+from pydantic import BaseModel
+
+from app.core.cache import warn_if_per_worker
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class VehicleZoneState(BaseModel):
+    """Em quais cercas o veículo estava no último ponto processado."""
+    zone_ids: Set[int] = set()
+    # Momento (do dispositivo) em que o veículo entrou em cada cerca
+    entered_at: Dict[int, datetime] = {}
+    # Cercas para as quais o evento DWELL já foi emitido nesta permanência
+    dwell_notified: Set[int] = set()
+    updated_at: Optional[datetime] = None
+
+
+class InMemoryGeofenceStateStore:
+    def __init__(self):
+        self._states: Dict[int, VehicleZoneState] = {}
+
+    async def get(self, vehicle_id: int) -> Optional[VehicleZoneState]:
+        return self._states.get(vehicle_id)
+
+    async def set(self, vehicle_id: int, state: VehicleZoneState):
+        self._states[vehicle_id] = state
+
+    async def clear(self, vehicle_id: int):
+        self._states.pop(vehicle_id, None)
+
+
+class RedisGeofenceStateStore:
+    """
+    Guarda o estado no Redis para que sobreviva a reinícios e seja partilhado entre
+    workers. Se o Redis falhar, usa o armazenamento em memória como contingência.
+    """
+    KEY_PREFIX = "geofence:state:"
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis.asyncio as redis_asyncio
+        self._redis = redis_asyncio.from_url(url)
+        self._ttl = ttl_seconds
+        self._fallback = InMemoryGeofenceStateStore()
+
+    async def get(self, vehicle_id: int) -> Optional[VehicleZoneState]:
+        try:
+            raw = await self._redis.get(f"{self.KEY_PREFIX}{vehicle_id}")
+        except Exception as e:
+            logger.warning(f"Redis indisponível para estado de cercas: {e}")
+            return await self._fallback.get(vehicle_id)
+        return VehicleZoneState.model_validate_json(raw) if raw else None
+
+    async def set(self, vehicle_id: int, state: VehicleZoneState):
+        await self._fallback.set(vehicle_id, state)
+        try:
+            await self._redis.set(f"{self.KEY_PREFIX}{vehicle_id}", state.model_dump_json(), ex=self._ttl)
+        except Exception as e:
+            logger.warning(f"Redis indisponível para estado de cercas: {e}")
+
+    async def clear(self, vehicle_id: int):
+        await self._fallback.clear(vehicle_id)
+        try:
+            await self._redis.delete(f"{self.KEY_PREFIX}{vehicle_id}")
+        except Exception as e:
+            logger.warning(f"Redis indisponível para estado de cercas: {e}")
+
+
+def _build_state_store():
+    if settings.GEOFENCE_STATE_BACKEND == "redis":
+        return RedisGeofenceStateStore(settings.REDIS_URL, settings.GEOFENCE_STATE_TTL_SECONDS)
+    # Em memória, pontos do mesmo veículo tratados por workers diferentes geram ENTER/EXIT falsos
+    warn_if_per_worker("Estado das cercas virtuais", "GEOFENCE_STATE_BACKEND")
+    return InMemoryGeofenceStateStore()
+
+
+geofence_state_store = _build_state_store()
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.schemas.dashboard_schema import VehiclePositionDelta
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSubscription:
+    """
+    Um cliente do mapa em tempo real. Guarda só a última mudança de cada veículo,
+    então um cliente lento recebe um lote coalescido em vez de uma fila crescente.
+    """
+
+    def __init__(self, organization_id: int):
+        self.organization_id = organization_id
+        self._pending: Dict[int, VehiclePositionDelta] = {}
+        self._event = asyncio.Event()
+
+    def push(self, delta: VehiclePositionDelta):
+        self._pending[delta.id] = delta
+        self._event.set()
+
+    async def next_batch(self) -> List[VehiclePositionDelta]:
+        await self._event.wait()
+        self._event.clear()
+        batch = list(self._pending.values())
+        self._pending = {}
+        return batch
+
+
+class LivePositionHub:
+    """
+    Canal pub/sub por organização alimentado pelo caminho de ingestão de posições.
+    Publica apenas quando a posição ou o status do veículo mudou. Com Redis, as
+    mudanças passam pelo pub/sub para chegar aos clientes ligados a outros workers.
+    """
+    CHANNEL_PREFIX = "live-map:"
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self._subscriptions: Dict[int, Set[LiveSubscription]] = defaultdict(set)
+        self._last: Dict[int, Tuple[float, float, Optional[str]]] = {}
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis_asyncio
+            self._redis = redis_asyncio.from_url(redis_url)
+        self._listener: Optional[asyncio.Task] = None
+        self.published = 0
+        self.unchanged = 0
+
+    def subscribe(self, organization_id: int) -> LiveSubscription:
+        subscription = LiveSubscription(organization_id)
+        self._subscriptions[organization_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        subscribers = self._subscriptions.get(subscription.organization_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscriptions[subscription.organization_id]
+
+    async def publish(self, organization_id: int, delta: VehiclePositionDelta):
+        key = (delta.latitude, delta.longitude, delta.status)
+        if self._last.get(delta.id) == key:
+            self.unchanged += 1
+            return
+        self._last[delta.id] = key
+        self.published += 1
+
+        if self._listener is not None and not self._listener.done():
+            try:
+                await self._redis.publish(f"{self.CHANNEL_PREFIX}{organization_id}", delta.model_dump_json())
+                return
+            except Exception as e:
+                logger.warning(f"Redis indisponível para o mapa em tempo real: {e}")
+        self._dispatch(organization_id, delta)
+
+    def _dispatch(self, organization_id: int, delta: VehiclePositionDelta):
+        for subscription in self._subscriptions.get(organization_id, ()):
+            subscription.push(delta)
+
+    async def _listen(self):
+        pubsub = self._redis.pubsub()
+        await pubsub.psubscribe(f"{self.CHANNEL_PREFIX}*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"].decode() if isinstance(message["channel"], bytes) else message["channel"]
+                organization_id = int(channel[len(self.CHANNEL_PREFIX):])
+                if organization_id in self._subscriptions:
+                    self._dispatch(organization_id, VehiclePositionDelta.model_validate_json(message["data"]))
+        finally:
+            await pubsub.close()
+
+    def start(self):
+        if self._redis is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "organizations": len(self._subscriptions),
+            "subscribers": sum(len(s) for s in self._subscriptions.values()),
+            "published": self.published,
+            "unchanged": self.unchanged,
+        }
+
+
+live_position_hub = LivePositionHub(settings.REDIS_URL if settings.LIVE_MAP_BACKEND == "redis" else None)
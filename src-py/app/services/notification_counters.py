@@ -0,0 +1,207 @@
+import logging
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.cache import TTLCache, warn_if_per_worker
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Quanto tempo uma recontagem em curso pode levar até o seu resultado ser descartado
+_LOAD_TOKEN_TTL_SECONDS = 60
+
+
+class InMemoryUnreadCounterBackend:
+    """
+    Contadores por processo. Com vários workers cada um tem a sua cópia; o TTL
+    limita quanto tempo uma cópia desatualizada pode ser servida.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self._counters = TTLCache("unread_notifications", maxsize=50_000, ttl=ttl_seconds)
+        # Recontagens em curso: chave -> token
+        self._loading = TTLCache("unread_notifications_loading", maxsize=10_000, ttl=_LOAD_TOKEN_TTL_SECONDS)
+
+    async def get(self, key: str) -> Optional[int]:
+        return self._counters.get(key)
+
+    async def begin_load(self, key: str) -> str:
+        token = uuid.uuid4().hex
+        self._loading.set(key, token)
+        return token
+
+    async def fill(self, key: str, token: str, value: int):
+        # Um ajuste desde begin_load retirou o token: a contagem pode não o incluir
+        if self._loading.get(key) == token:
+            self._loading.delete(key)
+            if self._counters.get(key) is None:
+                self._counters.set(key, value)
+
+    async def incr(self, key: str, delta: int):
+        self._loading.delete(key)
+        # Sem contador carregado não há o que ajustar: a próxima leitura conta no banco.
+        # O ajuste mantém o prazo original, então a reconciliação continua periódica.
+        self._counters.update(key, lambda value: max(value + delta, 0))
+
+    async def delete(self, key: str):
+        self._loading.delete(key)
+        self._counters.delete(key)
+
+
+class UncachedUnreadCounterBackend:
+    """Sem cache: cada leitura conta no banco (backend em memória com vários workers)."""
+
+    async def get(self, key: str) -> Optional[int]:
+        return None
+
+    async def begin_load(self, key: str) -> str:
+        return ""
+
+    async def fill(self, key: str, token: str, value: int):
+        pass
+
+    async def incr(self, key: str, delta: int):
+        pass
+
+    async def delete(self, key: str):
+        pass
+
+
+class RedisUnreadCounterBackend:
+    """
+    Partilha os contadores entre workers. O INCRBY só é aplicado a chaves
+    existentes (script Lua), para que um contador expirado não renasça a partir
+    de um delta. A recontagem só é gravada se nenhum ajuste aconteceu desde o seu
+    início (marcador KEYS[2]) e se a chave continua ausente (SET NX).
+    Se o Redis falhar, usa o backend em memória como contingência.
+    """
+    KEY_PREFIX = "notifications:unread:"
+    _INCR_IF_EXISTS = """
+    redis.call('DEL', KEYS[2])
+    if redis.call('EXISTS', KEYS[1]) == 1 then
+        local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+        if value < 0 then redis.call('SET', KEYS[1], 0, 'KEEPTTL') end
+    end
+    return 0
+    """
+    _FILL_IF_UNCHANGED = """
+    if redis.call('GET', KEYS[2]) == ARGV[1] then
+        redis.call('DEL', KEYS[2])
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3], 'NX')
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, ttl_seconds: float):
+        import redis.asyncio as redis_asyncio
+        self._redis = redis_asyncio.from_url(url)
+        self._ttl = int(ttl_seconds)
+        self._incr_if_exists = self._redis.register_script(self._INCR_IF_EXISTS)
+        self._fill_if_unchanged = self._redis.register_script(self._FILL_IF_UNCHANGED)
+        self._fallback = InMemoryUnreadCounterBackend(ttl_seconds)
+
+    async def get(self, key: str) -> Optional[int]:
+        try:
+            raw = await self._redis.get(f"{self.KEY_PREFIX}{key}")
+        except Exception as e:
+            logger.warning(f"Redis indisponível para os contadores de notificações: {e}")
+            return await self._fallback.get(key)
+        return int(raw) if raw is not None else None
+
+    def _keys(self, key: str):
+        return [f"{self.KEY_PREFIX}{key}", f"{self.KEY_PREFIX}{key}:loading"]
+
+    async def begin_load(self, key: str) -> str:
+        token = uuid.uuid4().hex
+        try:
+            await self._redis.set(self._keys(key)[1], token, ex=_LOAD_TOKEN_TTL_SECONDS)
+        except Exception as e:
+            logger.warning(f"Redis indisponível para os contadores de notificações: {e}")
+            return await self._fallback.begin_load(key)
+        return token
+
+    async def fill(self, key: str, token: str, value: int):
+        try:
+            await self._fill_if_unchanged(keys=self._keys(key), args=[token, value, self._ttl])
+        except Exception as e:
+            logger.warning(f"Redis indisponível para os contadores de notificações: {e}")
+            await self._fallback.fill(key, token, value)
+
+    async def incr(self, key: str, delta: int):
+        await self._fallback.incr(key, delta)
+        try:
+            await self._incr_if_exists(keys=self._keys(key), args=[delta])
+        except Exception as e:
+            logger.warning(f"Redis indisponível para os contadores de notificações: {e}")
+            # Sem o ajuste o contador ficaria errado até expirar: melhor descartá-lo
+            await self.delete(key)
+
+    async def delete(self, key: str):
+        await self._fallback.delete(key)
+        try:
+            await self._redis.delete(*self._keys(key))
+        except Exception as e:
+            logger.warning(f"Redis indisponível para os contadores de notificações: {e}")
+
+
+class UnreadCounters:
+    """
+    Contador de notificações não lidas por (organização, usuário), para que o
+    polling do frontend não faça um COUNT a cada pedido. Os ajustes são feitos
+    depois do commit pelo crud de notificações; cada contador expira após o TTL
+    e é recontado no banco na leitura seguinte (reconciliação periódica).
+
+    A recontagem segue begin_load -> COUNT -> fill: um ajuste entre o início e o
+    fim descarta o resultado, que poderia não incluir a notificação ajustada.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(organization_id: int, user_id: int) -> str:
+        return f"{organization_id}:{user_id}"
+
+    async def get(self, organization_id: int, user_id: int) -> Optional[int]:
+        value = await self.backend.get(self.make_key(organization_id, user_id))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def begin_load(self, organization_id: int, user_id: int) -> str:
+        return await self.backend.begin_load(self.make_key(organization_id, user_id))
+
+    async def fill(self, organization_id: int, user_id: int, token: str, value: int):
+        await self.backend.fill(self.make_key(organization_id, user_id), token, value)
+
+    async def incr(self, organization_id: int, user_id: int, delta: int = 1):
+        await self.backend.incr(self.make_key(organization_id, user_id), delta)
+
+    async def delete(self, organization_id: int, user_id: int):
+        await self.backend.delete(self.make_key(organization_id, user_id))
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def _build_unread_counters() -> UnreadCounters:
+    ttl = settings.NOTIFICATION_COUNTER_RECONCILE_SECONDS
+    if settings.NOTIFICATION_COUNTER_BACKEND == "redis":
+        return UnreadCounters(RedisUnreadCounterBackend(settings.REDIS_URL, ttl))
+    # Em memória, um worker não vê as leituras/criações tratadas pelos outros: sem cache
+    if warn_if_per_worker("Contador de notificações não lidas", "NOTIFICATION_COUNTER_BACKEND"):
+        return UnreadCounters(UncachedUnreadCounterBackend())
+    return UnreadCounters(InMemoryUnreadCounterBackend(ttl))
+
+
+unread_counters = _build_unread_counters()
@@ -0,0 +1,208 @@
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Set
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def render_pdf(html_content: str) -> bytes:
+    """
+    Converte o HTML em PDF. Corre num processo do pool: o xhtml2pdf é puramente
+    CPU e bloquearia o event loop da API durante toda a renderização.
+    """
+    from xhtml2pdf import pisa
+
+    result = io.BytesIO()
+    pdf = pisa.pisaDocument(io.BytesIO(html_content.encode("UTF-8")), result)
+    if pdf.err:
+        raise RuntimeError("Erro ao gerar o PDF.")
+    return result.getvalue()
+
+
+def _render_to_file(html_content: str, path: str) -> int:
+    content = render_pdf(html_content)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return len(content)
+
+
+class PdfJobManager:
+    """
+    Fila de geração de PDFs. Cada job tem um arquivo de estado (<id>.json) e, quando
+    concluído, o PDF (<id>.pdf) no diretório configurado, para que qualquer worker
+    da API possa responder ao polling e ao download. Os arquivos expiram após o TTL.
+    As leituras/escritas desses arquivos correm numa thread, fora do event loop.
+    """
+
+    def __init__(self, directory: str, *, ttl_seconds: float, max_workers: int):
+        self.directory = directory
+        self.ttl = ttl_seconds
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._cleanup_task: Optional[asyncio.Task] = None
+        self.completed = 0
+        self.failed = 0
+
+    def _executor_for_jobs(self) -> Executor:
+        if self._executor is None:
+            # "spawn": um fork do worker da API herdaria o event loop, as conexões
+            # abertas do pool e as threads, que não sobrevivem ao fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _meta_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def file_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.pdf")
+
+    def _write_meta(self, job: Dict[str, Any]):
+        path = self._meta_path(job["id"])
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _read_meta(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(job_id), encoding="utf-8") as f:
+                job = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if job.get("expires_at") and job["expires_at"] < time.time():
+            self._remove(job_id)
+            return None
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # Ids vêm da URL: só aceita o formato gerado aqui
+        try:
+            uuid.UUID(hex=job_id)
+        except ValueError:
+            return None
+        return await asyncio.to_thread(self._read_meta, job_id)
+
+    async def render(self, html_content: str) -> bytes:
+        """Renderiza no pool de processos e espera pelo resultado (sem bloquear o event loop)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor_for_jobs(), render_pdf, html_content)
+
+    async def submit(self, html_content: str, *, filename: str, organization_id: int, user_id: int) -> Dict[str, Any]:
+        await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "pending",
+            "filename": filename,
+            "organization_id": organization_id,
+            "user_id": user_id,
+            "created_at": now,
+            "finished_at": None,
+            # Jobs que nunca terminam (ex.: worker reiniciado) também expiram
+            "expires_at": now + self.ttl,
+            "size_bytes": None,
+            "error": None,
+        }
+        await asyncio.to_thread(self._write_meta, job)
+        task = asyncio.get_running_loop().create_task(self._run(job, html_content))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Dict[str, Any], html_content: str):
+        loop = asyncio.get_running_loop()
+        try:
+            size = await loop.run_in_executor(
+                self._executor_for_jobs(), _render_to_file, html_content, self.file_path(job["id"])
+            )
+            job.update(status="done", size_bytes=size)
+            self.completed += 1
+        except Exception as e:
+            logger.error(f"Falha ao gerar o PDF do job {job['id']}: {e}")
+            job.update(status="failed", error="Erro ao gerar o PDF.")
+            self.failed += 1
+        job["finished_at"] = time.time()
+        job["expires_at"] = job["finished_at"] + self.ttl
+        await asyncio.to_thread(self._write_meta, job)
+
+    def _remove(self, job_id: str):
+        for path in (self._meta_path(job_id), self.file_path(job_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self) -> int:
+        """Remove os jobs expirados. Retorna quantos foram removidos."""
+        if not os.path.isdir(self.directory):
+            return 0
+        now = time.time()
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            try:
+                with open(self._meta_path(job_id), encoding="utf-8") as f:
+                    expires_at = json.load(f).get("expires_at") or 0
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if expires_at < now:
+                self._remove(job_id)
+                removed += 1
+        return removed
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(min(self.ttl, 300))
+            try:
+                removed = await asyncio.to_thread(self.cleanup)
+                if removed:
+                    logger.info(f"{removed} PDFs expirados removidos.")
+            except Exception:
+                logger.exception("Falha ao limpar os PDFs expirados")
+
+    def start(self):
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def stop(self):
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            try:
+                await self._cleanup_task
+            except asyncio.CancelledError:
+                pass
+            self._cleanup_task = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "max_workers": self.max_workers,
+            "ttl_seconds": self.ttl,
+        }
+
+
+pdf_jobs = PdfJobManager(
+    settings.PDF_JOBS_DIR, ttl_seconds=settings.PDF_JOB_TTL_SECONDS, max_workers=settings.PDF_RENDER_WORKERS
+)
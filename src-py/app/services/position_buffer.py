@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.crud.crud_vehicle import VehicleRef, update_last_position
+from app.db.session import SessionLocal
+from app.models.vehicle_model import Vehicle, VehicleStatus
+from app.schemas.dashboard_schema import VehiclePositionDelta
+from app.services.dashboard_cache import mark_dashboard_dirty
+from app.services.live_positions import live_position_hub
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingPosition:
+    vehicle_id: int
+    organization_id: int
+    latitude: float
+    longitude: float
+    status: Optional[VehicleStatus]
+    recorded_at: datetime
+
+
+class VehiclePositionBuffer:
+    """
+    Buffer write-behind da última posição dos veículos. Cada ping apenas substitui a
+    entrada do veículo em memória; uma tarefa em segundo plano grava a posição mais
+    recente de todos os veículos pendentes num único UPDATE em lote a cada intervalo.
+    Enquanto a tarefa não estiver a correr (ex.: testes, scripts), grava diretamente.
+    """
+
+    def __init__(self, flush_interval_ms: int, session_factory=SessionLocal):
+        self.flush_interval = flush_interval_ms / 1000
+        self._session_factory = session_factory
+        self._pending: Dict[int, PendingPosition] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.coalesced = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def submit(
+        self,
+        db: AsyncSession,
+        *,
+        vehicle: VehicleRef,
+        latitude: float,
+        longitude: float,
+        status: Optional[VehicleStatus] = None,
+        recorded_at: Optional[datetime] = None,
+    ):
+        """
+        Regista a posição do veículo e publica a mudança no mapa em tempo real.
+        Com o buffer ativo não toca no banco; caso contrário, faz o UPDATE na
+        sessão recebida (o commit fica com quem chama).
+        """
+        recorded_at = recorded_at or datetime.utcnow()
+        current = self._pending.get(vehicle.id)
+        if current is not None:
+            self.coalesced += 1
+            # Lotes offline podem chegar fora de ordem: não recua a posição
+            if current.recorded_at > recorded_at:
+                return
+
+        await live_position_hub.publish(vehicle.organization_id, VehiclePositionDelta(
+            id=vehicle.id,
+            license_plate=vehicle.license_plate,
+            latitude=latitude,
+            longitude=longitude,
+            status=status.value if status is not None else None,
+            timestamp=recorded_at,
+        ))
+        if not self.running:
+            await update_last_position(
+                db, vehicle_id=vehicle.id, latitude=latitude, longitude=longitude, status=status
+            )
+            if status is not None:
+                mark_dashboard_dirty(db, vehicle.organization_id)
+            return
+
+        self._pending[vehicle.id] = PendingPosition(
+            vehicle_id=vehicle.id,
+            organization_id=vehicle.organization_id,
+            latitude=latitude,
+            longitude=longitude,
+            status=status if status is not None else (current.status if current else None),
+            recorded_at=recorded_at,
+        )
+
+    def pending_for_org(self, organization_id: int) -> Dict[int, PendingPosition]:
+        """Posições ainda não gravadas dos veículos da organização, por vehicle_id."""
+        return {vid: p for vid, p in self._pending.items() if p.organization_id == organization_id}
+
+    async def flush(self) -> int:
+        """Grava as posições pendentes num único executemany. Retorna o nº de veículos."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch: List[PendingPosition] = list(self._pending.values())
+
+            table = Vehicle.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(
+                    last_latitude=bindparam("b_lat"),
+                    last_longitude=bindparam("b_lon"),
+                    status=func.coalesce(bindparam("b_status", type_=table.c.status.type), table.c.status),
+                )
+            )
+            rows = [
+                {"b_id": p.vehicle_id, "b_lat": p.latitude, "b_lon": p.longitude, "b_status": p.status}
+                for p in batch
+            ]
+
+            started = time.perf_counter()
+            async with self._session_factory() as session:
+                await session.execute(stmt, rows)
+                # Só o status alimenta o dashboard (veículos por status); posições não o invalidam
+                for organization_id in {p.organization_id for p in batch if p.status is not None}:
+                    mark_dashboard_dirty(session, organization_id)
+                await session.commit()
+
+            # Só descarta o que não foi substituído por um ping mais novo durante o flush
+            for p in batch:
+                if self._pending.get(p.vehicle_id) is p:
+                    del self._pending[p.vehicle_id]
+
+            self.flushes += 1
+            self.rows_written += len(batch)
+            logger.debug(
+                "Posições gravadas: %d veículos em %.1f ms", len(batch), (time.perf_counter() - started) * 1000
+            )
+            return len(batch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # Mantém as posições no buffer e tenta de novo no próximo ciclo
+                logger.exception("Falha ao gravar o buffer de posições")
+
+    def start(self):
+        if self.flush_interval <= 0 or self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "running": self.running,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "coalesced": self.coalesced,
+        }
+
+
+position_buffer = VehiclePositionBuffer(settings.POSITION_FLUSH_INTERVAL_MS)
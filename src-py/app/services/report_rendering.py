@@ -0,0 +1,78 @@
+import os
+from typing import Optional, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.crud import crud_report
+from app.db.session import is_read_only
+from app.schemas.report_generator_schema import ReportRequest
+from app.services.dashboard_cache import dashboard_cache
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+# Tipos de relatório em PDF suportados -> template
+REPORT_TEMPLATES = {
+    "activity_by_driver": "driver_activity_report.html",
+}
+
+# Ambiente único do processo: os templates são compilados uma vez (e o bytecode
+# fica em disco para os próximos workers); sem auto_reload, não há stat por pedido.
+templates = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    bytecode_cache=FileSystemBytecodeCache(),
+    auto_reload=False,
+)
+
+# HTML já renderizado por (organização, tipo, alvo, período, versão dos dados)
+_html_cache = TTLCache("report_html", maxsize=256, ttl=settings.REPORT_HTML_CACHE_TTL_SECONDS)
+
+
+def warm_templates():
+    """Compila os templates dos relatórios (chamado na inicialização)."""
+    for name in REPORT_TEMPLATES.values():
+        templates.get_template(name)
+
+
+async def build_report_html(
+    db: AsyncSession, *, report_request: ReportRequest, organization_id: int
+) -> Optional[Tuple[str, str]]:
+    """
+    Busca os dados do relatório (sempre restritos à organização do gestor) e
+    renderiza o HTML. Retorna (html, nome do arquivo) ou None quando não há dados.
+    Lança ValueError se o alvo não pertencer à organização.
+
+    A versão dos dados é a geração da organização mantida pelo cache do dashboard
+    (incrementada a cada escrita em viagens, abastecimentos, veículos...), então
+    um relatório repetido sem escritas pelo meio não vai ao banco nem re-renderiza.
+    O que é lido na réplica não entra no cache: ela pode ainda não ter as escritas
+    que já avançaram a versão. Com o cache do dashboard desligado (backend
+    "memory" com vários workers) a versão não acompanha as escritas dos outros
+    workers, então o HTML também não é cacheado.
+    """
+    use_cache = dashboard_cache.enabled
+    data_version = await dashboard_cache.data_version(organization_id)
+    key = (
+        organization_id, report_request.report_type, report_request.target_id,
+        report_request.date_from, report_request.date_to, data_version,
+    )
+    cached = _html_cache.get(key) if use_cache else None
+    if cached is not None:
+        return cached
+
+    template = templates.get_template(REPORT_TEMPLATES[report_request.report_type])
+    data = await crud_report.get_driver_activity_data(
+        db,
+        driver_id=report_request.target_id,
+        organization_id=organization_id,
+        date_from=report_request.date_from,
+        date_to=report_request.date_to,
+    )
+    if not data:
+        return None
+    rendered = template.render(data=data), f"relatorio_motorista_{report_request.target_id}.pdf"
+    if use_cache and not is_read_only(db):
+        _html_cache.set(key, rendered)
+    return rendered
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.crud import crud_notification
+from app.db.session import SessionLocal
+from app.models.organization_model import Organization
+
+logger = logging.getLogger(__name__)
+
+# Primeira chave do pg_try_advisory_xact_lock(chave, organização) da verificação
+_ADVISORY_LOCK_KEY = 170017
+# Primeira chave do pg_try_advisory_lock(chave, shard) que elege o processo do agendador
+_LEADER_LOCK_KEY = 170018
+# Pedidos manuais recentes, partilhados entre workers (SET NX EX)
+_TRIGGER_KEY_PREFIX = "system_checks:trigger:"
+
+
+class SystemCheckScheduler:
+    """
+    Executa periodicamente a verificação de alertas (manutenção por data/km e
+    documentos a vencer) de todas as organizações deste shard. Cada organização
+    usa a sua própria sessão, com concorrência limitada e um tempo máximo, para
+    que um cliente grande não atrase os outros.
+
+    Todos os workers iniciam o agendador, mas só um processo por shard varre:
+    no Postgres, o que obtém o pg_try_advisory_lock(chave, shard) e o mantém numa
+    conexão dedicada enquanto viver. Noutros bancos (SQLite do desenvolvimento)
+    não há eleição, e o agendador deve ficar ativo num único processo.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval_seconds: float,
+        concurrency: int,
+        org_timeout_seconds: float,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        session_factory=SessionLocal,
+        redis_url: Optional[str] = None,
+    ):
+        self._session_factory = session_factory
+        self.interval = interval_seconds
+        self.concurrency = concurrency
+        self.org_timeout = org_timeout_seconds
+        self.shard_index = shard_index
+        self.shard_count = max(shard_count, 1)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._leader_connection: Optional[AsyncConnection] = None
+        self.is_leader = False
+        self._redis = None
+        if redis_url:
+            import redis.asyncio as redis_asyncio
+            self._redis = redis_asyncio.from_url(redis_url)
+        # organization_id -> resultado da última execução
+        self._last_runs: Dict[int, Dict[str, Any]] = {}
+        self.cycles = 0
+        self.last_cycle_seconds: Optional[float] = None
+
+    def owns(self, organization_id: int) -> bool:
+        return organization_id % self.shard_count == self.shard_index
+
+    async def _organization_ids(self) -> List[int]:
+        async with self._session_factory() as db:
+            ids = (await db.execute(select(Organization.id).order_by(Organization.id))).scalars().all()
+        return [org_id for org_id in ids if self.owns(org_id)]
+
+    async def _check(self, organization_id: int) -> Optional[int]:
+        async with self._session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                # Outro worker (ex.: shards sobrepostos durante um deploy) já está nesta organização
+                locked = (await db.execute(
+                    text("SELECT pg_try_advisory_xact_lock(:key, :org)"),
+                    {"key": _ADVISORY_LOCK_KEY, "org": organization_id},
+                )).scalar()
+                if not locked:
+                    return None
+            return await crud_notification.run_system_checks_for_organization(db, organization_id=organization_id)
+
+    async def run_organization(self, organization_id: int) -> Dict[str, Any]:
+        """Verifica uma organização e regista a duração. Nunca propaga erros."""
+        if organization_id in self._running:
+            return {"status": "running"}
+        self._running.add(organization_id)
+        try:
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    created = await asyncio.wait_for(self._check(organization_id), self.org_timeout)
+                    result = {"status": "skipped" if created is None else "ok", "created": created or 0}
+                except asyncio.TimeoutError:
+                    logger.warning(f"Verificação de alertas da organização {organization_id} excedeu {self.org_timeout}s")
+                    result = {"status": "timeout", "created": 0}
+                except Exception:
+                    logger.exception(f"Falha na verificação de alertas da organização {organization_id}")
+                    result = {"status": "failed", "created": 0}
+                result.update(finished_at=time.time(), duration_seconds=round(time.perf_counter() - started, 3))
+                self._last_runs[organization_id] = result
+                return result
+        finally:
+            self._running.discard(organization_id)
+
+    async def run_all(self) -> Dict[int, Dict[str, Any]]:
+        """Uma volta completa pelas organizações deste shard."""
+        started = time.perf_counter()
+        organization_ids = await self._organization_ids()
+        results = await asyncio.gather(*(self.run_organization(org_id) for org_id in organization_ids))
+        self.cycles += 1
+        self.last_cycle_seconds = round(time.perf_counter() - started, 3)
+        logger.info(f"Verificação de alertas: {len(organization_ids)} organizações em {self.last_cycle_seconds}s")
+        return dict(zip(organization_ids, results))
+
+    async def _claim_trigger(self, organization_id: int) -> bool:
+        """Reserva o pedido manual no Redis, para que o limite valha para todos os workers."""
+        if self._redis is None:
+            return True
+        try:
+            return bool(await self._redis.set(
+                f"{_TRIGGER_KEY_PREFIX}{organization_id}", 1,
+                nx=True, ex=settings.SYSTEM_CHECK_MIN_TRIGGER_SECONDS,
+            ))
+        except Exception as e:
+            # O lock por organização no banco continua a impedir verificações simultâneas
+            logger.warning(f"Redis indisponível para o limite de verificações manuais: {e}")
+            return True
+
+    async def trigger(self, organization_id: int) -> bool:
+        """
+        Agenda a verificação de uma organização em segundo plano. Retorna False se
+        ela já está a correr ou foi pedida/terminou há menos de SYSTEM_CHECK_MIN_TRIGGER_SECONDS.
+        """
+        last = self._last_runs.get(organization_id)
+        if organization_id in self._running or (
+            last and time.time() - last["finished_at"] < settings.SYSTEM_CHECK_MIN_TRIGGER_SECONDS
+        ):
+            return False
+        if not await self._claim_trigger(organization_id):
+            return False
+        task = asyncio.get_running_loop().create_task(self.run_organization(organization_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _hold_leadership(self) -> bool:
+        """
+        Confirma (ou tenta obter) a liderança deste shard. O lock de sessão fica
+        preso à conexão dedicada: se ela cair, o Postgres liberta-o e outro
+        processo assume na volta seguinte.
+        """
+        if self._leader_connection is not None:
+            try:
+                await self._leader_connection.execute(text("SELECT 1"))
+                await self._leader_connection.commit()
+                return True
+            except Exception:
+                logger.warning("Conexão do agendador de alertas perdida; nova eleição")
+                await self._release_leadership()
+
+        async with self._session_factory() as db:
+            bind = db.bind
+        if bind.dialect.name != "postgresql":
+            self.is_leader = True
+            return True
+
+        connection = await bind.connect()
+        try:
+            locked = (await connection.execute(
+                text("SELECT pg_try_advisory_lock(:key, :shard)"),
+                {"key": _LEADER_LOCK_KEY, "shard": self.shard_index},
+            )).scalar()
+            # Não deixa a conexão "idle in transaction"; o lock de sessão continua
+            await connection.commit()
+        except Exception:
+            await connection.close()
+            raise
+        if not locked:
+            await connection.close()
+            self.is_leader = False
+            return False
+        self._leader_connection = connection
+        self.is_leader = True
+        logger.info(f"Este processo assumiu a verificação de alertas do shard {self.shard_index}/{self.shard_count}")
+        return True
+
+    async def _release_leadership(self):
+        connection, self._leader_connection = self._leader_connection, None
+        self.is_leader = False
+        if connection is None:
+            return
+        try:
+            await connection.execute(
+                text("SELECT pg_advisory_unlock(:key, :shard)"),
+                {"key": _LEADER_LOCK_KEY, "shard": self.shard_index},
+            )
+            await connection.commit()
+            await connection.close()
+        except Exception:
+            # Conexão quebrada: a sessão no servidor acabou e o lock com ela; não volta ao pool
+            await connection.invalidate()
+            await connection.close()
+
+    async def _loop(self):
+        # A primeira volta só acontece após um intervalo, para que reinícios e
+        # deploys (que sobem todos os workers) não disparem varreduras extra
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if await self._hold_leadership():
+                    await self.run_all()
+            except Exception:
+                logger.exception("Falha na volta de verificação de alertas")
+
+    def start(self):
+        if not settings.SYSTEM_CHECK_SCHEDULER_ENABLED:
+            return
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await self._release_leadership()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        slowest = sorted(self._last_runs.items(), key=lambda item: item[1]["duration_seconds"], reverse=True)[:10]
+        return {
+            "enabled": self._loop_task is not None and not self._loop_task.done(),
+            "shard": f"{self.shard_index}/{self.shard_count}",
+            "leader": self.is_leader,
+            "interval_seconds": self.interval,
+            "concurrency": self.concurrency,
+            "running": sorted(self._running),
+            "cycles": self.cycles,
+            "last_cycle_seconds": self.last_cycle_seconds,
+            "organizations": len(self._last_runs),
+            "total_seconds": round(sum(r["duration_seconds"] for r in self._last_runs.values()), 3),
+            "slowest": {org_id: result for org_id, result in slowest},
+        }
+
+
+system_check_scheduler = SystemCheckScheduler(
+    interval_seconds=settings.SYSTEM_CHECK_INTERVAL_SECONDS,
+    concurrency=settings.SYSTEM_CHECK_CONCURRENCY,
+    org_timeout_seconds=settings.SYSTEM_CHECK_ORG_TIMEOUT_SECONDS,
+    shard_index=settings.SYSTEM_CHECK_SHARD_INDEX,
+    shard_count=settings.SYSTEM_CHECK_SHARD_COUNT,
+    redis_url=settings.REDIS_URL,
+)
@@ -0,0 +1,134 @@
+import math
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import insert
+
+from app.crud.crud_vehicle import VehicleRef
+from app.models.location_history_model import LocationHistory
+from app.models.alert_model import Alert, AlertLevel, AlertType
+from app.services.dashboard_cache import mark_dashboard_dirty
+from app.services.geofence_service import GeofenceService
+from app.schemas.telemetry_schema import PointSchema, RejectedPoint, TelemetrySyncResult
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryIngestionService:
+    # Pontos anteriores a este ano vêm de um RTC sem sincronização (ESP32 sem GPS fix)
+    MIN_VALID_YEAR = 2024
+    # Tolerância para relógios de dispositivo adiantados
+    MAX_FUTURE_DRIFT = timedelta(hours=1)
+
+    @staticmethod
+    def validate_points(points: List[PointSchema]) -> Tuple[List[Tuple[PointSchema, datetime]], List[RejectedPoint]]:
+        """
+        Valida o lote inteiro antes de qualquer escrita.
+        Retorna os pontos aceitos (com o datetime já convertido) e os rejeitados com o motivo.
+        """
+        accepted: List[Tuple[PointSchema, datetime]] = []
+        rejected: List[RejectedPoint] = []
+        seen_ts = set()
+        max_dt = datetime.utcnow() + TelemetryIngestionService.MAX_FUTURE_DRIFT
+
+        for index, p in enumerate(points):
+            if not (math.isfinite(p.lat) and math.isfinite(p.lng)):
+                rejected.append(RejectedPoint(index=index, ts=p.ts, reason="coordenada inválida"))
+                continue
+            if not (-90.0 <= p.lat <= 90.0 and -180.0 <= p.lng <= 180.0):
+                rejected.append(RejectedPoint(index=index, ts=p.ts, reason="coordenada fora do intervalo"))
+                continue
+            if p.lat == 0.0 and p.lng == 0.0:
+                rejected.append(RejectedPoint(index=index, ts=p.ts, reason="sem fix de GPS"))
+                continue
+
+            try:
+                # UTC sem tzinfo, como o buffer de posições e as cercas (que convertem para o fuso local)
+                dt = datetime.utcfromtimestamp(p.ts)
+            except (OverflowError, OSError, ValueError):
+                rejected.append(RejectedPoint(index=index, ts=p.ts, reason="timestamp inválido"))
+                continue
+            if dt.year < TelemetryIngestionService.MIN_VALID_YEAR or dt > max_dt:
+                rejected.append(RejectedPoint(index=index, ts=p.ts, reason="timestamp fora do intervalo"))
+                continue
+
+            if p.ts in seen_ts:
+                rejected.append(RejectedPoint(index=index, ts=p.ts, reason="ponto duplicado"))
+                continue
+            seen_ts.add(p.ts)
+
+            accepted.append((p, dt))
+
+        return accepted, rejected
+
+    @staticmethod
+    async def ingest_batch(db: AsyncSession, *, vehicle: VehicleRef, points: List[PointSchema]) -> TelemetrySyncResult:
+        """
+        Grava todos os pontos válidos do lote com um único INSERT multi-linha
+        (executemany com insertmanyvalues do SQLAlchemy). Não faz commit.
+        """
+        started = time.perf_counter()
+        accepted, rejected = TelemetryIngestionService.validate_points(points)
+        # O backlog do cartão SD pode chegar fora de ordem; as transições de cerca dependem dela
+        accepted.sort(key=lambda item: item[1])
+
+        history_rows: List[Dict[str, Any]] = []
+        alert_rows: List[Dict[str, Any]] = []
+        for p, dt in accepted:
+            history_rows.append({
+                "vehicle_id": vehicle.id,
+                "organization_id": vehicle.organization_id,
+                "latitude": p.lat,
+                "longitude": p.lng,
+                "speed": p.spd,
+                "timestamp": dt,
+            })
+            if p.pothole_detected:
+                alert_rows.append({
+                    "vehicle_id": vehicle.id,
+                    "organization_id": vehicle.organization_id,
+                    "type": AlertType.ROAD_HAZARD,
+                    "level": AlertLevel.WARNING,
+                    "message": f"Buraco detectado (Z: {p.acc_z})",
+                    "latitude": p.lat,
+                    "longitude": p.lng,
+                    "timestamp": dt,
+                })
+
+        if history_rows:
+            await db.execute(insert(LocationHistory), history_rows)
+        if alert_rows:
+            await db.execute(insert(Alert), alert_rows)
+            mark_dashboard_dirty(db, vehicle.organization_id)
+
+        # Cercas: uma única avaliação vetorizada para o lote todo (só transições geram alertas)
+        try:
+            await GeofenceService.check_geofences_batch(
+                db,
+                vehicle=vehicle,
+                lats=[p.lat for p, _ in accepted],
+                lons=[p.lng for p, _ in accepted],
+                timestamps=[dt for _, dt in accepted],
+            )
+        except Exception as e:
+            logger.warning(f"Erro ao checar geofence: {e}")
+
+        elapsed = time.perf_counter() - started
+        saved = len(history_rows)
+        points_per_second = (saved / elapsed) if elapsed > 0 else 0.0
+
+        logger.info(
+            f"Telemetria veículo {vehicle.id}: {saved} pontos gravados, {len(rejected)} rejeitados "
+            f"em {elapsed * 1000:.1f} ms ({points_per_second:.0f} pts/s)"
+        )
+
+        return TelemetrySyncResult(
+            saved=saved,
+            rejected=len(rejected),
+            rejected_points=rejected,
+            elapsed_ms=round(elapsed * 1000, 2),
+            points_per_second=round(points_per_second, 1),
+            last_point=accepted[-1][0] if accepted else None,
+        )
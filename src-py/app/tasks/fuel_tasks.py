@@ -1,3 +1,5 @@
+import asyncio
+import logging
 import random
 from datetime import datetime, timedelta
 from typing import List
@@ -7,9 +9,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 # import httpx
 
 from app import crud
+from app.core.config import settings
 from app.schemas.fuel_log_schema import FuelProviderTransaction
 from app.models.user_model import UserRole
 
+logger = logging.getLogger(__name__)
+
+
 async def _get_simulated_transactions(db: AsyncSession, organization_id: int) -> List[FuelProviderTransaction]:
     """
     SIMULADOR: Esta função gera dados falsos e deve ser usada apenas para
@@ -104,32 +110,46 @@ async def _fetch_transactions_from_provider(db: AsyncSession, organization_id: i
     return await _get_simulated_transactions(db, organization_id=organization_id)
 
 
+async def _sync_organization_fuel_logs(db: AsyncSession, organization_id: int, name: str) -> int:
+    print(f"Buscando transações para a organização: {name}")
+    # 1. Busca as transações (do nosso template ou da API real)
+    transactions = await _fetch_transactions_from_provider(db, organization_id=organization_id)
+
+    if not transactions:
+        print(f"Nenhuma nova transação para {name}.")
+        return 0
+
+    # 2. Processa as transações encontradas em lote
+    result = await crud.fuel_log.process_provider_transactions(
+        db=db, transactions=transactions, organization_id=organization_id
+    )
+    processed_count = result.get("new_logs_processed", 0)
+    if processed_count > 0:
+        print(f"{processed_count} novos abastecimentos importados para {name}.")
+    return processed_count
+
+
 async def sync_all_organizations_fuel_logs(db: AsyncSession):
     """
     Esta é a tarefa principal a ser agendada. Ela itera sobre todas as
-    organizações ativas e processa seus abastecimentos.
+    organizações ativas e processa seus abastecimentos, até
+    FUEL_SYNC_CONCURRENCY organizações em paralelo (cada uma com a sua sessão).
     """
     print("Iniciando tarefa de sincronização de abastecimentos...")
     organizations = await crud.organization.get_multi(db, status='active')
-    
-    total_processed = 0
-    for org in organizations:
-        print(f"Buscando transações para a organização: {org.name}")
-        # 1. Busca as transações (do nosso template ou da API real)
-        transactions = await _fetch_transactions_from_provider(db, organization_id=org.id)
-        
-        if not transactions:
-            print(f"Nenhuma nova transação para {org.name}.")
-            continue
-            
-        # 2. Processa as transações encontradas usando a função CRUD existente
-        result = await crud.fuel_log.process_provider_transactions(
-            db=db, transactions=transactions, organization_id=org.id
-        )
-        processed_count = result.get("new_logs_processed", 0)
-        if processed_count > 0:
-            print(f"{processed_count} novos abastecimentos importados para {org.name}.")
-            total_processed += processed_count
+    semaphore = asyncio.Semaphore(settings.FUEL_SYNC_CONCURRENCY)
 
-    print(f"Tarefa de sincronização concluída. Total de {total_processed} novos abastecimentos importados.")
+    async def sync_one(organization_id: int, name: str) -> int:
+        async with semaphore:
+            async with AsyncSession(db.bind, expire_on_commit=False) as org_db:
+                try:
+                    return await _sync_organization_fuel_logs(org_db, organization_id, name)
+                except Exception:
+                    # Uma organização com falha não impede a importação das outras
+                    logger.exception(f"Erro ao sincronizar abastecimentos de {name}")
+                    return 0
+
+    results = await asyncio.gather(*(sync_one(org.id, org.name) for org in organizations))
+    total_processed = sum(results)
 
+    print(f"Tarefa de sincronização concluída. Total de {total_processed} novos abastecimentos importados.")
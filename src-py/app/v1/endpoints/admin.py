@@ -1,9 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from app import crud, deps
 from app.core import auth 
+from app.core.cache import cache_registry
+from app.db.session import engine, replica_engine, pool_stats
+from app.services.position_buffer import position_buffer
+from app.services.live_positions import live_position_hub
+from app.services.pdf_jobs import pdf_jobs
+from app.services.system_checks import system_check_scheduler
+from app.services.notification_counters import unread_counters
 from app.models.user_model import User, UserRole
 from app.schemas.user_schema import UserPublic
 from app.schemas.organization_schema import OrganizationPublic, OrganizationUpdate
@@ -130,3 +137,64 @@ async def impersonate_user(
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+# --- MÉTRICAS INTERNAS ---
+
+@router.get("/metrics/caches", response_model=Dict[str, Dict[str, Any]])
+async def read_cache_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) Tamanho e acertos/falhas dos caches em memória deste worker."""
+    return {name: cache.stats() for name, cache in cache_registry.items()}
+
+
+@router.get("/metrics/position-buffer", response_model=Dict[str, Any])
+async def read_position_buffer_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) Estado do buffer write-behind de posições deste worker."""
+    return position_buffer.stats()
+
+
+@router.get("/metrics/live-map", response_model=Dict[str, Any])
+async def read_live_map_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) Clientes ligados ao mapa em tempo real e mudanças publicadas."""
+    return live_position_hub.stats()
+
+
+@router.get("/metrics/pdf-jobs", response_model=Dict[str, Any])
+async def read_pdf_job_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) PDFs em geração e concluídos/falhados neste worker."""
+    return pdf_jobs.stats()
+
+
+@router.get("/metrics/system-checks", response_model=Dict[str, Any])
+async def read_system_check_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) Voltas da verificação de alertas e duração por organização neste worker."""
+    return system_check_scheduler.stats()
+
+
+@router.get("/metrics/notification-counters", response_model=Dict[str, Any])
+async def read_notification_counter_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) Acertos/falhas dos contadores de notificações não lidas."""
+    return unread_counters.stats()
+
+
+@router.get("/metrics/db-pools", response_model=Dict[str, Any])
+async def read_db_pool_metrics(
+    current_user: User = Depends(deps.get_current_super_admin)
+):
+    """(Super Admin) Conexões em uso, livres e em overflow nos pools deste worker."""
+    return {
+        "primary": pool_stats(engine),
+        "replica": pool_stats(replica_engine) if replica_engine is not engine else None,
+    }
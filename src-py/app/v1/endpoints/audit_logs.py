@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app import deps
+from app.crud.base import InvalidCursorError
 from app.crud import crud_audit_log
 from app.schemas.audit_log_schema import AuditLogPublic
 from app.models.user_model import User, UserRole
@@ -11,23 +12,41 @@ router = APIRouter()
 
 @router.get("/", response_model=List[AuditLogPublic])
 async def read_audit_logs(
+    response: Response,
     db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 50,
     resource_type: str = None,
+    cursor: Optional[str] = None,
     current_user: User = Depends(deps.get_current_active_manager),
 ):
     """
     Lista o histórico de auditoria da organização.
-    Apenas gestores e admins podem ver.
+    Apenas gestores e admins podem ver. A próxima página (keyset) vem no
+    cabeçalho X-Next-Cursor; `skip` > 0 sem cursor continua a usar OFFSET.
     """
-    logs = await crud_audit_log.get_multi_by_org(
-        db=db, 
-        organization_id=current_user.organization_id, 
-        skip=skip, 
-        limit=limit,
-        resource_type=resource_type
-    )
+    if cursor or not skip:
+        try:
+            page = await crud_audit_log.get_page_by_org(
+                db=db,
+                organization_id=current_user.organization_id,
+                cursor=cursor,
+                limit=limit,
+                resource_type=resource_type
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        logs = page.items
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+    else:
+        logs = await crud_audit_log.get_multi_by_org(
+            db=db, 
+            organization_id=current_user.organization_id, 
+            skip=skip, 
+            limit=limit,
+            resource_type=resource_type
+        )
     
     # Enriquece o objeto com o nome do usuário para facilitar no frontend
     results = []
@@ -1,5 +1,6 @@
+import asyncio
 from datetime import datetime, timedelta, date
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict
@@ -10,10 +11,11 @@ from sqlalchemy.orm import selectinload
 from app.models.journey_model import Journey
 from app.models.user_model import User, UserRole
 from app.models.fuel_log_model import FuelLog
-# --- CORREÇÃO: Importar a INSTÂNCIA 'demo_usage' diretamente ---
-from app.crud.crud_demo_usage import demo_usage as crud_demo_usage_instance
-# -------------------------------------------------------------
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.live_positions import live_position_hub
+from app.services.dashboard_service import ManagerDashboardService
+from app.services.demo_usage_snapshots import DemoUsageSnapshot
 # --- NOVOS IMPORTS DOS SCHEMAS CENTRALIZADOS ---
 from app.schemas.dashboard_schema import (
     ManagerDashboardResponse, 
@@ -68,42 +70,17 @@ async def read_manager_dashboard(
     org_id = current_user.organization_id
     start_date = _get_start_date_from_period(period)
 
-    # --- Busca de dados de custos ---
-    costs = await crud.report.get_costs_by_category_last_30_days(db, organization_id=org_id, start_date=start_date)
-    
-    # --- Busca de dados comuns a todos os gestores ---
-    kpis = await crud.report.get_dashboard_kpis(db, organization_id=org_id)
-    efficiency_kpis = await crud.report.get_efficiency_kpis(db, organization_id=org_id, start_date=start_date)
-    recent_alerts = await crud.report.get_recent_alerts(db, organization_id=org_id)
-    upcoming_maintenances = await crud.report.get_upcoming_maintenances(db, organization_id=org_id)
-    active_goal = await crud.report.get_active_goal_with_progress(db, organization_id=org_id)
-
-    # --- Busca de dados premium (CLIENTE_ATIVO ou ADMIN) ---
-    # O Admin vê tudo o que o Cliente Ativo vê.
-    if current_user.role in [UserRole.CLIENTE_ATIVO, UserRole.ADMIN]:
-        km_per_day = await crud.report.get_km_per_day_last_30_days(db, organization_id=org_id, start_date=start_date)
-        podium = await crud.report.get_podium_drivers(db, organization_id=org_id)
-
-        return ManagerDashboardResponse(
-            kpis=kpis,
-            efficiency_kpis=efficiency_kpis,
-            costs_by_category=costs,
-            km_per_day_last_30_days=km_per_day,
-            podium_drivers=podium,
-            recent_alerts=recent_alerts,
-            upcoming_maintenances=upcoming_maintenances,
-            active_goal=active_goal
-        )
-    
-    # --- Resposta para CLIENTE_DEMO (sem dados premium) ---
-    return ManagerDashboardResponse(
-        kpis=kpis,
-        efficiency_kpis=efficiency_kpis,
-        costs_by_category=costs,
-        recent_alerts=recent_alerts,
-        upcoming_maintenances=upcoming_maintenances,
-        active_goal=active_goal,
+    # Todos os blocos são montados de uma vez, com as consultas em paralelo, e o
+    # resultado fica em cache até a próxima escrita relevante da organização.
+    # Dados premium (km por dia e pódio) só para CLIENTE_ATIVO ou ADMIN.
+    payload = await ManagerDashboardService.build_cached(
+        db,
+        organization_id=org_id,
+        period=period,
+        start_date=start_date,
+        premium=current_user.role in [UserRole.CLIENTE_ATIVO, UserRole.ADMIN],
     )
+    return Response(content=payload, media_type="application/json")
 
 
 # --- ENDPOINT PARA O DASHBOARD DO MOTORISTA ---
@@ -220,8 +197,8 @@ async def read_vehicle_positions(
     current_user: User = Depends(deps.get_current_active_user),
 ):
     """
-    Endpoint leve, projetado para ser chamado frequentemente (polling)
-    pelo frontend para atualizar o mapa em tempo real.
+    Endpoint leve com as posições atuais da frota. Para acompanhar o mapa em
+    tempo real, prefira o stream /vehicles/positions/ws em vez de polling.
     """
     # --- CORREÇÃO: Adicionado UserRole.ADMIN ---
     if current_user.role not in [UserRole.CLIENTE_ATIVO, UserRole.CLIENTE_DEMO, UserRole.ADMIN]:
@@ -234,6 +211,55 @@ async def read_vehicle_positions(
     return positions
 
 
+@router.websocket("/vehicles/positions/ws")
+async def stream_vehicle_positions(
+    websocket: WebSocket,
+    token: str = Query(..., description="Access token (o WebSocket do browser não envia cabeçalhos)"),
+):
+    """
+    Stream do mapa em tempo real. Envia primeiro um "snapshot" com todas as posições
+    e depois apenas lotes "delta" com os veículos que mudaram, alimentados pelo
+    caminho de ingestão. Sem mudanças, envia "ping" periodicamente.
+    """
+    # Sessão curta: não manter uma conexão do pool aberta durante todo o stream
+    async with SessionLocal() as db:
+        user = await deps.get_user_from_token(db, token)
+        if (
+            user is None
+            or not user.is_active
+            or user.role not in [UserRole.CLIENTE_ATIVO, UserRole.CLIENTE_DEMO, UserRole.ADMIN]
+        ):
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        organization_id = user.organization_id
+        # Subscreve antes de ler o snapshot: uma posição publicada durante a leitura
+        # fica na fila e segue no primeiro delta, em vez de se perder
+        subscription = live_position_hub.subscribe(organization_id)
+        try:
+            snapshot = await crud.report.get_vehicle_positions(db, organization_id=organization_id)
+        except BaseException:
+            live_position_hub.unsubscribe(subscription)
+            raise
+
+    push_interval = settings.LIVE_MAP_PUSH_INTERVAL_MS / 1000
+    try:
+        await websocket.accept()
+        await websocket.send_json({"type": "snapshot", "positions": [p.model_dump() for p in snapshot]})
+        while True:
+            try:
+                batch = await asyncio.wait_for(subscription.next_batch(), timeout=settings.LIVE_MAP_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "ping"})
+                continue
+            await websocket.send_json({"type": "delta", "positions": [d.model_dump(mode="json") for d in batch]})
+            # Limita a taxa de envio; mudanças nesse intervalo seguem no próximo lote
+            await asyncio.sleep(push_interval)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_position_hub.unsubscribe(subscription)
+
+
 # --- Rota de estatísticas da conta demo (MANTIDA) ---
 class DemoStatsResponse(BaseModel):
     vehicles: DemoResourceLimit
@@ -251,47 +277,31 @@ class DemoStatsResponse(BaseModel):
 
 @router.get("/demo-stats", response_model=DemoStatsResponse, summary="Obtém todos os limites e usos da conta demo")
 async def read_demo_stats_rebuilt(
-    db: AsyncSession = Depends(deps.get_db),
-    current_user: User = Depends(deps.get_current_active_user)
+    current_user: User = Depends(deps.get_current_active_user),
+    snapshot: DemoUsageSnapshot | None = Depends(deps.get_demo_usage_snapshot),
 ):
     # Lógica de permissão expandida:
     # Permite CLIENTE_DEMO OU Motoristas que pertencem a uma organização Demo
-    is_allowed = False
-    if current_user.role == UserRole.CLIENTE_DEMO:
-        is_allowed = True
-    elif current_user.role == UserRole.DRIVER:
-        # Verifica se a organização é demo (tem algum gestor demo)
-        stmt = select(User).where(
-            User.organization_id == current_user.organization_id,
-            User.role == UserRole.CLIENTE_DEMO
-        ).limit(1)
-        result = await db.execute(stmt)
-        if result.scalars().first():
-            is_allowed = True
-            
+    # (tem algum gestor demo); o snapshot já traz essa contagem.
+    is_allowed = current_user.role == UserRole.CLIENTE_DEMO or (
+        current_user.role == UserRole.DRIVER and snapshot.has_demo_manager
+    )
     if not is_allowed:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Esta rota é apenas para contas de demonstração.")
 
-    org_id = current_user.organization_id
-    
     # Contagens de recursos estáticos
-    vehicle_count = await crud.vehicle.count(db, organization_id=org_id)
-    user_count = await crud.user.count(db, organization_id=org_id)
-    part_count = await crud.part.count(db, organization_id=org_id)
-    client_count = await crud.client.count(db, organization_id=org_id)
+    vehicle_count = snapshot.counts.get("vehicles", 0)
+    user_count = snapshot.counts.get("users", 0)
+    part_count = snapshot.counts.get("parts", 0)
+    client_count = snapshot.counts.get("clients", 0)
 
     # --- CONTAGEM REAL DOS ITENS PRINCIPAIS ---
-    journey_count_real = await crud.journey.count_journeys_in_current_month(db, organization_id=org_id)
-    maintenance_count_real = await crud.maintenance.count_requests_in_current_month(db, organization_id=org_id)
-    cost_count_real = await crud.vehicle_cost.count_costs_in_current_month(db, organization_id=org_id)
+    journey_count_real = snapshot.counts.get("journeys", 0)
+    maintenance_count_real = snapshot.counts.get("maintenance_requests", 0)
+    cost_count_real = snapshot.counts.get("vehicle_costs", 0)
 
     # Uso mensal via tabela auxiliar para outros recursos
-    monthly_usage: Dict[str, int] = {}
-    for resource_type in settings.DEMO_MONTHLY_LIMITS.keys():
-        usage = await crud_demo_usage_instance.get_or_create_usage(
-            db, organization_id=org_id, resource_type=resource_type
-        )
-        monthly_usage[resource_type] = usage.usage_count
+    monthly_usage: Dict[str, int] = snapshot.usage
 
     return DemoStatsResponse(
         vehicles=DemoResourceLimit(current=vehicle_count, limit=settings.DEMO_TOTAL_LIMITS.get("vehicles", 3)),
@@ -0,0 +1,98 @@
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import date, datetime
+from typing import Any, AsyncIterator, List, Literal, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import deps
+from app.core.config import settings
+from app.crud import crud_export
+from app.models.user_model import User
+
+router = APIRouter()
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _encode_csv(rows: Sequence[tuple]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([[_plain(v) for v in row] for row in rows])
+    return buffer.getvalue()
+
+
+def _encode_ndjson(columns: List[str], rows: Sequence[tuple]) -> str:
+    return "".join(
+        json.dumps({c: _plain(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n" for row in rows
+    )
+
+
+async def _export_stream(
+    db: AsyncSession, dataset: crud_export.ExportDataset, stmt, fmt: str, gzip: bool
+) -> AsyncIterator[bytes]:
+    # Compressão incremental (cabeçalho gzip): cada lote é comprimido e enviado logo
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+
+    def emit(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    # Sessão própria: a do pedido é fechada antes de a resposta começar a ser enviada
+    async with AsyncSession(db.bind) as session:
+        if fmt == "csv":
+            yield emit(_encode_csv([dataset.column_names]))
+        async for rows in crud_export.stream_rows(session, stmt, batch_size=settings.EXPORT_BATCH_SIZE):
+            chunk = emit(_encode_csv(rows) if fmt == "csv" else _encode_ndjson(dataset.column_names, rows))
+            if chunk:
+                yield chunk
+    if compressor:
+        yield compressor.flush()
+
+
+@router.get("/{dataset_name}", response_class=StreamingResponse)
+async def export_dataset(
+    dataset_name: str,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_db),
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: User = Depends(deps.get_current_active_manager),
+):
+    """
+    Exporta um dataset completo da organização (location-history, fuel-logs,
+    vehicle-costs ou inventory-transactions) em CSV ou NDJSON, em streaming e com
+    memória constante. Datas inclusivas. Comprime com gzip quando o cliente envia
+    Accept-Encoding: gzip.
+    """
+    dataset = crud_export.EXPORT_DATASETS.get(dataset_name)
+    if dataset is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dataset de exportação não encontrado.")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A data inicial deve ser anterior à final.")
+
+    stmt = crud_export.build_export_query(
+        dataset, organization_id=current_user.organization_id, start_date=start_date, end_date=end_date
+    )
+    gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+    headers = {
+        "Content-Disposition": f"attachment; filename={dataset_name.replace('-', '_')}.{format}",
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(_export_stream(db, dataset, stmt, format, gzip), media_type=MEDIA_TYPES[format], headers=headers)
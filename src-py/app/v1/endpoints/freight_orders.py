@@ -42,8 +42,6 @@ async def create_freight_order(
         db=db, obj_in=freight_order_in, organization_id=current_user.organization_id
     )
     
-    if current_user.role == UserRole.CLIENTE_DEMO:
-        await crud.demo_usage.increment_usage(db, organization_id=current_user.organization_id, resource_type="freight_orders")
     try:
         await crud_audit_log.create(db=db, log_in=AuditLogCreate(
             action="CREATE", resource_type="Ordem de Frete", resource_id=str(freight_order.id),
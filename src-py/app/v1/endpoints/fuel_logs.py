@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Response, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from app.models.notification_model import NotificationType
 from app import crud, deps
+from app.crud.base import InvalidCursorError
 from app.models.user_model import User, UserRole
 from app.schemas.fuel_log_schema import FuelLogPublic, FuelLogCreate, FuelLogUpdate
 
@@ -56,6 +57,7 @@ async def create_fuel_log(
     
     if vehicle:
         is_abnormal, details = await crud.fuel_log.check_abnormal_consumption(db, fuel_log=fuel_log, vehicle=vehicle)
+        await db.commit()
         if is_abnormal:
             background_tasks.add_task(
                 crud.notification.create_notification,
@@ -69,20 +71,37 @@ async def create_fuel_log(
 
 @router.get("/", response_model=List[FuelLogPublic])
 async def read_fuel_logs(
+    response: Response,
     db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(deps.get_current_active_user),
 ):
-    """Retorna o histórico de abastecimentos."""
+    """
+    Retorna o histórico de abastecimentos. A próxima página (keyset) vem no
+    cabeçalho X-Next-Cursor; `skip` > 0 sem cursor continua a usar OFFSET.
+    """
     # --- CORREÇÃO AQUI: Adicionado UserRole.ADMIN ---
-    # Se for Admin ou Cliente, vê TUDO da organização.
-    if current_user.role in [UserRole.CLIENTE_ATIVO, UserRole.CLIENTE_DEMO, UserRole.ADMIN]:
+    # Se for Admin ou Cliente, vê TUDO da organização; DRIVER vê apenas os seus.
+    is_manager = current_user.role in [UserRole.CLIENTE_ATIVO, UserRole.CLIENTE_DEMO, UserRole.ADMIN]
+    if cursor or not skip:
+        try:
+            page = await crud.fuel_log.get_page_by_org(
+                db=db, organization_id=current_user.organization_id, cursor=cursor, limit=limit,
+                user_id=None if is_manager else current_user.id
+            )
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        return page.items
+
+    if is_manager:
         return await crud.fuel_log.get_multi_by_org(
             db=db, organization_id=current_user.organization_id, skip=skip, limit=limit
         )
     else: 
-        # DRIVER vê apenas os seus
         return await crud.fuel_log.get_multi_by_user(
             db=db, user_id=current_user.id, organization_id=current_user.organization_id, skip=skip, limit=limit
         )
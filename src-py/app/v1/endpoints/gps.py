@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, models, deps
 from app.schemas.gps_schema import LocationCreate
+from app.services.position_buffer import position_buffer
 
 router = APIRouter()
 
@@ -17,11 +18,13 @@ async def receive_gps_ping(
     Recebe um 'ping' de localização e atualiza o estado do veículo.
     Este será nosso endpoint de teste e, futuramente, o usado pelo OBD-II.
     """
-    await crud.vehicle.update_location(
-        db=db,
-        vehicle_id=location_in.vehicle_id,
-        lat=location_in.latitude,
-        lon=location_in.longitude
+    vehicle = await crud.vehicle.resolve_by_id(db, vehicle_id=location_in.vehicle_id)
+    if not vehicle:
+        raise HTTPException(status_code=404, detail="Veículo não encontrado")
+
+    await position_buffer.submit(
+        db, vehicle=vehicle, latitude=location_in.latitude, longitude=location_in.longitude
     )
+    await db.commit()
     # Não retornamos conteúdo para máxima performance
     return
\ No newline at end of file
@@ -4,13 +4,15 @@ from datetime import datetime
 from typing import Optional
 from app import crud, deps
 from app.schemas.telemetry_schema import TelemetryPayload
+from app.services.position_buffer import position_buffer
 
 router = APIRouter()
 
 @router.post("/traccar", status_code=status.HTTP_200_OK)
 @router.get("/traccar", status_code=status.HTTP_200_OK)
 async def receive_traccar_position(
-    db: AsyncSession = Depends(deps.get_db),
+    # Também recebe GET, mas grava: nunca na réplica
+    db: AsyncSession = Depends(deps.get_primary_db),
     # Parâmetros enviados pelo App Traccar Client (Protocolo OsmAnd)
     id: str = Query(..., description="Device Identifier (IMEI ou ID único)"),
     lat: float = Query(..., description="Latitude"),
@@ -32,9 +34,9 @@ async def receive_traccar_position(
         try:
             # Se for muito grande (ex: 1600000000000), é milissegundos
             if timestamp > 1000000000000:
-                dt_timestamp = datetime.fromtimestamp(timestamp / 1000.0)
+                dt_timestamp = datetime.utcfromtimestamp(timestamp / 1000.0)
             else:
-                dt_timestamp = datetime.fromtimestamp(timestamp)
+                dt_timestamp = datetime.utcfromtimestamp(timestamp)
         except:
             dt_timestamp = datetime.utcnow()
     else:
@@ -59,6 +61,11 @@ async def receive_traccar_position(
     # Essa função (que já existe no seu crud_vehicle.py) busca pelo 'telemetry_device_id'
     vehicle = await crud.vehicle.update_vehicle_from_telemetry(db=db, payload=telemetry_data)
 
+    if vehicle:
+        # A posição vai para o buffer e é gravada em lote junto com a dos outros veículos
+        await position_buffer.submit(db, vehicle=vehicle, latitude=lat, longitude=lon, recorded_at=dt_timestamp)
+        await db.commit()
+
     if not vehicle:
         print(f"⚠️ [Integração Traccar] Recebido ID '{id}' mas nenhum veículo encontrado com esse Device ID.")
     else:
@@ -5,6 +5,7 @@ from typing import List
 from app import crud, deps
 from app.models.user_model import User
 from app.schemas.notification_schema import NotificationPublic
+from app.services.system_checks import system_check_scheduler
 
 router = APIRouter()
 
@@ -30,6 +31,17 @@ async def read_unread_notification_count(
     )
     return count
 
+@router.post("/read-all")
+async def mark_all_as_read(
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """Marca todas as notificações do utilizador logado como lidas."""
+    updated = await crud.notification.mark_all_notifications_as_read(
+        db, user_id=current_user.id, organization_id=current_user.organization_id
+    )
+    return {"updated": updated}
+
 @router.post("/{notification_id}/read", response_model=NotificationPublic)
 async def mark_as_read(
     notification_id: int,
@@ -46,14 +58,14 @@ async def mark_as_read(
 
 @router.post("/trigger-alerts", status_code=status.HTTP_202_ACCEPTED)
 async def trigger_alerts_check_for_organization(
-    db: AsyncSession = Depends(deps.get_db),
     current_user: User = Depends(deps.get_current_active_manager),
 ):
     """
-    Dispara a verificação de alertas do sistema APENAS para a organização do gestor logado.
-    (Idealmente, isto seria uma tarefa agendada, não um endpoint de API).
+    Pede uma verificação de alertas antecipada APENAS para a organização do gestor logado.
+    A verificação corre em segundo plano no agendador (que já verifica todas as
+    organizações periodicamente); pedidos repetidos num curto intervalo são ignorados.
     """
-    await crud.notification.run_system_checks_for_organization(
-        db, organization_id=current_user.organization_id
-    )
-    return {"message": "Verificação de alertas para a sua organização foi iniciada."}
\ No newline at end of file
+    scheduled = await system_check_scheduler.trigger(current_user.organization_id)
+    if not scheduled:
+        return {"message": "A verificação de alertas da sua organização já foi executada recentemente."}
+    return {"message": "Verificação de alertas para a sua organização foi iniciada."}
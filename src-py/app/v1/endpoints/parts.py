@@ -22,6 +22,7 @@ from app.schemas.part_schema import (
 )
 from app.schemas.inventory_transaction_schema import TransactionPublic
 from app.crud import crud_part 
+from app.crud.base import InvalidCursorError
 from app.models.inventory_transaction_model import TransactionType
 
 router = APIRouter()
@@ -343,18 +344,25 @@ async def read_all_inventory_items(
     status: Optional[InventoryItemStatus] = None,
     part_id: Optional[int] = None,
     vehicle_id: Optional[int] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True
 ):
-    result = await crud_part.get_all_items_paginated(
-        db=db,
-        organization_id=current_user.organization_id,
-        skip=skip,
-        limit=limit,
-        status=status,
-        part_id=part_id,
-        vehicle_id=vehicle_id,
-        search=search
-    )
+    try:
+        result = await crud_part.get_all_items_paginated(
+            db=db,
+            organization_id=current_user.organization_id,
+            skip=skip,
+            limit=limit,
+            status=status,
+            part_id=part_id,
+            vehicle_id=vehicle_id,
+            search=search,
+            cursor=cursor,
+            include_total=include_total
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return result
 
 @router.get("/{part_id}/items", response_model=List[InventoryItemPublic])
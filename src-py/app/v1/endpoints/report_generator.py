@@ -1,60 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from jinja2 import Environment, FileSystemLoader
-from xhtml2pdf import pisa
-import io
 
-from app import crud, deps
+from app import deps
 from app.models.user_model import User
 from app.schemas.report_generator_schema import ReportRequest
+from app.services.pdf_jobs import pdf_jobs
+from app.services.report_rendering import REPORT_TEMPLATES, build_report_html
 
 router = APIRouter()
 
 @router.post("/generate", response_class=Response)
 async def generate_report(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     report_request: ReportRequest,
     current_user: User = Depends(deps.get_current_active_manager),
 ):
     """
     Endpoint central para gerar relatórios em PDF de forma segura.
+    O PDF é renderizado no pool de processos, fora do event loop.
     """
-    env = Environment(loader=FileSystemLoader("app/templates/"))
-    
-    try:
-        if report_request.report_type == "activity_by_driver":
-            template = env.get_template("driver_activity_report.html")
-            
-            # A CORREÇÃO DE SEGURANÇA: Passamos a organization_id do gestor logado
-            data = await crud.report.get_driver_activity_data(
-                db,
-                driver_id=report_request.target_id,
-                organization_id=current_user.organization_id, # <-- A LINHA CRUCIAL
-                date_from=report_request.date_from,
-                date_to=report_request.date_to
-            )
-            filename = f"relatorio_motorista_{report_request.target_id}.pdf"
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de relatório inválido.")
+    if report_request.report_type not in REPORT_TEMPLATES:
+        raise HTTPException(status_code=400, detail="Tipo de relatório inválido.")
 
+    try:
+        # A CORREÇÃO DE SEGURANÇA: Passamos a organization_id do gestor logado
+        rendered = await build_report_html(
+            db,
+            report_request=report_request,
+            organization_id=current_user.organization_id, # <-- A LINHA CRUCIAL
+        )
     except ValueError as e:
         # Captura o erro do CRUD se o motorista não for encontrado na organização
         raise HTTPException(status_code=404, detail=str(e))
 
-    if not data:
+    if not rendered:
          raise HTTPException(status_code=404, detail="Não foram encontrados dados para este relatório.")
+    html_content, filename = rendered
 
-    html_content = template.render(data=data)
-    
-    result = io.BytesIO()
-    pdf = pisa.pisaDocument(io.BytesIO(html_content.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        return Response(
-            result.getvalue(),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-    else:
-        raise HTTPException(status_code=500, detail="Erro ao gerar o PDF.")
\ No newline at end of file
+    try:
+        content = await pdf_jobs.render(html_content)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Erro ao gerar o PDF.")
+
+    return Response(
+        content,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
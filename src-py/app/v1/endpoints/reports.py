@@ -1,14 +1,14 @@
 # backend/app/api/v1/endpoints/reports.py
 from fastapi import APIRouter, Depends, HTTPException, Response, Body, status
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from jinja2 import Environment, FileSystemLoader
-from xhtml2pdf import pisa
-import io
 from datetime import datetime, date, timedelta
 import logging
 from app import crud, deps
 from app.models.user_model import User, UserRole
-from app.schemas.report_generator_schema import ReportRequest
+from app.schemas.report_generator_schema import ReportRequest, PdfJobStatus
+from app.services.pdf_jobs import pdf_jobs
+from app.services.report_rendering import REPORT_TEMPLATES, build_report_html
 from app.schemas.report_schema import (
     DashboardSummary, 
     VehicleConsolidatedReport, 
@@ -23,7 +23,7 @@ router = APIRouter()
              dependencies=[Depends(deps.check_demo_limit("reports"))])
 async def generate_fleet_management_report(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     start_date: date = Body(..., embed=True),
     end_date: date = Body(..., embed=True),
     current_user: User = Depends(deps.get_current_active_user),
@@ -33,8 +33,6 @@ async def generate_fleet_management_report(
         report_data = await crud.report.get_fleet_management_data(
             db=db, start_date=start_date, end_date=end_date, organization_id=current_user.organization_id
         )
-        if current_user.role == UserRole.CLIENTE_DEMO:
-            await crud.demo_usage.increment_usage(db, organization_id=current_user.organization_id, resource_type="reports")
         return report_data
     except Exception as e:
         raise HTTPException(status_code=500, detail="Ocorreu um erro interno ao gerar o relatório gerencial.")
@@ -43,7 +41,7 @@ async def generate_fleet_management_report(
              dependencies=[Depends(deps.check_demo_limit("reports"))])
 async def generate_driver_performance_report(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     start_date: date = Body(..., embed=True),
     end_date: date = Body(..., embed=True),
     current_user: User = Depends(deps.get_current_active_user),
@@ -53,8 +51,6 @@ async def generate_driver_performance_report(
         report_data = await crud.report.get_driver_performance_data(
             db=db, start_date=start_date, end_date=end_date, organization_id=current_user.organization_id
         )
-        if current_user.role == UserRole.CLIENTE_DEMO:
-            await crud.demo_usage.increment_usage(db, organization_id=current_user.organization_id, resource_type="reports")
         return report_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ocorreu um erro ao gerar o relatório: {e}")
@@ -63,48 +59,94 @@ async def generate_driver_performance_report(
              dependencies=[Depends(deps.check_demo_limit("reports"))])
 async def generate_report_pdf(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
+    report_request: ReportRequest,
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """
+    Endpoint central para gerar relatórios em PDF de forma segura. A renderização
+    corre no pool de processos; para relatórios grandes prefira /pdf-jobs.
+    """
+    html_content, filename = await _build_report_html(db, report_request, current_user)
+    try:
+        content = await pdf_jobs.render(html_content)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Erro ao gerar o PDF.")
+
+    return Response(
+        content, media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.post("/pdf-jobs", response_model=PdfJobStatus, status_code=status.HTTP_202_ACCEPTED,
+             dependencies=[Depends(deps.check_demo_limit("reports"))])
+async def submit_report_pdf_job(
+    *,
+    db: AsyncSession = Depends(deps.get_read_db),
     report_request: ReportRequest,
     current_user: User = Depends(deps.get_current_active_user),
 ):
-    """Endpoint central para gerar relatórios em PDF de forma segura."""
-    env = Environment(loader=FileSystemLoader("app/templates/"))
+    """Agenda a geração do PDF e retorna o job para acompanhar em GET /pdf-jobs/{job_id}."""
+    html_content, filename = await _build_report_html(db, report_request, current_user)
+    job = await pdf_jobs.submit(
+        html_content, filename=filename, organization_id=current_user.organization_id, user_id=current_user.id
+    )
+    return job
+
+
+@router.get("/pdf-jobs/{job_id}", response_model=PdfJobStatus)
+async def read_report_pdf_job(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """Estado de um job de PDF ("pending", "done" ou "failed")."""
+    return await _get_own_job(job_id, current_user)
+
+
+@router.get("/pdf-jobs/{job_id}/download", response_class=FileResponse)
+async def download_report_pdf_job(
+    job_id: str,
+    current_user: User = Depends(deps.get_current_active_user),
+):
+    """Baixa o PDF de um job concluído (disponível até expirar)."""
+    job = await _get_own_job(job_id, current_user)
+    if job["status"] != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="O PDF ainda não está pronto.")
+    return FileResponse(pdf_jobs.file_path(job_id), media_type="application/pdf", filename=job["filename"])
+
+
+async def _build_report_html(db: AsyncSession, report_request: ReportRequest, current_user: User) -> tuple[str, str]:
+    if report_request.report_type not in REPORT_TEMPLATES:
+        raise HTTPException(status_code=400, detail="Tipo de relatório inválido.")
     try:
-        if report_request.report_type == "activity_by_driver":
-            template = env.get_template("driver_activity_report.html")
-            data = await crud.report.get_driver_activity_data(
-                db, driver_id=report_request.target_id, organization_id=current_user.organization_id,
-                date_from=report_request.date_from, date_to=report_request.date_to
-            )
-            filename = f"relatorio_motorista_{report_request.target_id}.pdf"
-        else:
-            raise HTTPException(status_code=400, detail="Tipo de relatório inválido.")
+        rendered = await build_report_html(
+            db, report_request=report_request, organization_id=current_user.organization_id
+        )
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
-
-    if not data:
+    if not rendered:
         raise HTTPException(status_code=404, detail="Não foram encontrados dados para este relatório.")
+    return rendered
 
-    html_content = template.render(data=data)
-    result = io.BytesIO()
-    pdf = pisa.pisaDocument(io.BytesIO(html_content.encode("UTF-8")), result)
-    
-    if not pdf.err:
-        if current_user.role == UserRole.CLIENTE_DEMO:
-            await crud.demo_usage.increment_usage(db, organization_id=current_user.organization_id, resource_type="reports")
-        return Response(
-            result.getvalue(), media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-    else:
-        raise HTTPException(status_code=500, detail="Erro ao gerar o PDF.")
+
+async def _get_own_job(job_id: str, current_user: User) -> dict:
+    job = await pdf_jobs.get(job_id)
+    # Só quem pediu o relatório acompanha e baixa o PDF
+    if (
+        not job
+        or job["organization_id"] != current_user.organization_id
+        or job.get("user_id") != current_user.id
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job de PDF não encontrado ou expirado.")
+    return job
     
 
 # --- ENDPOINT BLOQUEADO PARA DEMO ---
 @router.post("/vehicle-consolidated", response_model=VehicleConsolidatedReport)
 async def generate_vehicle_consolidated_report(
     *,
-    db: AsyncSession = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_read_db),
     report_request: VehicleReportRequest = Body(...), 
     current_user: User = Depends(deps.get_current_active_user),
 ):
@@ -5,6 +5,7 @@ from pydantic import BaseModel  # Importa BaseModel
 from app.schemas.audit_log_schema import AuditLogCreate
 from app.crud import crud_audit_log
 from app import crud, deps
+from app.crud.base import InvalidCursorError
 from app.models.user_model import User, UserRole
 from sqlalchemy.exc import IntegrityError
 
@@ -28,27 +29,46 @@ async def read_vehicles(
     page: int = 1,
     rowsPerPage: int = 8,
     search: str | None = None,
+    cursor: str | None = None,
+    include_total: bool = True,
     current_user: User = Depends(deps.get_current_active_user)
 ):
     """
     Lista os veículos da organização com paginação e busca.
+    Use o next_cursor da resposta em `cursor` para a página seguinte (keyset);
+    `page` > 1 sem cursor continua a funcionar com OFFSET.
     """
-    skip = (page - 1) * rowsPerPage
-
-    vehicles = await crud.vehicle.get_multi_by_org(
-        db,
-        organization_id=current_user.organization_id,
-        skip=skip,
-        limit=rowsPerPage,
-        search=search
-    )
-    total_items = await crud.vehicle.count_by_org(
-        db,
-        organization_id=current_user.organization_id,
-        search=search
-    )
+    next_cursor = None
+    try:
+        if cursor or page <= 1:
+            result = await crud.vehicle.get_page_by_org(
+                db,
+                organization_id=current_user.organization_id,
+                cursor=cursor,
+                limit=rowsPerPage,
+                search=search
+            )
+            vehicles, next_cursor = result.items, result.next_cursor
+        else:
+            vehicles = await crud.vehicle.get_multi_by_org(
+                db,
+                organization_id=current_user.organization_id,
+                skip=(page - 1) * rowsPerPage,
+                limit=rowsPerPage,
+                search=search
+            )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    total_items = None
+    if include_total:
+        total_items = await crud.vehicle.count_by_org(
+            db,
+            organization_id=current_user.organization_id,
+            search=search
+        )
 
-    return {"vehicles": vehicles, "total_items": total_items}
+    return {"vehicles": vehicles, "total_items": total_items, "next_cursor": next_cursor}
 
 
 @router.get("/{vehicle_id}", response_model=VehiclePublic)
@@ -39,7 +39,13 @@ from fastapi.staticfiles import StaticFiles
 from app.api import api_router
 from app.core.config import settings
 from app.core.logging_config import setup_logging
-from app.db.session import engine
+from app.db.session import engine, dispose_engines
+from app.services.position_buffer import position_buffer
+from app.services.live_positions import live_position_hub
+from app.crud.crud_vehicle import vehicle_lookup_invalidations
+from app.services.pdf_jobs import pdf_jobs
+from app.services.report_rendering import warm_templates
+from app.services.system_checks import system_check_scheduler
 
 # ======================= BLOCO DE IMPORTAÇÃO DOS MODELOS =======================
 # Este bloco garante que a Base do SQLAlchemy conheça todas as suas tabelas
@@ -72,6 +78,8 @@ from app.models.feedback_model import Feedback
 # --- ESTA É A CORREÇÃO DEFINITIVA ---
 # Adiciona o nosso novo modelo à lista de modelos conhecidos.
 from app.models.demo_usage_model import DemoUsage
+from app.models.rollup_model import DailyActivityRollup, DailyCostRollup, RollupCoverage
+from app.models.fuel_baseline_model import VehicleFuelBaseline
 # ==============================================================================
 
 
@@ -111,6 +119,31 @@ async def on_startup():
         # e a 'demousage', e as criará na ordem correta.
         await conn.run_sync(Base.metadata.create_all)
 
+    # Inicia a gravação em lote das últimas posições dos veículos
+    position_buffer.start()
+    # Escuta o pub/sub do mapa em tempo real (apenas com LIVE_MAP_BACKEND=redis)
+    live_position_hub.start()
+    # Invalidações do cache de resolução de veículos vindas de outros workers (com Redis)
+    vehicle_lookup_invalidations.start()
+    # Remove periodicamente os PDFs gerados que já expiraram
+    pdf_jobs.start()
+    # Compila os templates dos relatórios antes do primeiro pedido
+    warm_templates()
+    # Verificação periódica de alertas (só varre no processo eleito para o shard)
+    system_check_scheduler.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Grava as posições que ainda estão no buffer antes de encerrar.
+    """
+    await position_buffer.stop()
+    await live_position_hub.stop()
+    await vehicle_lookup_invalidations.stop()
+    await pdf_jobs.stop()
+    await system_check_scheduler.stop()
+    await dispose_engines()
+
 # 7. Adicionar Handlers de Exceção
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -0,0 +1,71 @@
+# backend/tests/api/v1/test_dashboard.py
+
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.models.vehicle_model import VehicleStatus
+from app.schemas.vehicle_schema import VehicleCreate, VehicleUpdate
+from app.core.config import settings
+from app.services.dashboard_cache import UncachedDashboardCacheBackend, _build_dashboard_cache, dashboard_cache
+
+
+@pytest.fixture
+async def manager(db_session: AsyncSession, create_manager) -> dict:
+    """Cria uma organização com dois veículos (um em uso) e um gestor CLIENTE_ATIVO."""
+    manager = await create_manager("Dashboard Org")
+    org_id, suffix = manager["organization_id"], manager["suffix"]
+    for i in range(2):
+        vehicle = await crud.vehicle.create_with_owner(
+            db_session,
+            obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"D{suffix}{i}"),
+            organization_id=org_id,
+        )
+        if i == 0:
+            await crud.vehicle.update(db_session, db_vehicle=vehicle, vehicle_in=VehicleUpdate(status=VehicleStatus.IN_USE))
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_manager_dashboard_builds_all_blocks_from_shared_totals(client: AsyncClient, manager):
+    response = await client.get("/dashboard/manager", headers=manager["headers"])
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["kpis"] == {"total_vehicles": 2, "available_vehicles": 1, "in_use_vehicles": 1, "maintenance_vehicles": 0}
+    assert body["efficiency_kpis"]["utilization_rate"] == 50.0
+    assert body["km_per_day_last_30_days"] == []
+    assert body["podium_drivers"] == []
+    assert body["active_goal"] is None
+
+
+@pytest.mark.asyncio
+async def test_manager_dashboard_is_cached_until_an_organization_write(
+    client: AsyncClient, db_session: AsyncSession, manager
+):
+    await client.get("/dashboard/manager", headers=manager["headers"])
+    hits_before = dashboard_cache.hits
+    await client.get("/dashboard/manager", headers=manager["headers"])
+    assert dashboard_cache.hits == hits_before + 1
+
+    await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Scania", model="R450", year=2023, license_plate=f"N{manager['suffix']}"),
+        organization_id=manager["organization_id"],
+    )
+    response = await client.get("/dashboard/manager", headers=manager["headers"])
+    assert dashboard_cache.hits == hits_before + 1
+    assert response.json()["kpis"]["total_vehicles"] == 3
+
+
+def test_memory_dashboard_cache_is_disabled_with_several_workers(monkeypatch):
+    # Cada worker teria a sua geração: uma escrita noutro worker não invalidaria este
+    monkeypatch.setattr(settings, "DASHBOARD_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 2)
+    cache = _build_dashboard_cache()
+    assert isinstance(cache.backend, UncachedDashboardCacheBackend) and not cache.enabled
+
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 1)
+    assert _build_dashboard_cache().enabled
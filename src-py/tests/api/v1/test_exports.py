@@ -0,0 +1,64 @@
+# backend/tests/api/v1/test_exports.py
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, deps
+from app.models.location_history_model import LocationHistory
+from app.models.vehicle_cost_model import VehicleCost, CostType
+from app.schemas.vehicle_schema import VehicleCreate
+from main import app
+
+
+@pytest.mark.asyncio
+async def test_exports_stream_the_organization_rows_as_csv_and_ndjson(
+    client: AsyncClient, db_session: AsyncSession, create_manager, monkeypatch
+):
+    # test_users substitui o gestor por um utilizador fixo; aqui o token decide a organização
+    monkeypatch.delitem(app.dependency_overrides, deps.get_current_active_manager, raising=False)
+    manager = await create_manager("Export Org")
+    org_id, suffix, headers = manager["organization_id"], manager["suffix"], manager["headers"]
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"E{suffix}"),
+        organization_id=org_id,
+    )
+    vehicle_id = vehicle.id
+    now = datetime.utcnow()
+    db_session.add_all([
+        *(LocationHistory(latitude=-23.5 + i / 100, longitude=-46.6, speed=50.0, timestamp=now - timedelta(minutes=i),
+                          vehicle_id=vehicle_id, organization_id=org_id) for i in range(5)),
+        LocationHistory(latitude=-22.0, longitude=-46.0, timestamp=now - timedelta(days=10),
+                        vehicle_id=vehicle_id, organization_id=org_id),
+        VehicleCost(description="Pedágio", amount=12.5, date=now.date(), cost_type=CostType.PEDAGIO,
+                    vehicle_id=vehicle_id, organization_id=org_id),
+    ])
+    await db_session.commit()
+
+    response = await client.get(
+        "/exports/location-history",
+        params={"start_date": (now - timedelta(days=1)).date().isoformat()},
+        headers={**headers, "Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-encoding"] == "gzip"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 5
+    assert set(rows[0]) == {"id", "vehicle_id", "timestamp", "latitude", "longitude", "speed"}
+
+    response = await client.get(
+        "/exports/vehicle-costs", params={"format": "ndjson"}, headers={**headers, "Accept-Encoding": "identity"}
+    )
+    assert "content-encoding" not in response.headers
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{"id": lines[0]["id"], "vehicle_id": vehicle_id, "date": now.date().isoformat(),
+                      "cost_type": "Pedágio", "amount": 12.5, "description": "Pedágio"}]
+
+    missing = await client.get("/exports/users", headers=headers)
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,70 @@
+# backend/tests/api/v1/test_reports.py
+
+import asyncio
+import uuid
+from datetime import date, datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.core import auth
+from app.models.journey_model import Journey
+from app.models.user_model import UserRole
+from app.schemas.user_schema import UserCreate
+from app.schemas.vehicle_schema import VehicleCreate
+from app.services.pdf_jobs import pdf_jobs
+
+
+@pytest.mark.asyncio
+async def test_pdf_job_is_rendered_off_the_event_loop_and_downloaded(
+    client: AsyncClient, db_session: AsyncSession, create_manager, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(pdf_jobs, "directory", str(tmp_path))
+    manager = await create_manager("PDF Org")
+    org_id, suffix, headers = manager["organization_id"], manager["suffix"], manager["headers"]
+    driver = await crud.user.create(
+        db_session,
+        user_in=UserCreate(full_name="Motorista", email=f"pdf-driver-{suffix.lower()}@test.com", password="password"),
+        organization_id=org_id,
+        role=UserRole.DRIVER,
+    )
+    driver_id = driver.id
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"F{suffix}"),
+        organization_id=org_id,
+    )
+    db_session.add(Journey(trip_type="FREE_ROAM", start_time=datetime.utcnow() - timedelta(days=1), start_mileage=100,
+                           end_mileage=180, is_active=False, vehicle_id=vehicle.id, driver_id=driver_id, organization_id=org_id))
+    await db_session.commit()
+
+    payload = {
+        "report_type": "activity_by_driver",
+        "date_from": (date.today() - timedelta(days=7)).isoformat(),
+        "date_to": date.today().isoformat(),
+        "target_id": driver_id,
+    }
+    response = await client.post("/reports/pdf-jobs", json=payload, headers=headers)
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    job_id = response.json()["id"]
+
+    for _ in range(100):
+        job = (await client.get(f"/reports/pdf-jobs/{job_id}", headers=headers)).json()
+        if job["status"] != "pending":
+            break
+        await asyncio.sleep(0.1)
+    assert job["status"] == "done"
+
+    download = await client.get(f"/reports/pdf-jobs/{job_id}/download", headers=headers)
+    assert download.status_code == status.HTTP_200_OK
+    assert download.content.startswith(b"%PDF")
+
+    missing = await client.get(f"/reports/pdf-jobs/{uuid.uuid4().hex}", headers=headers)
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+    # Outro usuário da mesma organização não acompanha o job de quem o pediu
+    other_headers = {"Authorization": f"Bearer {auth.create_access_token(data={'sub': str(driver_id)})}"}
+    foreign = await client.get(f"/reports/pdf-jobs/{job_id}/download", headers=other_headers)
+    assert foreign.status_code == status.HTTP_404_NOT_FOUND
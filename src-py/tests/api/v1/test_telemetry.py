@@ -0,0 +1,73 @@
+# backend/tests/api/v1/test_telemetry.py
+
+import time
+import uuid
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud.crud_vehicle import vehicle_lookup_cache
+from app.models.location_history_model import LocationHistory
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.vehicle_schema import VehicleCreate
+
+
+@pytest.fixture
+async def telemetry_vehicle(db_session: AsyncSession):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Telemetry Org {suffix}", sector="frete"))
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"T{suffix}"),
+        organization_id=org.id,
+    )
+    return vehicle
+
+
+@pytest.mark.asyncio
+async def test_sync_bulk_inserts_points_and_rejects_only_bad_ones(
+    client: AsyncClient, db_session: AsyncSession, telemetry_vehicle
+):
+    now = int(time.time())
+    points = [{"lat": -23.55 + i * 0.0001, "lng": -46.63, "spd": 40.0, "ts": now - 600 + i} for i in range(500)]
+    points.append({"lat": 95.0, "lng": -46.63, "spd": 0.0, "ts": now - 10})     # fora do intervalo
+    points.append({"lat": -23.55, "lng": -46.63, "spd": 0.0, "ts": 1_600_000_000})  # RTC sem sincronização
+    points.append(dict(points[0]))                                               # duplicado
+
+    response = await client.post(
+        "/telemetry/sync", json={"vehicle_id": telemetry_vehicle.id, "points": points}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["saved"] == 500
+    assert body["rejected"] == 3
+    assert sorted(p["index"] for p in body["rejected_points"]) == [500, 501, 502]
+    assert "last_point" not in body
+
+    stored = await db_session.execute(
+        select(func.count(LocationHistory.id)).where(LocationHistory.vehicle_id == telemetry_vehicle.id)
+    )
+    assert stored.scalar_one() == 500
+
+
+@pytest.mark.asyncio
+async def test_sync_resolves_vehicle_from_cache_and_update_invalidates_it(
+    client: AsyncClient, db_session: AsyncSession, telemetry_vehicle
+):
+    point = {"lat": -23.55, "lng": -46.63, "spd": 0.0, "ts": int(time.time()) - 5}
+    payload = {"vehicle_token": telemetry_vehicle.license_plate, "points": [point]}
+
+    await client.post("/telemetry/sync", json=payload)
+    hits_before = vehicle_lookup_cache.hits
+    response = await client.post("/telemetry/sync", json=payload)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert vehicle_lookup_cache.hits == hits_before + 1
+
+    await crud.vehicle.remove(db_session, db_vehicle=telemetry_vehicle)
+    response = await client.post("/telemetry/sync", json=payload)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
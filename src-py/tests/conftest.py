@@ -1,5 +1,6 @@
 # backend/tests/conftest.py
 
+import uuid
 import pytest
 from typing import AsyncGenerator
 from httpx import AsyncClient
@@ -8,7 +9,10 @@ from sqlalchemy.orm import sessionmaker
 
 # Importações da sua aplicação
 from app.models.user_model import User, UserRole
-from app import deps
+from app import crud, deps
+from app.core import auth
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
 from app.db.base_class import Base
 from main import app
 
@@ -59,4 +63,30 @@ async def db_session() -> AsyncGenerator[AsyncSession, None]:
 @pytest.fixture
 async def client() -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(app=app, base_url="http://test") as ac:
-        yield ac
\ No newline at end of file
+        yield ac
+
+@pytest.fixture
+def create_manager(db_session: AsyncSession):
+    """
+    Cria uma organização nova com um gestor e retorna o cabeçalho de autorização dele,
+    os ids e o sufixo único usado nos nomes (para placas e e-mails do próprio teste).
+    """
+    async def _create_manager(org_name: str = "Test Org", role: UserRole = UserRole.CLIENTE_ATIVO) -> dict:
+        suffix = uuid.uuid4().hex[:6].upper()
+        org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"{org_name} {suffix}", sector="frete"))
+        organization_id = org.id
+        user = await crud.user.create(
+            db_session,
+            user_in=UserCreate(full_name="Gestor", email=f"gestor-{suffix.lower()}@test.com", password="password"),
+            organization_id=organization_id,
+            role=role,
+        )
+        user_id = user.id
+        token = auth.create_access_token(data={"sub": str(user_id)})
+        return {
+            "headers": {"Authorization": f"Bearer {token}"},
+            "organization_id": organization_id,
+            "user_id": user_id,
+            "suffix": suffix,
+        }
+    return _create_manager
@@ -0,0 +1,67 @@
+# backend/tests/test_auth_cache.py
+
+import uuid
+import pytest
+from sqlalchemy import event
+
+from app import crud, deps
+from app.core.security import create_access_token
+from app.models.user_model import UserRole
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from tests.conftest import TestingSessionLocal, engine
+
+
+@pytest.mark.asyncio
+async def test_authenticated_requests_reuse_claims_and_user_until_the_user_changes():
+    suffix = uuid.uuid4().hex[:6].upper()
+    async with TestingSessionLocal() as db:
+        org = await crud.organization.create(db, obj_in=OrganizationCreate(name=f"Auth Org {suffix}", sector="frete"))
+        user = await crud.user.create(
+            db,
+            user_in=UserCreate(full_name="Bruna", email=f"bruna-{suffix.lower()}@test.com", password="password"),
+            organization_id=org.id,
+            role=UserRole.CLIENTE_DEMO,
+        )
+        user_id = user.id
+    token = create_access_token(subject=user_id)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        async with TestingSessionLocal() as db:
+            first = await deps.get_user_from_token(db, token)
+            assert first.id == user_id and first.organization.name == f"Auth Org {suffix}"
+        queries_first = len(statements)
+        assert queries_first > 0
+
+        # Segundo pedido: nem validação nem consultas, e a instância pertence à nova sessão
+        async with TestingSessionLocal() as db:
+            second = await deps.get_user_from_token(db, token)
+            assert second is not first and second in db
+            assert second.organization.name == f"Auth Org {suffix}"
+        assert len(statements) == queries_first
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+
+    # Alterações pelo crud invalidam o cache
+    async with TestingSessionLocal() as db:
+        db_user = await deps.get_user_from_token(db, token)
+        await crud.user.activate_user(db, user_to_activate=db_user)
+    async with TestingSessionLocal() as db:
+        assert (await deps.get_user_from_token(db, token)).role == UserRole.CLIENTE_ATIVO
+
+    async with TestingSessionLocal() as db:
+        db_user = await deps.get_user_from_token(db, token)
+        await crud.user.update(db, db_user=db_user, user_in={"is_active": False})
+    async with TestingSessionLocal() as db:
+        assert (await deps.get_user_from_token(db, token)).is_active is False
+
+    async with TestingSessionLocal() as db:
+        await crud.user.remove(db, db_user=await deps.get_user_from_token(db, token))
+    async with TestingSessionLocal() as db:
+        assert await deps.get_user_from_token(db, token) is None
+
+    async with TestingSessionLocal() as db:
+        assert await deps.get_user_from_token(db, token[:-2] + "xx") is None
@@ -0,0 +1,110 @@
+# backend/tests/test_db_engine.py
+
+import uuid
+from datetime import date
+import pytest
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.db import session
+from app.db.session import _engine_options, pool_stats
+from app.models.demo_usage_model import DemoUsage
+
+
+def test_postgres_engine_options_come_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 7)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 3)
+    monkeypatch.setattr(settings, "DB_STATEMENT_CACHE_SIZE", 0)
+    options = _engine_options("postgresql+asyncpg://u:p@db/trucar", statement_timeout_ms=15000, read_only=True)
+    assert (options["pool_size"], options["max_overflow"]) == (7, 3)
+    assert options["pool_recycle"] == settings.DB_POOL_RECYCLE_SECONDS
+    assert options["connect_args"] == {
+        "statement_cache_size": 0,
+        "server_settings": {"statement_timeout": "15000", "default_transaction_read_only": "on"},
+    }
+    # O SQLite mantém o pool do dialeto
+    assert _engine_options("sqlite+aiosqlite:///./x.db", statement_timeout_ms=15000) == {"pool_pre_ping": True}
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_report_checked_out_connections():
+    # Mesmo tipo de pool do engine PostgreSQL
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///./test.db", poolclass=AsyncAdaptedQueuePool, pool_size=2, max_overflow=1
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            stats = pool_stats(engine)
+            assert stats["checkedout"] == 1
+        assert pool_stats(engine)["checkedout"] == 0
+        assert (stats["size"], stats["capacity"]) == (2, 3)
+    finally:
+        await engine.dispose()
+
+
+def _request(method: str, headers: dict | None = None) -> Request:
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "method": method, "path": "/", "headers": raw, "query_string": b""})
+
+
+@pytest.mark.asyncio
+async def test_get_db_routes_reads_to_the_replica_with_consistency_escape_hatches(monkeypatch, tmp_path):
+    # Primário e réplica como dois arquivos SQLite
+    primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    for target, name in ((primary, "primary"), (replica, "replica")):
+        async with target.begin() as conn:
+            await conn.execute(text("CREATE TABLE whoami (name TEXT)"))
+            await conn.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": name})
+    monkeypatch.setattr(session, "engine", primary)
+    monkeypatch.setattr(session, "replica_engine", replica)
+    monkeypatch.setattr(session, "SessionLocal", session.sessionmaker(bind=primary, class_=AsyncSession, expire_on_commit=False))
+    monkeypatch.setattr(session, "ReplicaSessionLocal", session.sessionmaker(
+        bind=replica, class_=AsyncSession, expire_on_commit=False, info={"read_only": True}
+    ))
+    token = {"Authorization": f"Bearer {uuid.uuid4().hex}"}
+
+    async def served_by(dependency, request):
+        gen = dependency(request)
+        db = await gen.__anext__()
+        try:
+            return (await db.execute(text("SELECT name FROM whoami ORDER BY rowid LIMIT 1"))).scalar_one(), db
+        finally:
+            await gen.aclose()
+
+    try:
+        assert (await served_by(session.get_db, _request("GET", token)))[0] == "replica"
+        assert (await served_by(session.get_db, _request("GET", {**token, "X-Read-Consistency": "primary"})))[0] == "primary"
+
+        # Escritas vão ao primário; a sessão de réplica recusa-as já no ORM
+        _, replica_db = await served_by(session.get_db, _request("GET", token))
+        replica_db.add(DemoUsage(organization_id=1, resource_type="reports", period=date.today(), usage_count=1))
+        with pytest.raises(InvalidRequestError):
+            await replica_db.flush()
+        await replica_db.close()
+
+        post = session.get_db(_request("POST", token))
+        db = await post.__anext__()
+        await db.execute(text("INSERT INTO whoami VALUES ('escrita')"))
+        await db.commit()
+        with pytest.raises(StopAsyncIteration):
+            await post.__anext__()
+
+        # Quem acabou de escrever lê do primário; os outros clientes continuam na réplica
+        assert (await served_by(session.get_db, _request("GET", token)))[0] == "primary"
+        other = {"Authorization": f"Bearer {uuid.uuid4().hex}"}
+        assert (await served_by(session.get_db, _request("GET", other)))[0] == "replica"
+
+        # Os caches partilhados são preenchidos no primário, mesmo num pedido servido pela réplica
+        _, replica_db = await served_by(session.get_db, _request("GET", other))
+        assert session.is_read_only(replica_db)
+        async with session.primary_session(replica_db) as source:
+            assert (await source.execute(text("SELECT name FROM whoami ORDER BY rowid LIMIT 1"))).scalar_one() == "primary"
+    finally:
+        await primary.dispose()
+        await replica.dispose()
@@ -0,0 +1,99 @@
+# backend/tests/test_demo_usage_snapshot.py
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, deps
+from app.core.config import settings
+from app.models.user_model import UserRole
+from app.schemas.vehicle_schema import VehicleCreate
+from app.services.demo_usage_snapshots import demo_usage_snapshots
+
+
+@pytest.mark.asyncio
+async def test_snapshot_follows_increments_and_invalidates_on_counted_writes(db_session: AsyncSession, create_manager):
+    # Como o SessionLocal da aplicação: o utilizador autenticado continua utilizável após o commit
+    db_session.sync_session.expire_on_commit = False
+    demo = await create_manager("Demo Org", role=UserRole.CLIENTE_DEMO)
+    org_id, manager_id, suffix = demo["organization_id"], demo["user_id"], demo["suffix"]
+    await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Fiat", model="Strada", year=2023, license_plate=f"D{suffix}"),
+        organization_id=org_id,
+    )
+
+    snapshot = await demo_usage_snapshots.get(db_session, organization_id=org_id)
+    assert snapshot.counts["vehicles"] == 1 and snapshot.counts["users"] == 1
+    assert snapshot.has_demo_manager and snapshot.usage == {}
+
+    # O incremento é aplicado ao snapshot em cache só depois do commit
+    await crud.demo_usage.increment_usage(db_session, organization_id=org_id, resource_type="reports")
+    assert (await demo_usage_snapshots.get(db_session, organization_id=org_id)).usage == {}
+    await db_session.commit()
+    cached = await demo_usage_snapshots.get(db_session, organization_id=org_id)
+    assert cached.usage == {"reports": 1} and cached.counts is snapshot.counts
+
+    # Um rollback descarta o incremento pendente
+    await crud.demo_usage.increment_usage(db_session, organization_id=org_id, resource_type="reports")
+    await db_session.rollback()
+    assert (await demo_usage_snapshots.get(db_session, organization_id=org_id)).usage == {"reports": 1}
+
+    # Criar um recurso contado descarta o snapshot, e a leitura seguinte reconta no banco
+    await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Fiat", model="Toro", year=2023, license_plate=f"E{suffix}"),
+        organization_id=org_id,
+    )
+    snapshot = await demo_usage_snapshots.get(db_session, organization_id=org_id)
+    assert snapshot.counts["vehicles"] == 2 and snapshot.usage == {"reports": 1}
+
+    manager = await crud.user.get_for_auth(db_session, id=manager_id)
+    check = deps.check_demo_limit("vehicles")
+    await check(current_user=manager, snapshot=snapshot)
+    await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Fiat", model="Uno", year=2023, license_plate=f"G{suffix}"),
+        organization_id=org_id,
+    )
+    snapshot = await demo_usage_snapshots.get(db_session, organization_id=org_id)
+    with pytest.raises(HTTPException) as exc:
+        await check(current_user=manager, snapshot=snapshot)
+    assert exc.value.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_monthly_limit_is_checked_and_consumed_in_one_statement(db_session: AsyncSession, create_manager):
+    db_session.sync_session.expire_on_commit = False
+    demo = await create_manager("Quota Org", role=UserRole.CLIENTE_DEMO)
+    org_id, manager_id = demo["organization_id"], demo["user_id"]
+    manager = await crud.user.get_for_auth(db_session, id=manager_id)
+
+    consumed = [
+        await crud.demo_usage.increment_usage(db_session, organization_id=org_id, resource_type="fines", limit=2)
+        for _ in range(3)
+    ]
+    assert consumed == [1, 2, None]
+    await db_session.commit()
+    assert await crud.demo_usage.get_usage(db_session, organization_id=org_id, resource_type="fines") == 2
+
+    # A guarda consome a cota antes da rota; uma rota que falha devolve-a
+    limit = settings.DEMO_MONTHLY_LIMITS["reports"]
+    guard = deps.check_demo_limit("reports")
+    failing = guard(db=db_session, current_user=manager)
+    await failing.__anext__()
+    with pytest.raises(RuntimeError):
+        await failing.athrow(RuntimeError("rota falhou"))
+    await db_session.rollback()
+    assert await crud.demo_usage.get_usage(db_session, organization_id=org_id, resource_type="reports") == 0
+    manager = await crud.user.get_for_auth(db_session, id=manager_id)
+
+    for _ in range(limit):
+        succeeding = guard(db=db_session, current_user=manager)
+        await succeeding.__anext__()
+        with pytest.raises(StopAsyncIteration):
+            await succeeding.__anext__()
+    assert await crud.demo_usage.get_usage(db_session, organization_id=org_id, resource_type="reports") == limit
+    with pytest.raises(HTTPException) as exc:
+        await guard(db=db_session, current_user=manager).__anext__()
+    assert exc.value.status_code == 403
@@ -0,0 +1,81 @@
+# backend/tests/test_fuel_card_import.py
+
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud.crud_fuel_log import haversine_km
+from app.models.fuel_log_model import FuelLog, VerificationStatus
+from app.models.user_model import UserRole
+from app.models.vehicle_model import Vehicle
+from app.schemas.fuel_log_schema import FuelProviderTransaction
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.vehicle_schema import VehicleCreate
+
+
+def test_haversine_matches_known_distances():
+    # São Paulo -> Rio de Janeiro (~361 km) e o mesmo ponto
+    distances = haversine_km([-23.5505, -22.9068], [-46.6333, -43.1729], [-22.9068, -22.9068], [-43.1729, -43.1729])
+    assert 355 < distances[0] < 365
+    assert distances[1] == 0
+
+
+@pytest.mark.asyncio
+async def test_provider_batch_import_resolves_in_bulk_and_skips_known_transactions(db_session: AsyncSession):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Card Org {suffix}", sector="frete"))
+    org_id = org.id
+    plates = []
+    for plate, position in (("L", (-21.1767, -47.8208)), ("N", (None, None))):
+        vehicle = await crud.vehicle.create_with_owner(
+            db_session,
+            obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"{plate}{suffix}", current_km=5000),
+            organization_id=org_id,
+        )
+        vehicle_id = vehicle.id
+        db_vehicle = await db_session.get(Vehicle, vehicle_id)
+        db_vehicle.last_latitude, db_vehicle.last_longitude = position
+        await db_session.commit()
+        plates.append(f"{plate}{suffix}")
+    driver = await crud.user.create(
+        db_session,
+        user_in=UserCreate(full_name="Caio", email=f"caio-{suffix.lower()}@test.com", password="password"),
+        organization_id=org_id,
+        role=UserRole.DRIVER,
+    )
+    employee_id = driver.employee_id
+
+    def tx(tx_id: str, plate: str, lat: float, lon: float, employee: str = employee_id):
+        return FuelProviderTransaction(
+            transaction_id=f"{tx_id}-{suffix}", vehicle_license_plate=plate, driver_employee_id=employee,
+            timestamp=datetime.utcnow() - timedelta(hours=1), liters=40.0, total_cost=240.0,
+            gas_station_name="Posto", gas_station_latitude=lat, gas_station_longitude=lon,
+        )
+
+    transactions = [
+        tx("near", plates[0], -21.1770, -47.8210),
+        tx("far", plates[0], -23.5505, -46.6333),
+        tx("no-position", plates[1], -23.5505, -46.6333),
+        tx("near", plates[0], -21.1770, -47.8210),   # repetida na resposta do provedor
+        tx("unknown-plate", "ZZZ0000", -21.1770, -47.8210),
+        tx("unknown-driver", plates[0], -21.1770, -47.8210, employee="NAO-EXISTE"),
+    ]
+    result = await crud.fuel_log.process_provider_transactions(db_session, transactions=transactions, organization_id=org_id)
+    assert result == {"new_logs_processed": 3}
+
+    statuses = dict((await db_session.execute(
+        select(FuelLog.provider_transaction_id, FuelLog.verification_status).where(FuelLog.organization_id == org_id)
+    )).all())
+    assert statuses == {
+        f"near-{suffix}": VerificationStatus.VERIFIED,
+        f"far-{suffix}": VerificationStatus.SUSPICIOUS,
+        f"no-position-{suffix}": VerificationStatus.UNVERIFIED,
+    }
+
+    # Reimportar o mesmo lote não duplica nada
+    again = await crud.fuel_log.process_provider_transactions(db_session, transactions=transactions, organization_id=org_id)
+    assert again == {"new_logs_processed": 0}
@@ -0,0 +1,81 @@
+# backend/tests/test_fuel_consumption.py
+
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud import crud_fuel_log
+from app.models.fuel_baseline_model import VehicleFuelBaseline
+from app.models.fuel_log_model import FuelLog
+from app.models.user_model import UserRole
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.vehicle_schema import VehicleCreate
+from app.services.fuel_anomalies import rescore_organization
+
+
+@pytest.mark.asyncio
+async def test_incremental_baseline_matches_the_fleet_rescoring(db_session: AsyncSession):
+    # Como o SessionLocal da aplicação: o endpoint usa o abastecimento e o veículo após o commit
+    db_session.sync_session.expire_on_commit = False
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Fuel Org {suffix}", sector="frete"))
+    org_id = org.id
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Scania", model="R450", year=2021, license_plate=f"F{suffix}"),
+        organization_id=org_id,
+    )
+    vehicle_id = vehicle.id
+    driver = await crud.user.create(
+        db_session,
+        user_in=UserCreate(full_name="Fábio", email=f"fabio-{suffix.lower()}@test.com", password="password"),
+        organization_id=org_id,
+        role=UserRole.DRIVER,
+    )
+    driver_id = driver.id
+
+    start = datetime.utcnow() - timedelta(days=10)
+
+    async def add_log(day: int, odometer: int, liters: float = 40.0):
+        log = FuelLog(odometer=odometer, liters=liters, total_cost=liters * 6, vehicle_id=vehicle_id, user_id=driver_id,
+                      organization_id=org_id, timestamp=start + timedelta(days=day))
+        db_session.add(log)
+        await db_session.commit()
+        result = await crud.fuel_log.check_abnormal_consumption(db_session, fuel_log=log, vehicle=vehicle)
+        # Como a rota: a avaliação não confirma a transação
+        await db_session.commit()
+        return log.id, result
+
+    # 10 km/l, 10 km/l e depois 5 km/l (abaixo de 75% da média)
+    assert (await add_log(0, 1000))[1] == (False, "")
+    assert (await add_log(1, 1400))[1] == (False, "")
+    assert (await add_log(2, 1800))[1] == (False, "")
+    abnormal_id, (is_abnormal, message) = await add_log(3, 2000)
+    assert is_abnormal and "5.00 km/l (Média: 10.00 km/l)" in message
+
+    baseline = await db_session.get(VehicleFuelBaseline, vehicle_id)
+    incremental = (baseline.samples, round(baseline.mean_km_per_liter, 6), round(baseline.m2, 6), baseline.last_odometer)
+    assert incremental[:2] == (3, round(25 / 3, 6)) and incremental[3] == 2000
+
+    # Sem base (ex.: após uma edição) o histórico é recalculado antes de somar o novo abastecimento
+    await crud.fuel_log.invalidate_baselines(db_session, vehicle_ids=[vehicle_id])
+    await db_session.commit()
+    db_session.expunge(baseline)
+    assert (await add_log(4, 2400))[1] == (False, "")
+    baseline = await db_session.get(VehicleFuelBaseline, vehicle_id)
+    incremental = (baseline.samples, round(baseline.mean_km_per_liter, 6), round(baseline.m2, 6))
+    assert incremental[:2] == (4, round(35 / 4, 6))
+    db_session.expunge(baseline)
+
+    result = await rescore_organization(db_session, organization_id=org_id)
+    assert result["fuel_logs"] == 5 and result["vehicles"] == 1
+    assert [a["fuel_log_id"] for a in result["anomalies"]] == [abnormal_id]
+    rebuilt = await db_session.get(VehicleFuelBaseline, vehicle_id)
+    assert (rebuilt.samples, round(rebuilt.mean_km_per_liter, 6), round(rebuilt.m2, 6)) == incremental
+    assert rebuilt.last_odometer == 2400
+
+    # Uma semeadura concorrente (a base já existe) não falha com chave duplicada
+    assert await crud_fuel_log._seed_baseline(db_session, vehicle=vehicle, exclude_log_id=None) is False
@@ -0,0 +1,66 @@
+# backend/tests/test_geofence_index.py
+
+from datetime import datetime
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+from shapely.strtree import STRtree
+
+from app.core.config import settings
+from app.services.geofence_service import GeofenceIndex, GeofenceService, IndexedZone
+
+
+def _build_index(*zones: IndexedZone) -> GeofenceIndex:
+    index = GeofenceIndex()
+    for zone in zones:
+        shapely.prepare(zone.polygon)
+    index._zones = list(zones)
+    index._tree = STRtree([z.polygon for z in zones])
+    return index
+
+
+def test_evaluate_returns_enter_and_exit_transitions_for_a_batch():
+    garage = IndexedZone(id=1, name="Garagem", type="SAFE_ZONE", polygon=Polygon([(0, 0), (0, 1), (1, 1), (1, 0)]))
+    risk = IndexedZone(id=2, name="Risco", type="RISK_ZONE", polygon=Polygon([(5, 5), (5, 6), (6, 6), (6, 5)]))
+    index = _build_index(garage, risk)
+
+    lats = np.array([0.5, 0.5, 2.0, 5.5, 5.5])
+    lons = np.array([0.5, 0.6, 2.0, 5.5, 5.6])
+    transitions, current = index.evaluate(lats, lons, previous_zone_ids={1})
+
+    assert [(t.zone_id, t.event, t.point_index) for t in transitions] == [(1, "EXIT", 2), (2, "ENTER", 3)]
+    assert current == {2}
+
+
+def test_evaluate_exits_previous_zone_outside_the_batch_bbox():
+    garage = IndexedZone(id=1, name="Garagem", type="SAFE_ZONE", polygon=Polygon([(0, 0), (0, 1), (1, 1), (1, 0)]))
+    index = _build_index(garage)
+
+    transitions, current = index.evaluate(np.array([10.0]), np.array([10.0]), previous_zone_ids={1})
+
+    assert [(t.zone_id, t.event) for t in transitions] == [(1, "EXIT")]
+    assert current == set()
+
+
+def test_evaluate_without_previous_state_treats_vehicle_as_outside():
+    risk = IndexedZone(id=2, name="Risco", type="RISK_ZONE", polygon=Polygon([(5, 5), (5, 6), (6, 6), (6, 5)]))
+    index = _build_index(risk)
+
+    # Sem estado (veículo novo, estado expirado), o primeiro ponto na zona gera ENTER
+    transitions, current = index.evaluate(np.array([5.5, 5.5]), np.array([5.5, 5.5]), previous_zone_ids=None)
+
+    assert [(t.zone_id, t.event, t.point_index) for t in transitions] == [(2, "ENTER", 0)]
+    assert current == {2}
+
+    # Com o estado gravado, o caminhão parado dentro da zona não repete o ENTER
+    transitions, current = index.evaluate(np.array([5.5]), np.array([5.5]), previous_zone_ids=current)
+    assert transitions == []
+    assert current == {2}
+
+
+def test_night_window_uses_configured_timezone(monkeypatch):
+    monkeypatch.setattr(settings, "GEOFENCE_NIGHT_TIMEZONE", "America/Sao_Paulo")
+    # 02:00 UTC = 23:00 em São Paulo (noite); 12:00 UTC = 09:00 (dia)
+    assert GeofenceService._is_night(datetime(2024, 5, 10, 2, 0))
+    assert not GeofenceService._is_night(datetime(2024, 5, 10, 12, 0))
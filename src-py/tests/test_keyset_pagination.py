@@ -0,0 +1,67 @@
+# backend/tests/test_keyset_pagination.py
+
+from datetime import datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud.base import InvalidCursorError, decode_cursor, encode_cursor
+from app.models.fuel_log_model import FuelLog
+from app.schemas.vehicle_schema import VehicleCreate
+
+
+def test_cursor_round_trips_dates_and_rejects_garbage():
+    values = [datetime(2025, 1, 2, 3, 4, 5), "Volvo", 42]
+    assert decode_cursor(encode_cursor(values)) == values
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("não-é-um-cursor")
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_every_row_once_in_order(client: AsyncClient, db_session: AsyncSession, create_manager):
+    manager = await create_manager("Keyset Org")
+    org_id, user_id, suffix = manager["organization_id"], manager["user_id"], manager["suffix"]
+    vehicle_ids = []
+    for i, brand in enumerate(["Volvo", "Scania", "Volvo", "DAF", "Volvo"]):
+        vehicle = await crud.vehicle.create_with_owner(
+            db_session,
+            obj_in=VehicleCreate(brand=brand, model="X", year=2022, license_plate=f"K{suffix}{i}"),
+            organization_id=org_id,
+        )
+        vehicle_ids.append(vehicle.id)
+    now = datetime.utcnow()
+    # Dois abastecimentos no mesmo instante: o id desempata
+    db_session.add_all([
+        FuelLog(odometer=100 + i, liters=10.0, total_cost=60.0, vehicle_id=vehicle_ids[0], user_id=user_id,
+                organization_id=org_id, timestamp=now - timedelta(hours=i // 2))
+        for i in range(5)
+    ])
+    await db_session.commit()
+
+    expected = await crud.fuel_log.get_multi_by_org(db_session, organization_id=org_id, limit=100)
+    seen, cursor = [], None
+    while True:
+        page = await crud.fuel_log.get_page_by_org(db_session, organization_id=org_id, cursor=cursor, limit=2)
+        seen.extend(log.id for log in page.items)
+        if not page.next_cursor:
+            break
+        cursor = page.next_cursor
+    assert sorted(seen) == sorted(log.id for log in expected)
+    assert len(seen) == len(set(seen)) == 5
+
+    headers = manager["headers"]
+    plates, cursor = [], None
+    while True:
+        params = {"rowsPerPage": 2, "include_total": "false", **({"cursor": cursor} if cursor else {})}
+        body = (await client.get("/vehicles/", params=params, headers=headers)).json()
+        assert body["total_items"] is None
+        plates.extend((v["brand"], v["license_plate"]) for v in body["vehicles"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+    assert [brand for brand, _ in plates] == ["DAF", "Scania", "Volvo", "Volvo", "Volvo"]
+    assert len(set(plates)) == 5
+
+    invalid = await client.get("/vehicles/", params={"cursor": "xyz"}, headers=headers)
+    assert invalid.status_code == 400
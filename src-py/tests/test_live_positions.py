@@ -0,0 +1,32 @@
+# backend/tests/test_live_positions.py
+
+from datetime import datetime
+import pytest
+
+from app.schemas.dashboard_schema import VehiclePositionDelta
+from app.services.live_positions import LivePositionHub
+
+
+def _delta(vehicle_id: int, lat: float, status: str | None = None) -> VehiclePositionDelta:
+    return VehiclePositionDelta(id=vehicle_id, latitude=lat, longitude=-46.6, status=status, timestamp=datetime.utcnow())
+
+
+@pytest.mark.asyncio
+async def test_hub_pushes_only_changes_to_the_organization_subscribers():
+    hub = LivePositionHub()
+    manager = hub.subscribe(organization_id=1)
+    other_org = hub.subscribe(organization_id=2)
+
+    await hub.publish(1, _delta(10, -23.50, "Em uso"))
+    await hub.publish(1, _delta(10, -23.50, "Em uso"))  # sem mudança, não é publicado
+    await hub.publish(1, _delta(10, -23.51, "Em uso"))  # coalescido com o anterior
+    await hub.publish(1, _delta(11, -22.90))
+
+    batch = await manager.next_batch()
+    assert {(d.id, d.latitude) for d in batch} == {(10, -23.51), (11, -22.90)}
+    assert hub.unchanged == 1
+    assert other_org._pending == {}
+
+    hub.unsubscribe(manager)
+    hub.unsubscribe(other_org)
+    assert hub.stats()["subscribers"] == 0
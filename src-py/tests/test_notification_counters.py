@@ -0,0 +1,68 @@
+# backend/tests/test_notification_counters.py
+
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.models.notification_model import Notification, NotificationType
+from app.services.notification_counters import unread_counters
+
+
+@pytest.mark.asyncio
+async def test_unread_counter_follows_creates_and_reads_without_counting(db_session: AsyncSession, create_manager):
+    manager = await create_manager("Counter Org")
+    org_id, user_id = manager["organization_id"], manager["user_id"]
+
+    async def unread():
+        return await crud.notification.get_unread_notifications_count(db_session, user_id=user_id, organization_id=org_id)
+
+    async def unread_in_db():
+        return (await db_session.execute(select(func.count(Notification.id)).where(
+            Notification.user_id == user_id, Notification.is_read == False
+        ))).scalar_one()
+
+    assert await unread() == 0
+    for i in range(3):
+        await crud.notification.create_notification(
+            db_session, message=f"Alerta {i}", notification_type=NotificationType.LOW_STOCK,
+            organization_id=org_id, user_id=user_id,
+        )
+    hits = unread_counters.hits
+    assert await unread() == 3 == await unread_in_db()
+    assert unread_counters.hits == hits + 1
+
+    first_id = (await db_session.execute(
+        select(Notification.id).where(Notification.user_id == user_id).order_by(Notification.id)
+    )).scalars().first()
+    await crud.notification.mark_notification_as_read(db_session, notification_id=first_id, user_id=user_id, organization_id=org_id)
+    # Marcar de novo a mesma notificação não desconta outra vez
+    await crud.notification.mark_notification_as_read(db_session, notification_id=first_id, user_id=user_id, organization_id=org_id)
+    assert await unread() == 2 == await unread_in_db()
+
+    assert await crud.notification.mark_all_notifications_as_read(db_session, user_id=user_id, organization_id=org_id) == 2
+    assert await unread() == 0 == await unread_in_db()
+
+    # Sem contador em cache (ex.: expirado) a leitura reconcilia com o banco
+    await crud.notification.create_notification(
+        db_session, message="Alerta final", notification_type=NotificationType.LOW_STOCK,
+        organization_id=org_id, user_id=user_id,
+    )
+    await unread_counters.delete(org_id, user_id)
+    assert await unread() == 1
+
+
+@pytest.mark.asyncio
+async def test_recount_is_discarded_when_a_notification_arrives_meanwhile():
+    org_id, user_id = 999_001, 999_002
+    await unread_counters.delete(org_id, user_id)
+
+    # COUNT iniciado (2 não lidas), uma notificação é criada e só depois o resultado chega
+    token = await unread_counters.begin_load(org_id, user_id)
+    await unread_counters.incr(org_id, user_id, 1)
+    await unread_counters.fill(org_id, user_id, token, 2)
+    assert await unread_counters.get(org_id, user_id) is None
+
+    token = await unread_counters.begin_load(org_id, user_id)
+    await unread_counters.fill(org_id, user_id, token, 3)
+    assert await unread_counters.get(org_id, user_id) == 3
@@ -0,0 +1,63 @@
+# backend/tests/test_notification_dispatcher.py
+
+import uuid
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud import crud_notification
+from app.models.notification_model import Notification, NotificationType
+from app.models.user_model import UserRole
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.vehicle_schema import VehicleCreate
+
+
+@pytest.mark.asyncio
+async def test_system_checks_insert_each_alert_once_per_day_and_batch_emails(db_session: AsyncSession, monkeypatch):
+    sent_emails = []
+    monkeypatch.setattr(crud_notification.send_email_async, "delay", lambda **kwargs: sent_emails.append(kwargs))
+    monkeypatch.setattr(crud_notification.settings, "SYSTEM_CHECK_EMAILS_ENABLED", True)
+    monkeypatch.setattr(crud_notification.settings, "NOTIFICATION_EMAIL_BATCH_SIZE", 1)
+
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Alert Org {suffix}", sector="frete"))
+    org_id = org.id
+    manager_emails = set()
+    for name in ("ana", "bia"):
+        email = f"{name}-{suffix.lower()}@test.com"
+        await crud.user.create(
+            db_session,
+            user_in=UserCreate(full_name=name, email=email, password="password"),
+            organization_id=org_id,
+            role=UserRole.CLIENTE_ATIVO,
+        )
+        manager_emails.add(email)
+    for plate, km in (("A", 9800), ("B", 1000)):
+        await crud.vehicle.create_with_owner(
+            db_session,
+            obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"{plate}{suffix}",
+                                 current_km=km, next_maintenance_km=10000,
+                                 next_maintenance_date=date.today() + timedelta(days=3)),
+            organization_id=org_id,
+        )
+
+    # 2 veículos com data próxima + 1 com km próximo, para 2 gestores
+    created = await crud.notification.run_system_checks_for_organization(db_session, organization_id=org_id)
+    assert created == 6
+    # Uma mensagem com o mesmo conteúdo para os dois gestores, um destinatário por envio
+    assert sorted(e["to_emails"][0] for e in sent_emails) == sorted(manager_emails)
+    assert all(e["subject"] == "TruCar: 3 novo(s) alerta(s)" for e in sent_emails)
+
+    # Segunda execução no mesmo dia: nada novo, nenhum e-mail
+    sent_emails.clear()
+    assert await crud.notification.run_system_checks_for_organization(db_session, organization_id=org_id) == 0
+    assert sent_emails == []
+
+    rows = (await db_session.execute(
+        select(Notification.notification_type).where(Notification.organization_id == org_id)
+    )).scalars().all()
+    assert len(rows) == 6
+    assert rows.count(NotificationType.MAINTENANCE_DUE_KM) == 2
@@ -0,0 +1,58 @@
+# backend/tests/test_position_buffer.py
+
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud.crud_vehicle import VehicleRef
+from app.models.vehicle_model import Vehicle, VehicleStatus
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.vehicle_schema import VehicleCreate
+from app.services.dashboard_cache import dashboard_cache
+from app.services.position_buffer import VehiclePositionBuffer
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_buffer_coalesces_pings_and_flushes_latest_position(db_session: AsyncSession):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Buffer Org {suffix}", sector="frete"))
+    org_id = org.id
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Scania", model="R450", year=2021, license_plate=f"B{suffix}"),
+        organization_id=org_id,
+    )
+    ref = VehicleRef(id=vehicle.id, organization_id=org_id)
+
+    # Intervalo longo: o flush só acontece quando chamado explicitamente
+    buffer = VehiclePositionBuffer(flush_interval_ms=3_600_000, session_factory=TestingSessionLocal)
+    buffer.start()
+    try:
+        now = datetime.utcnow()
+        await buffer.submit(db_session, vehicle=ref, latitude=-23.50, longitude=-46.60, recorded_at=now)
+        await buffer.submit(
+            db_session, vehicle=ref, latitude=-23.51, longitude=-46.61, status=VehicleStatus.IN_USE, recorded_at=now + timedelta(seconds=5)
+        )
+        # Ponto atrasado de um lote offline não recua a posição
+        await buffer.submit(db_session, vehicle=ref, latitude=-23.40, longitude=-46.50, recorded_at=now - timedelta(minutes=1))
+
+        pending = buffer.pending_for_org(org_id)
+        assert pending[ref.id].latitude == -23.51
+        assert buffer.coalesced == 2
+
+        # O UPDATE em lote muda o status: invalida o dashboard da organização
+        version = await dashboard_cache.data_version(org_id)
+        assert await buffer.flush() == 1
+        assert buffer.pending_for_org(org_id) == {}
+        assert await dashboard_cache.data_version(org_id) != version
+    finally:
+        await buffer.stop()
+
+    row = (await db_session.execute(
+        select(Vehicle.last_latitude, Vehicle.last_longitude, Vehicle.status).where(Vehicle.id == ref.id)
+    )).one()
+    assert (row.last_latitude, row.last_longitude, row.status) == (-23.51, -46.61, VehicleStatus.IN_USE)
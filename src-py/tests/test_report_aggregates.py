@@ -0,0 +1,113 @@
+# backend/tests/test_report_aggregates.py
+
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.models.fuel_log_model import FuelLog
+from app.models.journey_model import Journey
+from app.models.user_model import UserRole
+from app.models.vehicle_cost_model import VehicleCost, CostType
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.vehicle_schema import VehicleCreate
+
+
+@pytest.mark.asyncio
+async def test_driver_performance_report_aggregates_all_drivers_at_once(db_session: AsyncSession):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Drivers Org {suffix}", sector="frete"))
+    org_id = org.id
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"P{suffix}"),
+        organization_id=org_id,
+    )
+    vehicle_id = vehicle.id
+    driver_ids = []
+    for name in ("Ana", "Bruno"):
+        driver = await crud.user.create(
+            db_session,
+            user_in=UserCreate(full_name=name, email=f"{name.lower()}-{suffix.lower()}@test.com", password="password"),
+            organization_id=org_id,
+            role=UserRole.DRIVER,
+        )
+        driver_ids.append(driver.id)
+
+    now = datetime.utcnow()
+    db_session.add_all([
+        Journey(trip_type="FREE_ROAM", start_time=now - timedelta(days=2), start_mileage=1000, end_mileage=1300,
+                is_active=False, vehicle_id=vehicle_id, driver_id=driver_ids[0], organization_id=org_id),
+        Journey(trip_type="FREE_ROAM", start_time=now - timedelta(days=1), start_mileage=1300, end_mileage=1400,
+                is_active=False, vehicle_id=vehicle_id, driver_id=driver_ids[0], organization_id=org_id),
+        # Fora do período
+        Journey(trip_type="FREE_ROAM", start_time=now - timedelta(days=90), start_mileage=500, end_mileage=900,
+                is_active=False, vehicle_id=vehicle_id, driver_id=driver_ids[0], organization_id=org_id),
+        FuelLog(odometer=1300, liters=40.0, total_cost=240.0, vehicle_id=vehicle_id, user_id=driver_ids[0],
+                organization_id=org_id, timestamp=now - timedelta(days=1)),
+    ])
+    await db_session.commit()
+
+    report = await crud.report.get_driver_performance_data(
+        db_session, start_date=(now - timedelta(days=30)).date(), end_date=now.date(), organization_id=org_id
+    )
+
+    entries = {e.driver_id: e for e in report.drivers_performance}
+    assert set(entries) == set(driver_ids)
+    ana, bruno = entries[driver_ids[0]], entries[driver_ids[1]]
+    assert (ana.total_journeys, ana.total_distance_km, ana.total_fuel_liters) == (2, 400.0, 40.0)
+    assert ana.average_consumption == 10.0
+    assert ana.cost_per_km == 0.6
+    assert (bruno.total_journeys, bruno.total_distance_km, bruno.cost_per_km) == (0, 0.0, 0)
+
+    stats = await crud.user.get_user_stats(db_session, user_id=driver_ids[0], organization_id=org_id)
+    assert stats["total_journeys"] == 3
+    assert stats["primary_metric_value"] == 800.0
+
+
+@pytest.mark.asyncio
+async def test_fleet_management_report_aggregates_per_vehicle_in_sql(db_session: AsyncSession):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Fleet Org {suffix}", sector="frete"))
+    org_id = org.id
+    driver = await crud.user.create(
+        db_session,
+        user_in=UserCreate(full_name="Carla", email=f"carla-{suffix.lower()}@test.com", password="password"),
+        organization_id=org_id,
+        role=UserRole.DRIVER,
+    )
+    driver_id = driver.id
+    vehicle_ids = []
+    for i in range(2):
+        vehicle = await crud.vehicle.create_with_owner(
+            db_session,
+            obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"F{suffix}{i}"),
+            organization_id=org_id,
+        )
+        vehicle_ids.append(vehicle.id)
+
+    now = datetime.utcnow()
+    db_session.add_all([
+        FuelLog(odometer=1000, liters=50.0, total_cost=300.0, vehicle_id=vehicle_ids[0], user_id=driver_id,
+                organization_id=org_id, timestamp=now - timedelta(days=3)),
+        FuelLog(odometer=1500, liters=50.0, total_cost=300.0, vehicle_id=vehicle_ids[0], user_id=driver_id,
+                organization_id=org_id, timestamp=now - timedelta(days=1)),
+        VehicleCost(description="Pneu", amount=1000.0, date=now.date(), cost_type=CostType.PNEU,
+                    vehicle_id=vehicle_ids[0], organization_id=org_id),
+        VehicleCost(description="Seguro", amount=200.0, date=now.date(), cost_type=CostType.SEGURO,
+                    vehicle_id=vehicle_ids[1], organization_id=org_id),
+    ])
+    await db_session.commit()
+
+    report = await crud.report.get_fleet_management_data(
+        db_session, start_date=(now - timedelta(days=30)).date(), end_date=now.date(), organization_id=org_id
+    )
+
+    assert report.summary.total_cost == 1200.0
+    assert report.summary.total_distance_km == 500.0
+    assert report.costs_by_category == {CostType.PNEU.value: 1000.0, CostType.SEGURO.value: 200.0}
+    assert [v.vehicle_id for v in report.top_5_most_expensive_vehicles] == vehicle_ids
+    assert report.top_5_most_efficient_vehicles[0].value == 5.0
+    assert report.top_5_highest_cost_per_km_vehicles[0].value == 2.0
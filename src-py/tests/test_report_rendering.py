@@ -0,0 +1,82 @@
+# backend/tests/test_report_rendering.py
+
+import uuid
+from datetime import date, datetime
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.crud import crud_report
+from app.models.user_model import UserRole
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.report_generator_schema import ReportRequest
+from app.services import report_rendering
+from app.services.dashboard_cache import UncachedDashboardCacheBackend, dashboard_cache
+
+
+@pytest.mark.asyncio
+async def test_report_html_is_reused_until_the_organization_data_changes(monkeypatch):
+    calls = []
+
+    async def fake_activity_data(db, *, driver_id, organization_id, date_from, date_to):
+        calls.append(driver_id)
+        return {
+            "driver_name": "Ana", "date_from": "01/01/2025", "date_to": "31/01/2025", "year": 2025,
+            "journeys": [], "fuel_logs": [],
+            "summary": {"total_journeys": len(calls), "total_km": 0, "total_fuel_cost": 0},
+        }
+
+    monkeypatch.setattr(crud_report, "get_driver_activity_data", fake_activity_data)
+    organization_id = int(datetime.utcnow().timestamp() * 1000)  # organização sem entradas no cache
+    db = AsyncSession()  # os dados vêm do crud falso: a sessão só indica primário/réplica
+    request = ReportRequest(report_type="activity_by_driver", date_from=date(2025, 1, 1), date_to=date(2025, 1, 31), target_id=7)
+
+    first = await report_rendering.build_report_html(db, report_request=request, organization_id=organization_id)
+    second = await report_rendering.build_report_html(db, report_request=request, organization_id=organization_id)
+    assert first == second
+    assert first[1] == "relatorio_motorista_7.pdf"
+    assert "Ana" in first[0]
+    assert calls == [7]
+
+    dashboard_cache.invalidate(organization_id)
+    third = await report_rendering.build_report_html(db, report_request=request, organization_id=organization_id)
+    assert calls == [7, 7]
+    assert third != first
+
+    # O que é lido na réplica não entra no cache
+    replica_db = AsyncSession(info={"read_only": True})
+    other = request.model_copy(update={"target_id": 8})
+    await report_rendering.build_report_html(replica_db, report_request=other, organization_id=organization_id)
+    await report_rendering.build_report_html(replica_db, report_request=other, organization_id=organization_id)
+    assert calls == [7, 7, 8, 8]
+
+    # Com o cache do dashboard desligado (vários workers) a versão não é confiável
+    monkeypatch.setattr(dashboard_cache, "backend", UncachedDashboardCacheBackend())
+    await report_rendering.build_report_html(db, report_request=request, organization_id=organization_id)
+    await report_rendering.build_report_html(db, report_request=request, organization_id=organization_id)
+    assert calls == [7, 7, 8, 8, 7, 7]
+
+
+@pytest.mark.asyncio
+async def test_renaming_a_driver_changes_the_report_data_version(db_session: AsyncSession):
+    db_session.sync_session.expire_on_commit = False
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Report Org {suffix}", sector="frete"))
+    org_id = org.id
+    driver = await crud.user.create(
+        db_session,
+        user_in=UserCreate(full_name="Ana", email=f"ana-{suffix.lower()}@test.com", password="password"),
+        organization_id=org_id,
+        role=UserRole.DRIVER,
+    )
+
+    # Campos que não aparecem nos relatórios não invalidam o HTML em cache
+    version = await dashboard_cache.data_version(org_id)
+    driver.notify_by_email = False
+    await db_session.commit()
+    assert await dashboard_cache.data_version(org_id) == version
+
+    driver.full_name = "Ana Souza"
+    await db_session.commit()
+    assert await dashboard_cache.data_version(org_id) != version
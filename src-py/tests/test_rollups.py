@@ -0,0 +1,91 @@
+# backend/tests/test_rollups.py
+
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.models.fuel_log_model import FuelLog
+from app.models.journey_model import Journey
+from app.models.rollup_model import DailyCostRollup
+from app.models.user_model import UserRole
+from app.models.vehicle_cost_model import VehicleCost, CostType
+from app.schemas.organization_schema import OrganizationCreate
+from app.schemas.user_schema import UserCreate
+from app.schemas.vehicle_schema import VehicleCreate
+
+
+@pytest.mark.asyncio
+async def test_reports_read_the_same_totals_from_rollups_and_stay_current(db_session: AsyncSession):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"Rollup Org {suffix}", sector="frete"))
+    org_id = org.id
+    vehicle = await crud.vehicle.create_with_owner(
+        db_session,
+        obj_in=VehicleCreate(brand="Volvo", model="FH", year=2022, license_plate=f"R{suffix}"),
+        organization_id=org_id,
+    )
+    vehicle_id = vehicle.id
+    driver = await crud.user.create(
+        db_session,
+        user_in=UserCreate(full_name="Rui", email=f"rui-{suffix.lower()}@test.com", password="password"),
+        organization_id=org_id,
+        role=UserRole.DRIVER,
+    )
+    driver_id = driver.id
+
+    now = datetime.utcnow()
+    fuel_log = FuelLog(odometer=1300, liters=40.0, total_cost=240.0, vehicle_id=vehicle_id, user_id=driver_id,
+                       organization_id=org_id, timestamp=now - timedelta(days=1))
+    db_session.add_all([
+        Journey(trip_type="FREE_ROAM", start_time=now - timedelta(days=2), start_mileage=1000, end_mileage=1300,
+                is_active=False, vehicle_id=vehicle_id, driver_id=driver_id, organization_id=org_id),
+        Journey(trip_type="FREE_ROAM", start_time=now - timedelta(days=1), start_mileage=1300, end_mileage=1400,
+                is_active=False, vehicle_id=vehicle_id, driver_id=driver_id, organization_id=org_id),
+        # Em andamento: não entra nos resumos
+        Journey(trip_type="FREE_ROAM", start_time=now, start_mileage=1400, is_active=True,
+                vehicle_id=vehicle_id, driver_id=driver_id, organization_id=org_id),
+        fuel_log,
+        VehicleCost(description="Diesel", amount=240.0, date=(now - timedelta(days=1)).date(),
+                    cost_type=CostType.COMBUSTIVEL, vehicle_id=vehicle_id, organization_id=org_id),
+        VehicleCost(description="Pneu", amount=900.0, date=(now - timedelta(days=3)).date(),
+                    cost_type=CostType.PNEU, vehicle_id=vehicle_id, organization_id=org_id),
+    ])
+    await db_session.commit()
+
+    start_date = (now - timedelta(days=30)).date()
+
+    async def snapshot():
+        return (
+            [(r.date, r.total_km) for r in await crud.report.get_distance_per_day(db_session, organization_id=org_id, start_date=start_date)],
+            await crud.report.get_costs_by_category_last_30_days(db_session, organization_id=org_id, start_date=start_date),
+            (await crud.report.get_dashboard_totals(db_session, organization_id=org_id, start_date=start_date))["total_liters"],
+            await crud.report.get_total_costs(db_session, organization_id=org_id, start_date=start_date),
+        )
+
+    raw = await snapshot()
+    assert not await crud.rollup.covers(db_session, organization_id=org_id, start_date=start_date)
+
+    await crud.rollup.backfill(db_session, organization_id=org_id, start=start_date - timedelta(days=30), end=now.date())
+    assert await crud.rollup.covers(db_session, organization_id=org_id, start_date=start_date)
+    distance, costs, liters, total_costs = await snapshot()
+    assert [str(d) for d, _ in distance] == [str(d) for d, _ in raw[0]]
+    assert [km for _, km in distance] == [km for _, km in raw[0]] == [300, 100]
+    assert (costs, liters, total_costs) == raw[1:]
+    assert total_costs == 1140.0
+
+    # Escritas seguintes atualizam os resumos na mesma transação
+    db_session.add(VehicleCost(description="Pedágio", amount=60.0, date=now.date(), cost_type=CostType.PEDAGIO,
+                               vehicle_id=vehicle_id, organization_id=org_id))
+    await db_session.delete(fuel_log)
+    await db_session.commit()
+
+    rows = (await db_session.execute(
+        select(DailyCostRollup.cost_type, DailyCostRollup.amount).where(DailyCostRollup.organization_id == org_id)
+    )).all()
+    assert sorted(rows) == sorted([(CostType.COMBUSTIVEL, 240.0), (CostType.PNEU, 900.0), (CostType.PEDAGIO, 60.0)])
+    assert await crud.report.get_total_costs(db_session, organization_id=org_id, start_date=start_date) == 1200.0
+    totals = await crud.report.get_dashboard_totals(db_session, organization_id=org_id, start_date=start_date)
+    assert totals["total_liters"] == 0.0
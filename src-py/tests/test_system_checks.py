@@ -0,0 +1,77 @@
+# backend/tests/test_system_checks.py
+
+import asyncio
+import uuid
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud
+from app.schemas.organization_schema import OrganizationCreate
+from app.services import system_checks
+from app.services.system_checks import SystemCheckScheduler
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_slow_tenant_times_out_without_delaying_the_others(db_session: AsyncSession, monkeypatch):
+    suffix = uuid.uuid4().hex[:6].upper()
+    org_ids = []
+    for name in ("Grande", "Pequena 1", "Pequena 2"):
+        org = await crud.organization.create(db_session, obj_in=OrganizationCreate(name=f"{name} {suffix}", sector="frete"))
+        org_ids.append(org.id)
+    slow_org_id = org_ids[0]
+
+    checked = []
+
+    async def fake_checks(db, *, organization_id):
+        if organization_id == slow_org_id:
+            await asyncio.sleep(5)
+        checked.append(organization_id)
+        return 1
+
+    monkeypatch.setattr(system_checks.crud_notification, "run_system_checks_for_organization", fake_checks)
+    scheduler = SystemCheckScheduler(
+        interval_seconds=60, concurrency=2, org_timeout_seconds=0.2, session_factory=TestingSessionLocal
+    )
+
+    results = await scheduler.run_all()
+    assert results[slow_org_id]["status"] == "timeout"
+    assert all(results[org_id]["status"] == "ok" and results[org_id]["created"] == 1 for org_id in org_ids[1:])
+    assert set(org_ids[1:]) <= set(checked) and slow_org_id not in checked
+    assert scheduler.stats()["slowest"][slow_org_id]["duration_seconds"] >= 0.2
+
+    # Cada worker só verifica as organizações do seu shard
+    sharded = SystemCheckScheduler(
+        interval_seconds=60, concurrency=2, org_timeout_seconds=1, shard_index=1, shard_count=2,
+        session_factory=TestingSessionLocal,
+    )
+    assert all(org_id % 2 == 1 for org_id in await sharded.run_all())
+
+    # Um pedido manual logo após a volta é ignorado
+    assert await scheduler.trigger(org_ids[1]) is False
+
+
+@pytest.mark.asyncio
+async def test_scheduler_waits_an_interval_before_the_first_sweep(monkeypatch):
+    scheduler = SystemCheckScheduler(
+        interval_seconds=0.2, concurrency=1, org_timeout_seconds=1, session_factory=TestingSessionLocal
+    )
+    sweeps = []
+
+    async def fake_run_all():
+        sweeps.append(scheduler.is_leader)
+        return {}
+
+    monkeypatch.setattr(scheduler, "run_all", fake_run_all)
+    monkeypatch.setattr(system_checks.settings, "SYSTEM_CHECK_SCHEDULER_ENABLED", True)
+    scheduler.start()
+    try:
+        # Subir o processo não dispara uma varredura
+        await asyncio.sleep(0.05)
+        assert sweeps == []
+        # Sem Postgres não há eleição: o processo com o agendador ativo varre
+        await asyncio.sleep(0.25)
+        assert sweeps == [True]
+    finally:
+        await scheduler.stop()
+    assert scheduler.stats()["leader"] is False